@@ -6,9 +6,14 @@ import sys
 # Garante que o módulo src possa ser importado..
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from src.data_loader import load_taco_data, get_foods_from_df
+from src.food_cache import load_foods, load_food_table, cache_key
+from src.plan_cache import PlanCache
 from src.strategies import NutritionalStrategy
-from src.genetic_algorithm import GeneticAlgorithm
+from src.genetic_algorithm import GeneticAlgorithm, PRIORITY_TAGS
+from src.food_index import FoodIndex
+from src.neighbors import SubstitutionIndex
+from src.background import PlanJob
+from src.plan_store import PlanStore
 
 st.set_page_config(page_title="Planejamento Alimentar", layout="wide", page_icon="🥗")
 
@@ -68,13 +73,45 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
+@st.cache_resource
 def load_data():
     csv_path = os.path.join("data", "taco.csv")
     if not os.path.exists(csv_path):
         return None
-    df = load_taco_data(csv_path)
-    return get_foods_from_df(df)
+    # Usa o cache compilado (data/.cache) quando o CSV e as regras não mudaram.
+    # cache_resource: a lista (de Food imutáveis) é compartilhada, sem cópia a cada rerun
+    return load_foods(csv_path)
+
+@st.cache_resource
+def load_table():
+    # Tabela completa (todas as colunas da TACO) para os limites de micronutrientes
+    csv_path = os.path.join("data", "taco.csv")
+    if not os.path.exists(csv_path):
+        return None
+    return load_food_table(csv_path)
+
+@st.cache_resource
+def load_index():
+    # Índice imutável compartilhado entre todas as sessões
+    foods = load_data()
+    return FoodIndex(foods) if foods else None
+
+@st.cache_resource
+def load_substitutions():
+    # Vizinhos pré-calculados: mutação de passo curto do GA e "trocar item" na interface
+    index = load_index()
+    return SubstitutionIndex(index, PRIORITY_TAGS) if index else None
+
+@st.cache_resource
+def load_plan_cache():
+    # Perfis com metas quase iguais reaproveitam (ou semeiam) planos já calculados
+    csv_path = os.path.join("data", "taco.csv")
+    return PlanCache(os.path.join("data", ".cache", "plans.sqlite"), table_hash=cache_key(csv_path))
+
+@st.cache_resource
+def load_plan_store():
+    # Histórico de cardápios salvos (sobrevive a refresh e reinícios do app)
+    return PlanStore(os.path.join("data", ".cache", "history.sqlite"))
 
 # BARRA LATERAL (ENTRADAS) ---
 with st.sidebar:
@@ -83,6 +120,7 @@ with st.sidebar:
     st.title("NutriPlan")
     
     st.subheader("Seus Dados")
+    user = st.text_input("Nome (para salvar o histórico)", value="").strip()
     weight = st.number_input("Peso (kg)", min_value=30.0, max_value=200.0, value=70.0)
     height = st.number_input("Altura (cm)", min_value=100.0, max_value=250.0, value=170.0)
     age = st.number_input("Idade", min_value=10, max_value=100, value=25)
@@ -99,9 +137,23 @@ with st.sidebar:
     activity_factor = activity_map[activity]
     
     gender_code = "M" if gender == "Masculino" else "F"
+
+    micronutrients = st.checkbox("Limitar sódio e garantir fibras/cálcio", value=False)
+
+    restriction_map = {"Sem lactose": "lactose", "Sem glúten": "gluten", "Vegetariano": "vegetarian"}
+    restrictions = [restriction_map[r] for r in st.multiselect("Restrições", list(restriction_map))]
+    disliked = st.multiselect("Alimentos que não quer no cardápio",
+                              sorted({f.name for f in load_data() or []}))
     
     run_btn = st.button("Gerar Cardápio", type="primary")
 
+    # Instrumentação do cache de planos (acertos, quase-acertos e tempo médio de cada caso)
+    with st.expander("Cache de planos"):
+        cache_stats = load_plan_cache().stats.as_dict()
+        st.metric("Taxa de acerto", f"{cache_stats['hit_rate']:.0%}",
+                  help=f"{cache_stats['lookups']} consultas, {cache_stats['near_hits']} quase-acertos")
+        st.json(cache_stats, expanded=False)
+
 #  CONTEÚDO PRINCIPAL ---
 
 # Carregar Data
@@ -110,29 +162,75 @@ if not foods:
     st.error("Erro: Arquivo `data/taco.csv` não encontrado.")
     st.stop()
 
+def start_plan_job(targets, allowed) -> PlanJob:
+    # GA numa thread em segundo plano (consultando antes o cache de planos).
+    # Para ao atingir todas as metas ou ao estourar o orçamento de tempo; as porções
+    # dos melhores menus são ajustadas a cada geração, e o niching mantém as 3 opções diferentes.
+    # Um quarto da população inicial já nasce perto das metas. As restrições do usuário viram
+    # uma máscara sobre o índice compartilhado (`allowed`, nada é copiado por sessão). Parte das
+    # trocas da mutação vai para um alimento de nutrientes parecidos (passo curto)
+    index = load_index()
+    table = load_table()
+    plan_cache = load_plan_cache()
+
+    def run(job: PlanJob):
+        return plan_cache.run(targets, index, lambda initial_population: job.watch(GeneticAlgorithm(
+            foods, targets, population_size=150, generations=40, index=index,
+            target_fitness=1.0, stagnation_generations=15, deadline_ms=1500,
+            food_table=table, initial_population=initial_population, portion_stage="elite",
+            niche_radius=0.3, feasible_fraction=0.25, allowed=allowed,
+            neighbor_mutation=0.3, substitutions=load_substitutions())),
+            progress_callback=job.progress, allowed=allowed)
+
+    return PlanJob(run).start()
+
 if run_btn:
-    with st.spinner("Otimizando sua dieta..."):
-        # 1.Calcular Metas
-        targets = NutritionalStrategy.from_bmi(weight, height, age, gender_code, activity_factor)
-        
-        # 2. Executar Algoritmo Genético
-        ga = GeneticAlgorithm(foods, targets, population_size=150, generations=40)
-        best_menus = ga.run()
-        
-        #Armazenar 
-        st.session_state["menus"] = best_menus
-        st.session_state["targets"] = targets
+    # 1.Calcular Metas
+    targets = NutritionalStrategy.from_bmi(weight, height, age, gender_code, activity_factor)
+    if micronutrients:
+        targets = NutritionalStrategy.with_micronutrient_limits(targets)
 
-#Verificar resultados
-if "menus" in st.session_state:
-    menus = st.session_state["menus"]
+    # 2. Máscara das restrições, usada pelo GA e depois pelas sugestões de substituição
+    allowed = load_index().allowed_mask(restrictions, disliked) if restrictions or disliked else None
+
+    # 3. Dispara o GA sem bloquear a página; os melhores menus parciais aparecem
+    # enquanto ele evolui e o resultado final os substitui
+    st.session_state["job"] = start_plan_job(targets, allowed)
+    st.session_state["targets"] = targets
+    st.session_state["allowed"] = allowed
+    st.session_state.pop("menus", None)
+
+job = st.session_state.get("job")
+if job is not None and job.done and job.error is None:
+    st.session_state["menus"] = job.snapshot()[0]
+
+@st.fragment(run_every=0.2 if job is not None and not job.done else None)
+def show_results():
+    job = st.session_state.get("job")
+    running = job is not None and not job.done
+    if running:
+        menus, generation, best_fitness, done = job.snapshot()
+        if done:
+            st.rerun()
+        if not menus:
+            st.info("Otimizando sua dieta...")
+            return
+        st.caption(f"Otimizando... geração {generation + 1} | fitness {best_fitness:.3f}")
+    elif job is not None and job.error is not None:
+        st.error(f"Erro ao gerar o cardápio: {job.error}")
+        return
+    else:
+        menus = st.session_state["menus"]
     targets = st.session_state["targets"]
-    
+    render_menus(menus, targets)
+
+def render_menus(menus, targets):
     st.markdown(f"<h2 style='color: black;'>📋 Sugestão de Cardápio</h2>", unsafe_allow_html=True)
     st.markdown(f"<h3 style='color: black;'>As opções são geradas utilizando Algoritmo Genético nos dados da tabela TACO.</h3>", unsafe_allow_html=True)
     st.markdown(f"<p style='color: black; font-weight: bold;'>Meta Proteica (Hipertrofia): {targets.min_proteins:.1f} - {targets.max_proteins:.1f} g</p>", unsafe_allow_html=True)
     
-    option = st.radio("Escolha uma opção:", ["Opção 1", "Opção 2", "Opção 3"], horizontal=True)
+    # Resultados parciais podem ter menos de 3 opções distintas
+    option = st.radio("Escolha uma opção:", [f"Opção {i + 1}" for i in range(len(menus))], horizontal=True)
     opt_idx = int(option.split(" ")[1]) - 1
     selected_menu = menus[opt_idx]
     
@@ -157,10 +255,10 @@ if "menus" in st.session_state:
             icon = meal_icons.get(meal.name, "🍽️") # Emoji fera
             
             items_html = ""
-            for food in meal.foods:
+            for j, food in enumerate(meal.foods):
                 items_html += f"""
 <div class="food-item">
-    • <b>{food.name}</b> <br>
+    • <b>{food.name}</b> — {meal.grams(j):.0f} g <br>
     <span style="font-size:0.8rem; color:#888;">{food.category}</span>
 </div>
 """
@@ -188,6 +286,34 @@ if "menus" in st.session_state:
     c3.metric("Carboidratos", f"{selected_menu.total_carbs:.1f}g")
     c4.metric("Gorduras", f"{selected_menu.total_fats:.1f}g")
 
+    if user and st.button("💾 Salvar no histórico"):
+        load_plan_store().add(user, selected_menu, targets)
+        st.success("Cardápio salvo.")
+
+    # Trocas sugeridas sem rodar o GA de novo: consulta direta aos vizinhos pré-calculados
+    substitutions = load_substitutions()
+    with st.expander("🔁 Não gostou de algum item? Veja substitutos parecidos"):
+        items = [food for meal in selected_menu.meals for food in meal.foods]
+        food = st.selectbox("Item", items, format_func=lambda f: f.name)
+        similar = substitutions.similar_foods(food, 5, st.session_state.get("allowed"))
+        if similar:
+            st.table(pd.DataFrame([{"Alimento": f.name, "kcal": f.calories, "P (g)": f.proteins,
+                                    "C (g)": f.carbs, "F (g)": f.fats} for f in similar]))
+        else:
+            st.caption("Nenhum substituto parecido disponível.")
+
+#Verificar resultados
+saved = load_plan_store().latest(user) if user and job is None else None
+try:
+    saved_menu = saved.menu(load_index()) if saved is not None else None
+except KeyError:  # alimento que não existe mais na tabela atual
+    saved_menu = None
+if job is not None:
+    show_results()
+elif saved_menu is not None:
+    # Sem geração nesta sessão: mostra o último cardápio salvo do usuário
+    st.caption(f"Último cardápio salvo ({saved.day:%d/%m/%Y})")
+    render_menus([saved_menu], saved.targets)
 else:
     st.info("👈 Configure seus dados na barra lateral e clique em 'Gerar Cardápio' para começar.")
     
@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Callable, List, Optional
+from .models import Menu
+from .optimizer import Optimizer
+
+# Execução do planejamento numa thread em segundo plano, com o melhor resultado parcial
+# disponível a cada geração. Pensado para a interface (Streamlit): a thread não toca na
+# UI; a página consulta snapshot() periodicamente e mostra os menus enquanto o GA evolui.
+
+
+class PlanJob:
+    def __init__(self, run: Callable[["PlanJob"], List[Menu]], top_k: int = 3):
+        # run(job) executa o planejamento e devolve os menus finais; o GA criado lá dentro
+        # deve ser registrado com job.watch(ga) e receber job.progress como progress_callback
+        self._run = run
+        self.top_k = top_k
+        self._lock = threading.Lock()
+        self._ga: Optional[Optimizer] = None
+        self._thread: Optional[threading.Thread] = None
+        self.menus: List[Menu] = []
+        self.generation = -1
+        self.best_fitness = 0.0
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.started_at = 0.0
+        self.first_result_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self) -> "PlanJob":
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._target, name="plan-job", daemon=True)
+        self._thread.start()
+        return self
+
+    def _target(self):
+        try:
+            menus = self._run(self)
+            with self._lock:
+                self.menus = list(menus)
+                if menus:
+                    self.best_fitness = menus[0].fitness_score
+                self._mark_first_result()
+        except BaseException as exc:  # repassado à página via self.error
+            self.error = exc
+        finally:
+            self.finished_at = time.perf_counter()
+            self.done = True
+
+    def watch(self, ga: Optimizer) -> Optimizer:
+        self._ga = ga
+        return ga
+
+    def progress(self, generation: int, best_fitness: float):
+        # Chamado pelo GA (na thread do job) com a população já avaliada e ordenada.
+        # Os menus da população não são alterados depois de avaliados (mutação só cria
+        # filhos novos), então guardar as referências é seguro.
+        menus = self._ga.top_menus(self.top_k) if self._ga is not None else []
+        with self._lock:
+            self.menus = menus
+            self.generation = generation
+            self.best_fitness = best_fitness
+            self._mark_first_result()
+
+    def _mark_first_result(self):
+        if self.first_result_at is None:
+            self.first_result_at = time.perf_counter()
+
+    def snapshot(self):
+        # (menus, geração, melhor fitness, terminou?)
+        with self._lock:
+            return list(self.menus), self.generation, self.best_fitness, self.done
+
+    def time_to_first_result(self) -> Optional[float]:
+        return None if self.first_result_at is None else self.first_result_at - self.started_at
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.done
@@ -0,0 +1,258 @@
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .models import Menu
+from .strategies import NutritionalStrategy
+from .local_search import OPTIMIZERS
+from .workers import init_worker, worker_index
+from .food_cache import load_foods
+from .food_index import RESTRICTIONS, food_name_key
+from .plan_store import NewPlan, PlanStore
+
+# Geração de cardápios em lote (ex: todo o cadastro de uma clínica durante a noite).
+#
+#   python -m src.batch pacientes.csv --output planos.jsonl --workers 16
+
+DEFAULT_CSV = os.path.join("data", "taco.csv")
+
+# Mesmos fatores da barra lateral do app, aceitos também pelo nome
+ACTIVITY_LEVELS = {
+    "sedentario": 1.2,
+    "leve": 1.375,
+    "moderado": 1.55,
+    "intenso": 1.725,
+}
+
+
+def _activity_factor(value) -> float:
+    if value in (None, ""):
+        return 1.375
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        key = str(value).strip().lower().replace("á", "a")
+        if key not in ACTIVITY_LEVELS:
+            raise ValueError(f"Nível de atividade desconhecido: {value}")
+        return ACTIVITY_LEVELS[key]
+
+
+def _name_list(value) -> List[str]:
+    # Lista JSON ou texto separado por ';' (coluna de CSV); ordenada, para chaves estáveis.
+    # Itens normalizados como em FoodIndex.allowed_mask (food_name_key)
+    if value in (None, ""):
+        return []
+    items = value if isinstance(value, list) else str(value).split(";")
+    return sorted({food_name_key(str(item)) for item in items if str(item).strip()})
+
+
+def _positive(raw: dict, field: str) -> float:
+    # Número finito e positivo ("nan", "inf" e 0 chegariam a NutritionalStrategy.from_bmi)
+    value = float(raw[field])
+    if not math.isfinite(value) or value <= 0:
+        raise ValueError(f"{field} deve ser um número positivo: {raw[field]!r}")
+    return value
+
+
+def normalize_profile(raw: dict, position: int) -> dict:
+    gender = str(raw.get("gender", "M")).strip()[:1].upper() or "M"
+    restrictions = [r.lower() for r in _name_list(raw.get("restrictions"))]
+    unknown = [r for r in restrictions if r not in RESTRICTIONS]
+    if unknown:
+        raise ValueError(f"Restrições desconhecidas: {unknown}")
+    return {
+        "id": raw.get("id") or str(position),
+        "weight": _positive(raw, "weight"),
+        "height": _positive(raw, "height"),
+        "age": int(_positive(raw, "age")),
+        "gender": gender,
+        "activity_level": _activity_factor(raw.get("activity_level")),
+        "restrictions": restrictions,
+        "excluded": _name_list(raw.get("excluded")),
+    }
+
+
+def error_record(profile_id, error: BaseException) -> dict:
+    # Linha de saída de um perfil que falhou (no lugar de "targets"/"menus")
+    return {"id": profile_id, "error": f"{type(error).__name__}: {error}"}
+
+
+def read_profiles(path: str) -> Iterator[dict]:
+    # CSV com cabeçalho ou JSONL, com as colunas weight, height, age, gender, activity_level
+    # (e opcionais: id, restrictions ex "lactose;gluten", excluded = nomes de alimentos).
+    # Uma linha inválida (ex: peso vazio) vira um error_record em vez de interromper o lote
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith((".jsonl", ".json")):
+            rows = (line for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for position, raw in enumerate(rows):
+            try:
+                if isinstance(raw, str):
+                    raw = json.loads(raw)
+                profile = normalize_profile(raw, position)
+            except (ValueError, KeyError, TypeError, AttributeError, ArithmeticError) as exc:
+                profile_id = raw.get("id") if isinstance(raw, dict) else None
+                profile = error_record(profile_id or str(position), exc)
+            yield profile
+
+
+def menu_to_dict(menu: Menu) -> dict:
+    return {
+        "fitness": menu.fitness_score,
+        "calories": menu.total_calories,
+        "proteins": menu.total_proteins,
+        "carbs": menu.total_carbs,
+        "fats": menu.total_fats,
+        "meals": [{"name": meal.name,
+                   "foods": [f.name for f in meal.foods],
+                   "ids": [f.food_id for f in meal.foods],
+                   "grams": [meal.grams(i) for i in range(len(meal.foods))]} for meal in menu.meals],
+    }
+
+
+def stored_plan(result: dict) -> NewPlan:
+    # Melhor menu de um resultado do lote, no formato do PlanStore (porções só se ajustadas)
+    best = result["menus"][0]
+    genome = []
+    for meal in best["meals"]:
+        entry = (meal["name"], tuple(meal["ids"]))
+        if any(g != 100.0 for g in meal["grams"]):
+            entry += (tuple(g / 100.0 for g in meal["grams"]),)
+        genome.append(entry)
+    totals = (best["calories"], best["proteins"], best["carbs"], best["fats"])
+    return NewPlan(str(result["id"]), tuple(genome), result["targets"], totals, best["fitness"])
+
+
+def plan_profile(profile: dict, params: dict, seed: Optional[int]) -> dict:
+    # Gera os menus de um perfil já normalizado (normalize_profile) num processo iniciado com
+    # workers.init_worker; params: argumentos do motor mais "engine" (ver local_search.OPTIMIZERS).
+    # Usado pelo lote e pelo serviço HTTP (src.service)
+    index = worker_index()
+    targets = NutritionalStrategy.from_bmi(profile["weight"], profile["height"], profile["age"],
+                                           profile["gender"], profile["activity_level"])
+    allowed = None
+    if profile.get("restrictions") or profile.get("excluded"):
+        allowed = index.allowed_mask(profile.get("restrictions", ()), profile.get("excluded", ()))
+    params = dict(params)
+    engine = OPTIMIZERS[params.pop("engine", "ga")]
+    menus = engine(list(index.foods), targets, index=index, seed=seed, allowed=allowed, **params).run()
+    return {"id": profile["id"], "targets": asdict(targets), "menus": [menu_to_dict(m) for m in menus]}
+
+
+def _finished(pending: Dict[Future, str]) -> Iterator[dict]:
+    # Espera ao menos uma tarefa; a exceção de um perfil vira um error_record
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        profile_id = pending.pop(future)
+        try:
+            result = future.result()
+        except Exception as exc:
+            result = error_record(profile_id, exc)
+        yield result
+
+
+def plan_batch(profiles: Iterable[dict],
+               csv_path: str = DEFAULT_CSV,
+               population_size: int = 150,
+               generations: int = 40,
+               max_workers: Optional[int] = None,
+               seed: Optional[int] = None,
+               portion_stage: Optional[str] = None,
+               engine: str = "ga") -> Iterator[dict]:
+    # Carrega e indexa a TACO uma vez e distribui os perfis num pool de processos.
+    # Os resultados são devolvidos conforme ficam prontos (não necessariamente na ordem).
+    # Perfis inválidos ou que falham no worker saem como error_record ({"id", "error"}),
+    # sem interromper os demais
+    # engine: motor de busca (ver local_search.OPTIMIZERS); população e gerações valem para os GAs, porções só para o 'ga'
+    if engine not in OPTIMIZERS:
+        raise ValueError(f"Motor desconhecido: {engine} (disponíveis: {list(OPTIMIZERS)})")
+    if engine != "ga" and portion_stage is not None:
+        raise ValueError("portion_stage só é suportado pelo motor 'ga'")
+    foods = load_foods(csv_path)
+    params = dict(engine=engine)
+    if engine in ("ga", "vectorized"):
+        params.update(population_size=population_size, generations=generations)
+    if engine == "ga":
+        params.update(portion_stage=portion_stage)
+    workers = max_workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(foods,)) as executor:
+        # Limita as tarefas em voo para não materializar o cadastro inteiro em memória
+        pending: Dict[Future, str] = {}
+        for position, profile in enumerate(profiles):
+            if "error" in profile:
+                yield profile
+                continue
+            profile_seed = None if seed is None else seed + position
+            pending[executor.submit(plan_profile, profile, params, profile_seed)] = profile["id"]
+            if len(pending) >= workers * 4:
+                yield from _finished(pending)
+        while pending:
+            yield from _finished(pending)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Gera cardápios em lote a partir de um CSV/JSONL de perfis.")
+    parser.add_argument("profiles", help="CSV ou JSONL com weight, height, age, gender, activity_level")
+    parser.add_argument("--output", "-o", help="Arquivo JSONL de saída (padrão: stdout)")
+    parser.add_argument("--taco", default=DEFAULT_CSV, help="Caminho da tabela TACO")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--population", type=int, default=150)
+    parser.add_argument("--generations", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--portions", choices=["elite", "final"], default=None,
+                        help="Ajusta as porções dos menus (ver GeneticAlgorithm.portion_stage)")
+    parser.add_argument("--engine", choices=list(OPTIMIZERS), default="ga",
+                        help="Motor de busca (ver python -m src.benchmark, seção engine/)")
+    parser.add_argument("--store", help="Grava o melhor menu de cada perfil no histórico (SQLite, ver PlanStore)")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    store = PlanStore(args.store) if args.store else None
+    pending: List[NewPlan] = []
+    start = time.perf_counter()
+    count = failed = 0
+    try:
+        results = plan_batch(read_profiles(args.profiles), csv_path=args.taco,
+                             population_size=args.population, generations=args.generations,
+                             max_workers=args.workers, seed=args.seed, portion_stage=args.portions,
+                             engine=args.engine)
+        for result in results:
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            if "error" in result:
+                failed += 1
+                print(f"Perfil {result['id']}: {result['error']}", file=sys.stderr)
+                continue
+            count += 1
+            if store is not None:
+                pending.append(stored_plan(result))
+                if len(pending) >= 1000:
+                    store.add_many(pending)
+                    pending.clear()
+            if count % 100 == 0:
+                elapsed = time.perf_counter() - start
+                print(f"{count} planos | {count / elapsed:.1f} planos/s", file=sys.stderr)
+    finally:
+        if store is not None:
+            store.add_many(pending)
+            store.close()
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Concluído: {count} planos em {elapsed:.1f}s ({rate:.1f} planos/s)"
+          + (f", {failed} perfis com erro" if failed else ""), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from .models import Food, Menu, NutritionalTargets
+from .food_index import FoodIndex
+from .genetic_algorithm import GeneticAlgorithm
+from .local_search import OPTIMIZERS
+from .strategies import NutritionalStrategy
+
+# Benchmark reprodutível do planejador: sementes e perfis fixos, tempos das etapas
+# principais e qualidade das soluções (fitness e desvio de cada macro), gravados em JSON.
+# Com --compare, confronta com uma execução anterior e sai com código 1 se houver regressão.
+#
+#   python -m src.benchmark -o bench.json
+#   python -m src.benchmark -o novo.json --compare bench.json
+
+DEFAULT_CSV = os.path.join("data", "taco.csv")
+BENCHMARK_VERSION = 1
+
+# Perfis fixos (metas de NutritionalStrategy), do mais folgado ao mais apertado
+PROFILES: Dict[str, Callable[[], NutritionalTargets]] = {
+    "adult": NutritionalStrategy.for_general_adult,
+    "woman_40": lambda: NutritionalStrategy.from_bmi(60, 160, 40, 'F', 1.375),
+    "athlete": lambda: NutritionalStrategy.from_bmi(90, 190, 25, 'M', 1.9),
+    "child_8": lambda: NutritionalStrategy.for_age_group(8),
+    "teen_12": lambda: NutritionalStrategy.for_age_group(12),
+}
+
+MACROS = ("calories", "proteins", "carbs", "fats")
+
+# Tolerâncias padrão do --compare: tempo pode piorar até 50% (ruído de máquinas
+# compartilhadas), fitness cair até 0.01
+TIME_TOLERANCE = 0.5
+FITNESS_TOLERANCE = 0.01
+
+
+def synthetic_catalog(base: List[Food], size: int, seed: int = 0) -> List[Food]:
+    # Catálogo sintético de `size` alimentos derivado da TACO: cada item copia categoria e
+    # tags de um alimento real e perturba os macros em ±20%, mantendo os templates viáveis
+    rng = random.Random(seed)
+    foods = []
+    for i in range(size):
+        f = rng.choice(base)
+        jitter = [rng.uniform(0.8, 1.2) for _ in range(4)]
+        foods.append(Food(name=f"{f.name} #{i}", calories=round(f.calories * jitter[0], 2),
+                          proteins=round(f.proteins * jitter[1], 2), carbs=round(f.carbs * jitter[2], 2),
+                          fats=round(f.fats * jitter[3], 2), category=f.category, tags=f.tags, food_id=i))
+    return foods
+
+
+def macro_deviation(menu: Menu, targets: NutritionalTargets) -> Dict[str, float]:
+    # Quanto cada macro ficou fora da faixa (negativo = abaixo, positivo = acima, 0 = dentro)
+    deviation = {}
+    for macro, total in zip(MACROS, menu.totals):
+        low, high = getattr(targets, f"min_{macro}"), getattr(targets, f"max_{macro}")
+        deviation[macro] = round(total - low if total < low else total - high if total > high else 0.0, 3)
+    return deviation
+
+
+def _time(fn: Callable, repeat: int = 5, number: int = 1) -> dict:
+    # Mediana e mínimo de `repeat` medições, cada uma com `number` chamadas (em ms por chamada)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) * 1000 / number)
+    return {"median_ms": statistics.median(samples), "min_ms": min(samples), "repeat": repeat, "number": number}
+
+
+def bench_loading(csv_path: str, repeat: int) -> Dict[str, dict]:
+    from .data_loader import load_taco_data, get_foods_from_df
+    from .food_cache import load_foods
+
+    results = {}
+    try:
+        df = load_taco_data(csv_path)
+    except ImportError:
+        return {"load/load_taco_data": {"skipped": "pandas não instalado"}}
+    results["load/load_taco_data"] = _time(lambda: load_taco_data(csv_path), repeat)
+    results["load/get_foods_from_df"] = _time(lambda: get_foods_from_df(df), repeat)
+    load_foods(csv_path)  # garante o cache compilado antes de medir a leitura "quente"
+    results["load/load_foods_cached"] = _time(lambda: load_foods(csv_path), repeat)
+    return results
+
+
+def bench_operators(foods: List[Food], index: FoodIndex, targets: NutritionalTargets,
+                    seed: int, repeat: int) -> Dict[str, dict]:
+    # Operadores isolados sobre uma população fixa
+    ga = GeneticAlgorithm(foods, targets, population_size=200, index=index, seed=seed)
+    ga.initialize_population()
+    ga.evaluate_population()
+    population = ga.population
+    results = {}
+
+    def fitness_all():
+        for menu in population:
+            ga.calculate_fitness(menu)
+
+    def crossover_all():
+        for i in range(len(population) - 1):
+            ga.crossover(population[i], population[i + 1])
+
+    def mutate_all():
+        # Muta cópias (refeições compartilhadas): a população medida não muda entre repetições
+        for menu in population:
+            ga.mutate(Menu(meals=list(menu.meals)))
+
+    for name, fn in (("calculate_fitness", fitness_all), ("crossover", crossover_all), ("mutate", mutate_all)):
+        timing = _time(fn, repeat)
+        timing["per_call_us"] = timing["median_ms"] * 1000 / len(population)
+        results[f"ops/{name}"] = timing
+
+    def next_generation():
+        ga.population = list(population)
+        ga.next_generation()
+
+    results["ops/next_generation"] = _time(next_generation, repeat)
+    return results
+
+
+def bench_run(foods: List[Food], index: FoodIndex, targets: NutritionalTargets,
+              population_size: int, generations: int, seed: int, repeat: int = 3, **kwargs) -> dict:
+    # Execução completa; com a semente fixa todas as repetições produzem o mesmo menu
+    def make_ga() -> GeneticAlgorithm:
+        return GeneticAlgorithm(foods, targets, population_size=population_size, generations=generations,
+                                index=index, seed=seed, **kwargs)
+
+    ga = make_ga()
+    best = ga.run()[0]
+    result = _time(lambda: make_ga().run(), repeat)
+    result.update(best_fitness=best.fitness_score, deviation=macro_deviation(best, targets),
+                  generations_run=ga.generations_run)
+    return result
+
+
+def bench_engine(name: str, foods: List[Food], index: FoodIndex, targets: NutritionalTargets,
+                 seeds: range, target_fitness: float = 0.999, deadline_ms: float = 2000.0, **kwargs) -> dict:
+    # Tempo até a qualidade de um motor de OPTIMIZERS: uma execução por semente, parando ao
+    # atingir target_fitness (ou no deadline). best_fitness é o pior caso entre as sementes
+    samples, fitness, evaluations = [], [], []
+    for seed in seeds:
+        optimizer = OPTIMIZERS[name](foods, targets, index=index, seed=seed, target_fitness=target_fitness,
+                                     deadline_ms=deadline_ms, **kwargs)
+        start = time.perf_counter()
+        best = optimizer.run()[0]
+        samples.append((time.perf_counter() - start) * 1000)
+        fitness.append(best.fitness_score)
+        evaluations.append(optimizer.evaluations)
+    return {"median_ms": statistics.median(samples), "min_ms": min(samples), "max_ms": max(samples),
+            "repeat": len(samples), "best_fitness": min(fitness),
+            "reached": sum(f >= target_fitness for f in fitness) / len(fitness),
+            "median_evaluations": statistics.median(evaluations)}
+
+
+def run_suite(csv_path: str = DEFAULT_CSV,
+              seed: int = 0,
+              population_sizes: tuple = (50, 150, 300),
+              catalog_sizes: tuple = (1_000, 10_000, 100_000),
+              generations: int = 40,
+              repeat: int = 5,
+              log: Callable[[str], None] = lambda msg: None) -> dict:
+    from .food_cache import load_foods
+
+    results: Dict[str, dict] = {}
+    log("carregamento")
+    results.update(bench_loading(csv_path, repeat))
+
+    foods = load_foods(csv_path)
+    index = FoodIndex(foods)
+    adult = PROFILES["adult"]()
+    log("operadores")
+    results.update(bench_operators(foods, index, adult, seed, repeat))
+
+    # Qualidade e tempo por perfil, no catálogo real
+    for profile, make_targets in PROFILES.items():
+        for population_size in population_sizes:
+            log(f"taco/{profile}/pop{population_size}")
+            results[f"run/taco/{profile}/pop{population_size}"] = bench_run(
+                foods, index, make_targets(), population_size, generations, seed, repeat)
+
+    # Inicialização aleatória x guiada pelas metas: gerações e tempo até o fitness alvo
+    for profile, make_targets in PROFILES.items():
+        log(f"init/{profile}")
+        for mode, fraction in (("random", 0.0), ("feasible", 0.25)):
+            results[f"init/{profile}/{mode}"] = bench_run(
+                foods, index, make_targets(), 150, generations, seed, repeat,
+                target_fitness=0.999, feasible_fraction=fraction)
+
+    # Motores de busca (GA, GA vetorizado, simulated annealing, tabu): tempo até fitness 0.999, uma semente por repetição
+    for profile, make_targets in PROFILES.items():
+        log(f"engine/{profile}")
+        for name in OPTIMIZERS:
+            kwargs = dict(population_size=150, generations=200) if name in ("ga", "vectorized") else {}
+            results[f"engine/{profile}/{name}"] = bench_engine(
+                name, foods, index, make_targets(), range(seed, seed + repeat), **kwargs)
+
+    # Escala do catálogo: construção do índice e execução completa
+    for size in catalog_sizes:
+        log(f"sintético {size}")
+        catalog = synthetic_catalog(foods, size, seed)
+        results[f"index/synthetic{size}"] = _time(lambda: FoodIndex(catalog), repeat)
+        synthetic_index = FoodIndex(catalog)
+        for population_size in population_sizes:
+            results[f"run/synthetic{size}/adult/pop{population_size}"] = bench_run(
+                catalog, synthetic_index, adult, population_size, generations, seed, repeat)
+
+    return {
+        "meta": {
+            "version": BENCHMARK_VERSION,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": seed,
+            "generations": generations,
+        },
+        "results": results,
+    }
+
+
+def compare(previous: dict, current: dict,
+            time_tolerance: float = TIME_TOLERANCE,
+            fitness_tolerance: float = FITNESS_TOLERANCE) -> List[dict]:
+    # Uma linha por medição presente nas duas execuções; `regression` marca pioras acima das tolerâncias
+    rows = []
+    for name, entry in current["results"].items():
+        old = previous.get("results", {}).get(name)
+        if old is None or "skipped" in entry or "skipped" in old:
+            continue
+        row = {"name": name, "regression": False}
+        # O mínimo das repetições é a medida menos sensível a ruído da máquina
+        before, after = old.get("min_ms"), entry.get("min_ms")
+        if before and after is not None:
+            row["time_ratio"] = after / before
+            row["regression"] |= after > before * (1 + time_tolerance)
+        if "best_fitness" in entry and "best_fitness" in old:
+            row["fitness_delta"] = entry["best_fitness"] - old["best_fitness"]
+            row["regression"] |= row["fitness_delta"] < -fitness_tolerance
+        rows.append(row)
+    return rows
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark reprodutível do planejador.")
+    parser.add_argument("--output", "-o", default="benchmark.json", help="Arquivo JSON de saída")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--taco", default=DEFAULT_CSV)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--generations", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=5, help="Repetições de cada medição")
+    parser.add_argument("--quick", action="store_true",
+                        help="Só população 150 e catálogos sintéticos até 10 mil alimentos")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--fitness-tolerance", type=float, default=FITNESS_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    population_sizes = (150,) if args.quick else (50, 150, 300)
+    catalog_sizes = (1_000, 10_000) if args.quick else (1_000, 10_000, 100_000)
+    report = run_suite(args.taco, seed=args.seed, population_sizes=population_sizes, catalog_sizes=catalog_sizes,
+                       generations=args.generations, repeat=args.repeat,
+                       log=lambda msg: print(f"... {msg}", file=sys.stderr))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    for name, entry in report["results"].items():
+        if "skipped" in entry:
+            print(f"{name:<40} pulado: {entry['skipped']}")
+        elif "best_fitness" in entry:
+            print(f"{name:<40} {entry['median_ms']:9.1f} ms | fitness {entry['best_fitness']:.4f}")
+        else:
+            print(f"{name:<40} {entry['median_ms']:9.3f} ms")
+
+    if not args.compare:
+        return
+    with open(args.compare, encoding='utf-8') as f:
+        previous = json.load(f)
+    rows = compare(previous, report, args.time_tolerance, args.fitness_tolerance)
+    print(f"\nComparação com {args.compare}:")
+    for row in rows:
+        ratio = f"{row['time_ratio']:.2f}x" if "time_ratio" in row else "-"
+        fitness = f"{row['fitness_delta']:+.4f}" if "fitness_delta" in row else ""
+        print(f"{'REGRESSÃO' if row['regression'] else 'ok':<10} {row['name']:<40} {ratio:>7} {fitness}")
+    regressions = sum(row["regression"] for row in rows)
+    print(f"{regressions} regressão(ões) em {len(rows)} medições")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
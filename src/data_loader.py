@@ -1,15 +1,52 @@
-import pandas as pd
-import numpy as np
-from typing import List
+from typing import Iterator, List, TYPE_CHECKING
 from .models import Food
+from .tagging import TAG_BITS, mask_to_tags, tag_masks
+# Re-exportado: get_tags era definido neste módulo e continua importável daqui
+from .tagging import get_tags  # noqa: F401
 import csv
 
+# pandas só é importado nas funções que trabalham com DataFrame, para que o motor
+# (e os workers, via food_cache) possam carregar a TACO sem ele.
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Colunas numéricas da TACO: nome do nutriente -> posição no CSV
+# (a coluna 13 repete o número do alimento e é ignorada)
+TACO_NUTRIENT_COLUMNS = {
+    'moisture': 2,       # Umidade (%)
+    'calories': 3,       # Energia (kcal)
+    'energy_kj': 4,      # Energia (kJ)
+    'proteins': 5,       # Proteína (g)
+    'fats': 6,           # Lipídeos (g)
+    'cholesterol': 7,    # Colesterol (mg)
+    'carbs': 8,          # Carboidrato (g)
+    'fiber': 9,          # Fibra alimentar (g)
+    'ash': 10,           # Cinzas (g)
+    'calcium': 11,       # Cálcio (mg)
+    'magnesium': 12,     # Magnésio (mg)
+    'manganese': 14,     # Manganês (mg)
+    'phosphorus': 15,    # Fósforo (mg)
+    'iron': 16,          # Ferro (mg)
+    'sodium': 17,        # Sódio (mg)
+    'potassium': 18,     # Potássio (mg)
+    'copper': 19,        # Cobre (mg)
+    'zinc': 20,          # Zinco (mg)
+    'retinol': 21,       # Retinol (mcg)
+    're': 22,            # RE (mcg)
+    'rae': 23,           # RAE (mcg)
+    'thiamine': 24,      # Tiamina (mg)
+    'riboflavin': 25,    # Riboflavina (mg)
+    'pyridoxine': 26,    # Piridoxina (mg)
+    'niacin': 27,        # Niacina (mg)
+    'vitamin_c': 28,     # Vitamina C (mg)
+}
+
 def clean_number(value):
    
     if isinstance(value, (int, float)):
         return float(value)
     
-    if pd.isna(value) or value == 'NA' or value == '*':
+    if value is None or value == 'NA' or value == '*':
         return 0.0
     
     if isinstance(value, str):
@@ -25,9 +62,9 @@ def clean_number(value):
             return 0.0
     return 0.0
 
-def load_taco_data(csv_path: str) -> pd.DataFrame:    
-    # Precisamos analisar manualmente para capturar os cabeçalhos de categoria "stateful"
-    foods_data = []
+def iter_taco_rows(csv_path: str) -> Iterator[dict]:
+    # Precisamos analisar manualmente para capturar os cabeçalhos de categoria "stateful".
+    # Gerador: uma linha por vez (ver sources.py para a carga em blocos)
     current_category = "Geral"
     
     with open(csv_path, 'r', encoding='latin1') as f:
@@ -58,96 +95,52 @@ def load_taco_data(csv_path: str) -> pd.DataFrame:
                 if len(row) < 9: continue # linha inválida
             
                 # 1: Descrição (Nome)
-                # 3: Calorias (kcal)
-                # 5: Proteínas
-                # 6: Lipídeos (Gordura)
-                # 8: Carboidratos
+                # Demais colunas numéricas: ver TACO_NUTRIENT_COLUMNS
                 
                 try:
-                    name = row[1]
-                    cals = clean_number(row[3])
-                    prot = clean_number(row[5])
-                    fat = clean_number(row[6])
-                    carb = clean_number(row[8])
-                    
-                    foods_data.append({
-                        'name': name,
-                        'calories': cals,
-                        'proteins': prot,
-                        'carbs': carb,
-                        'fats': fat,
-                        'category': current_category
-                    })
+                    food = {'name': row[1], 'category': current_category}
+                    for nutrient, col in TACO_NUTRIENT_COLUMNS.items():
+                        food[nutrient] = clean_number(row[col]) if col < len(row) else 0.0
                 except (ValueError, IndexError):
                     continue
+                yield food
 
-    df = pd.DataFrame(foods_data)
-    return df
+def read_taco_rows(csv_path: str) -> List[dict]:
+    return list(iter_taco_rows(csv_path))
 
-def get_tags(name: str, category: str) -> List[str]:
-    tags = []
-    name_lower = name.lower()
-    cat_lower = category.lower()
+def load_taco_data(csv_path: str) -> "pd.DataFrame":
+    import pandas as pd
+    return pd.DataFrame(read_taco_rows(csv_path))
 
-    # 1. Filtragem para alimentos "desagradáveis" para dieta no dia a dia (Carnes/Leguminosas cruas)
-    is_raw = 'cru' in name_lower
-    
-    # Categorias que são UNSAFE se cruas
-    unsafe_raw_cats = ['carnes', 'pescados', 'leguminosas', 'ovos', 'miúdos', 'vísceras']
-    
-    if is_raw and any(c in cat_lower for c in unsafe_raw_cats):
-        #Exceção: algumas coisas podem ser seguras (Sushi) mas no contexto do projeto 'Peixe cru' assume necessidade de preparo
-        tags.append("UNSAFE")
-    elif is_raw and 'mandioca' in name_lower: # Mandioca crua é tóxica
-        tags.append("UNSAFE")
-    
-    
-    # Carbo Café da Manhã: Pães, Bolos, Biscoitos, Cereais
-    if 'pão' in name_lower or 'bolo' in name_lower or 'biscoito' in name_lower or 'torrada' in name_lower:
-        tags.append("BREAKFAST_CEREAL")
-    elif 'cereal' in name_lower and 'matinal' in name_lower:
-        tags.append("BREAKFAST_CEREAL")
-    elif 'mingau' in name_lower:
-        tags.append("BREAKFAST_CEREAL")
-        
-    # Carbo Almoço: Arroz, Macarrão, Polenta, Batata, Mandioca, Farinhas
-    if 'arroz' in name_lower or 'macarrão' in name_lower or 'polenta' in name_lower or 'milho' in name_lower:
-        # Exclui Curau dependendo do contexto, mas milho grão é almoço
-        if 'curau' not in name_lower and 'mingau' not in name_lower:
-             tags.append("LUNCH_CARB")
-    elif 'farinha' in name_lower and 'láctea' not in name_lower: # Farinha de mandioca/milho
-        tags.append("LUNCH_CARB")
-    elif 'batata' in name_lower or 'mandioca' in name_lower or 'inhame' in name_lower or 'cará' in name_lower:
-        tags.append("LUNCH_CARB")
-    elif 'lasanha' in name_lower or 'pizza' in name_lower or 'pastel' in name_lower:
-        tags.append("LUNCH_CARB") # Pratos principais
+def get_foods_from_df(df: "pd.DataFrame") -> List[Food]:
+    return get_foods_from_columns(df['name'].tolist(), df['category'].tolist(),
+                                  df['calories'].tolist(), df['proteins'].tolist(),
+                                  df['carbs'].tolist(), df['fats'].tolist())
 
-    # Carnes
-    if any(c in cat_lower for c in ['carnes', 'pescados', 'ovos', 'vísceras']):
-        if "UNSAFE" not in tags:
-            tags.append("MEAT")
+def get_foods_from_rows(rows: List[dict]) -> List[Food]:
+    columns = ('name', 'category', 'calories', 'proteins', 'carbs', 'fats')
+    return get_foods_from_columns(*([row[c] for row in rows] for c in columns))
 
-    # Laticínios
-    if 'leite' in cat_lower or 'queijo' in name_lower or 'iogurte' in name_lower:
-        tags.append("DAIRY")
-        
-    return tags
+def get_foods_from_columns(names, categories, calories, proteins, carbs, fats) -> List[Food]:
+    # Etiquetagem vetorizada de todas as linhas de uma vez (ver tagging.TAG_RULES).
+    # food_id = posição da linha, igual à da FoodTable construída das mesmas linhas
+    masks = tag_masks(names, categories).tolist()
+    unsafe_bit = TAG_BITS["UNSAFE"]
 
-def get_foods_from_df(df: pd.DataFrame) -> List[Food]:
     foods = []
-    for _, row in df.iterrows():
-        tags = get_tags(row['name'], row['category'])
-
-        if "UNSAFE" in tags:
+    for food_id, (name, category, cals, prot, carb, fat, mask) in enumerate(
+            zip(names, categories, calories, proteins, carbs, fats, masks)):
+        if mask & unsafe_bit:
             continue
             
         foods.append(Food(
-            name=row['name'],
-            calories=row['calories'],
-            proteins=row['proteins'],
-            carbs=row['carbs'],
-            fats=row['fats'],
-            category=row['category'],
-            tags=tags
+            name=name,
+            calories=cals,
+            proteins=prot,
+            carbs=carb,
+            fats=fat,
+            category=category,
+            tags=mask_to_tags(mask),
+            food_id=food_id
         ))
     return foods
@@ -0,0 +1,108 @@
+import hashlib
+import os
+import tempfile
+from typing import List, Optional, Sequence
+import numpy as np
+from .models import Food
+from . import data_loader
+from .food_table import FoodTable
+from .tagging import rules_fingerprint
+
+# Cache binário (.npz) da TACO já processada: FoodTable completa (todas as colunas
+# numéricas, categorias e tags em bitmask). A chave combina o hash do CSV de origem
+# com o hash das regras de etiquetagem, então qualquer alteração em um dos dois
+# invalida o arquivo automaticamente. Carregar o cache não importa pandas nem refaz
+# o parsing/etiquetagem.
+
+CACHE_VERSION = "2"
+
+
+def rules_hash() -> str:
+    return hashlib.sha256(rules_fingerprint().encode('utf-8')).hexdigest()
+
+
+def _update_file(digest, path: str):
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+
+
+def cache_key(csv_path: str) -> str:
+    digest = hashlib.sha256()
+    _update_file(digest, csv_path)
+    digest.update(rules_hash().encode('ascii'))
+    digest.update(CACHE_VERSION.encode('ascii'))
+    return digest.hexdigest()
+
+
+def default_cache_dir(csv_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(csv_path)), ".cache")
+
+
+def save_table(table: FoodTable, cache_path: str, key: str):
+    # Escrita atômica: workers concorrentes nunca leem um arquivo pela metade
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".npz")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, key=np.array(key), **table.to_arrays())
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def compile_cache(csv_path: str, cache_path: str, key: str) -> FoodTable:
+    rows = data_loader.read_taco_rows(csv_path)
+    table = FoodTable.from_rows(rows, list(data_loader.TACO_NUTRIENT_COLUMNS))
+    save_table(table, cache_path, key)
+    return table
+
+
+def _read_cache(cache_path: str, key: str) -> Optional[FoodTable]:
+    # None se o arquivo não existe, está corrompido ou pertence a outra chave
+    try:
+        with np.load(cache_path, allow_pickle=False) as data:
+            if str(data['key']) != key:
+                return None
+            return FoodTable.from_arrays({name: data[name] for name in data.files})
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def load_food_table(csv_path: str, cache_dir: Optional[str] = None) -> FoodTable:
+    key = cache_key(csv_path)
+    cache_path = os.path.join(cache_dir or default_cache_dir(csv_path), f"taco-{key[:16]}.npz")
+
+    table = _read_cache(cache_path, key)
+    if table is None:
+        table = compile_cache(csv_path, cache_path, key)
+    return table
+
+
+def load_combined_table(specs: Sequence[str], cache_dir: Optional[str] = None,
+                        chunk_size: int = 4096) -> FoodTable:
+    # Várias tabelas de composição combinadas (ver sources.py), com o mesmo cache .npz:
+    # a chave cobre o conteúdo e o esquema de cada fonte, a ordem e as regras de etiquetagem
+    from .sources import open_source, stream_table
+
+    sources = [open_source(spec) for spec in specs]
+    digest = hashlib.sha256()
+    for spec, source in zip(specs, sources):
+        digest.update(repr((spec, getattr(source, "schema", None))).encode('utf-8'))
+        _update_file(digest, source.path)
+    digest.update(rules_hash().encode('ascii'))
+    digest.update(CACHE_VERSION.encode('ascii'))
+    key = digest.hexdigest()
+    cache_path = os.path.join(cache_dir or default_cache_dir(sources[0].path), f"combined-{key[:16]}.npz")
+
+    table = _read_cache(cache_path, key)
+    if table is None:
+        table, _ = stream_table(sources, chunk_size)
+        save_table(table, cache_path, key)
+    return table
+
+
+def load_foods(csv_path: str, cache_dir: Optional[str] = None) -> List[Food]:
+    # Equivalente a get_foods_from_df(load_taco_data(csv_path)), usando o cache quando válido
+    return load_food_table(csv_path, cache_dir).to_foods()
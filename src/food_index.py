@@ -0,0 +1,206 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from .models import Food, Meal, Menu
+
+UNSAFE_TAG = "UNSAFE"
+
+# Restrições por usuário -> tag (ver tagging.TAG_RULES) dos alimentos a excluir
+RESTRICTIONS = {
+    "lactose": "LACTOSE",
+    "gluten": "GLUTEN",
+    "vegetarian": "ANIMAL",
+}
+
+def food_name_key(name: str) -> str:
+    # Nome para comparação: sem espaços nas pontas nem repetidos (a TACO tem nomes como
+    # ' Mamão, doce em calda, drenado' e 'Coco,  verde, cru')
+    return " ".join(name.split())
+
+
+# Representação compacta de um menu: ((nome da refeição, (posições dos alimentos...)), ...)
+# Com encode/decode as posições são as de FoodIndex.foods (válidas só para o mesmo índice,
+# ex: entre processos de um pool); com encode_ids/decode_ids são Food.food_id (linhas da
+# FoodTable), estáveis entre execuções e adequadas para persistência. Refeições com porções
+# ajustadas (ver portions.py) levam um terceiro elemento: (nome, ids, (porções...)).
+Genome = Tuple[Tuple, ...]
+
+
+class FoodIndex:
+    # Índice imutável construído uma única vez por lista de alimentos.
+    # Mapeia tags e categorias para tuplas pré-calculadas de candidatos, de modo que
+    # inicialização e mutação sorteiem em O(1) em vez de varrer o catálogo inteiro.
+    # Pode ser compartilhado entre instâncias do GA e sessões do Streamlit.
+
+    def __init__(self, foods: Sequence[Food]):
+        self.all_foods: Tuple[Food, ...] = tuple(foods)
+        self.foods: Tuple[Food, ...] = tuple(f for f in self.all_foods if UNSAFE_TAG not in f.tags)
+
+        self._by_tag = self._group(self.foods, lambda f: f.tags)
+        self._by_tag_unsafe = self._group(self.all_foods, lambda f: f.tags)
+        self._by_category = self._group(self.foods, lambda f: (f.category,))
+        self._by_category_unsafe = self._group(self.all_foods, lambda f: (f.category,))
+
+        # Posição de cada alimento seguro em self.foods (identidade do objeto)
+        self.position: Dict[int, int] = {id(f): i for i, f in enumerate(self.foods)}
+        self._nutrients = None
+        self.food_by_id: Dict[int, Food] = {f.food_id: f for f in self.all_foods if f.food_id >= 0}
+        # Nome normalizado (food_name_key) -> alimentos seguros com esse nome. Os inseguros só
+        # registram a chave: allowed_mask distingue "já fora do catálogo" de "nome desconhecido"
+        self._by_name: Dict[str, List[Food]] = {}
+        for f in self.all_foods:
+            foods = self._by_name.setdefault(food_name_key(f.name), [])
+            if UNSAFE_TAG not in f.tags:
+                foods.append(f)
+
+        # Consultas por substring de categoria ("Frutas" -> "Frutas e derivados") são memorizadas
+        self._category_matches: Dict[Tuple[str, bool], Tuple[Food, ...]] = {}
+
+        # Filtros por usuário: máscara de bits sobre as posições de self.foods (bit i = alimento
+        # permitido). O índice não muda; cada lista de candidatos vira um inteiro e a interseção
+        # com a máscara é um único AND. As listas filtradas ficam memorizadas por máscara (LRU):
+        # usuários com as mesmas restrições compartilham as mesmas tuplas.
+        self.all_allowed = (1 << len(self.foods)) - 1
+        self._pool_bits: Dict[tuple, int] = {}
+        self._restricted: "OrderedDict[int, Dict[tuple, Tuple[Food, ...]]]" = OrderedDict()
+        self.max_restricted_masks = 256
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _group(foods: Sequence[Food], keys) -> Dict[str, Tuple[Food, ...]]:
+        groups: Dict[str, List[Food]] = {}
+        for f in foods:
+            for key in keys(f):
+                groups.setdefault(key, []).append(f)
+        return {k: tuple(v) for k, v in groups.items()}
+
+    def __len__(self) -> int:
+        return len(self.foods)
+
+    @property
+    def nutrients(self) -> np.ndarray:
+        # Matriz (n_foods, 4): calorias, proteínas, carboidratos, gorduras
+        if self._nutrients is None:
+            self._nutrients = np.array(
+                [(f.calories, f.proteins, f.carbs, f.fats) for f in self.foods], dtype=np.float64
+            ).reshape(-1, 4)
+        return self._nutrients
+
+    def ids_of(self, pool: Sequence[Food]) -> np.ndarray:
+        return np.fromiter((self.position[id(f)] for f in pool), dtype=np.int64, count=len(pool))
+
+    @staticmethod
+    def _gene(meal: Meal, ids: Tuple[int, ...]) -> tuple:
+        return (meal.name, ids, meal.portions) if meal.portions else (meal.name, ids)
+
+    @staticmethod
+    def _meal(entry: Sequence, foods: List[Food]) -> Meal:
+        return Meal(entry[0], foods, tuple(entry[2]) if len(entry) > 2 else ())
+
+    def encode(self, menu: Menu) -> Genome:
+        return tuple(self._gene(meal, tuple(self.position[id(f)] for f in meal.foods)) for meal in menu.meals)
+
+    def decode(self, genome: Genome) -> Menu:
+        return Menu(meals=[self._meal(entry, [self.foods[i] for i in entry[1]]) for entry in genome])
+
+    def encode_ids(self, menu: Menu) -> Genome:
+        return tuple(self._gene(meal, tuple(f.food_id for f in meal.foods)) for meal in menu.meals)
+
+    def decode_ids(self, genome: Genome) -> Menu:
+        # KeyError se algum food_id não pertence a este catálogo
+        return Menu(meals=[self._meal(entry, [self.food_by_id[i] for i in entry[1]]) for entry in genome])
+
+    def by_tag(self, tag: str, include_unsafe: bool = False) -> Tuple[Food, ...]:
+        groups = self._by_tag_unsafe if include_unsafe else self._by_tag
+        return groups.get(tag, ())
+
+    def by_category(self, category: str, include_unsafe: bool = False) -> Tuple[Food, ...]:
+        groups = self._by_category_unsafe if include_unsafe else self._by_category
+        return groups.get(category, ())
+
+    def matching_category(self, value: str, include_unsafe: bool = False) -> Tuple[Food, ...]:
+        key = (value.lower(), include_unsafe)
+        cached = self._category_matches.get(key)
+        if cached is None:
+            groups = self._by_category_unsafe if include_unsafe else self._by_category
+            cached = tuple(f for cat, pool in groups.items() if key[0] in cat.lower() for f in pool)
+            self._category_matches[key] = cached
+        return cached
+
+    def candidates(self, requirement: dict, allowed: Optional[int] = None) -> Tuple[Food, ...]:
+        # Requisito de slot do template: {"type": "cat"|"tag", "val": ...}
+        if requirement["type"] == "cat":
+            key = ("match", requirement["val"])
+            pool = self.matching_category(requirement["val"])
+        elif requirement["type"] == "tag":
+            key = ("tag", requirement["val"])
+            pool = self.by_tag(requirement["val"])
+        else:
+            key, pool = ("none",), ()
+
+        #Fallback: qualquer alimento seguro (permitido)
+        return self.restrict(key, pool, allowed) or self.allowed_foods(allowed)
+
+    # --- Restrições por usuário ---------------------------------------------------
+
+    def bits_of(self, pool: Iterable[Food]) -> int:
+        # Conjunto de alimentos (seguros) como máscara de bits sobre as posições de self.foods
+        flags = np.zeros(len(self.foods), dtype=bool)
+        flags[self.ids_of(tuple(pool))] = True
+        return int.from_bytes(np.packbits(flags, bitorder='little').tobytes(), 'little')
+
+    def foods_of(self, bits: int) -> Tuple[Food, ...]:
+        nbytes = (len(self.foods) + 7) // 8
+        flags = np.unpackbits(np.frombuffer(bits.to_bytes(nbytes, 'little'), dtype=np.uint8),
+                              count=len(self.foods), bitorder='little')
+        return tuple(self.foods[i] for i in np.flatnonzero(flags))
+
+    def allowed_mask(self, restrictions: Iterable[str] = (), excluded: Iterable[str] = ()) -> int:
+        # Máscara de um usuário: todos os alimentos seguros menos as tags das restrições
+        # (chaves de RESTRICTIONS) e os alimentos pelo nome (ex: os que ele não gosta).
+        # Nomes comparados por food_name_key; um nome fora do catálogo é ValueError, como
+        # uma restrição desconhecida (um erro de digitação não pode passar em silêncio)
+        mask = self.all_allowed
+        for restriction in restrictions:
+            if restriction not in RESTRICTIONS:
+                raise ValueError(f"Restrição desconhecida: {restriction} (disponíveis: {list(RESTRICTIONS)})")
+            mask &= ~self.bits_of(self.by_tag(RESTRICTIONS[restriction]))
+        keys = {food_name_key(name) for name in excluded}
+        unknown = sorted(key for key in keys if key not in self._by_name)
+        if unknown:
+            raise ValueError(f"Alimentos desconhecidos: {unknown}")
+        if keys:
+            mask &= ~self.bits_of(f for key in keys for f in self._by_name[key])
+        return mask
+
+    def restrict(self, key: tuple, pool: Tuple[Food, ...], allowed: Optional[int]) -> Tuple[Food, ...]:
+        # `pool` filtrado pela máscara; `key` identifica o pool (ex: ("tag", "MEAT"))
+        if allowed is None or allowed == self.all_allowed:
+            return pool
+        with self._lock:
+            pools = self._restricted.get(allowed)
+            if pools is None:
+                pools = self._restricted[allowed] = {}
+                while len(self._restricted) > self.max_restricted_masks:
+                    self._restricted.popitem(last=False)
+            else:
+                self._restricted.move_to_end(allowed)
+            cached = pools.get(key)
+        if cached is None:
+            bits = self._pool_bits.get(key)
+            if bits is None:
+                bits = self._pool_bits[key] = self.bits_of(pool)
+            cached = self.foods_of(bits & allowed)
+            with self._lock:
+                pools[key] = cached
+        return cached
+
+    def allowed_foods(self, allowed: Optional[int] = None) -> Tuple[Food, ...]:
+        return self.restrict(("all",), self.foods, allowed)
+
+    def allowed_by_tag(self, tag: str, allowed: Optional[int] = None) -> Tuple[Food, ...]:
+        return self.restrict(("tag", tag), self.by_tag(tag), allowed)
+
+    def allowed_by_category(self, category: str, allowed: Optional[int] = None) -> Tuple[Food, ...]:
+        return self.restrict(("category", category), self.by_category(category), allowed)
@@ -0,0 +1,116 @@
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from .models import Food, NutrientBound
+from .tagging import TAG_BITS, mask_to_tags, tag_masks
+
+
+class FoodTable:
+    # Tabela de composição em formato struct-of-arrays: nomes, categorias, tags em
+    # bitmask e todas as colunas numéricas numa única matriz float32 contígua
+    # (n_alimentos, n_nutrientes). A linha de cada alimento é o seu Food.food_id.
+
+    def __init__(self, names: Sequence[str], categories: Sequence[str], tag_masks: Sequence[int],
+                 nutrients: np.ndarray, nutrient_names: Sequence[str]):
+        self.names = np.asarray(names, dtype=str)
+        self.categories = np.asarray(categories, dtype=str)
+        self.tag_masks = np.asarray(tag_masks, dtype=np.uint16)
+        self.nutrients = np.ascontiguousarray(nutrients, dtype=np.float32).reshape(len(self.names), -1)
+        self.nutrient_names = tuple(nutrient_names)
+        self._columns: Dict[str, int] = {name: i for i, name in enumerate(self.nutrient_names)}
+
+    @classmethod
+    def from_rows(cls, rows: List[dict], nutrient_names: Sequence[str]) -> "FoodTable":
+        names = [row['name'] for row in rows]
+        categories = [row['category'] for row in rows]
+        nutrients = np.array([[row[n] for n in nutrient_names] for row in rows], dtype=np.float32)
+        return cls(names, categories, tag_masks(names, categories), nutrients.reshape(len(rows), len(nutrient_names)),
+                   nutrient_names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def nutrient_index(self, nutrient: str) -> int:
+        if nutrient not in self._columns:
+            raise ValueError(f"Nutriente desconhecido: {nutrient} (disponíveis: {', '.join(self.nutrient_names)})")
+        return self._columns[nutrient]
+
+    def column(self, nutrient: str) -> np.ndarray:
+        return self.nutrients[:, self.nutrient_index(nutrient)]
+
+    def to_foods(self, include_unsafe: bool = False) -> List[Food]:
+        # Os valores da TACO têm no máximo 2 casas decimais; o arredondamento remove o ruído do float32
+        macros = np.round(self.nutrients[:, [self.nutrient_index(n) for n in ("calories", "proteins", "carbs", "fats")]]
+                          .astype(np.float64), 4).tolist()
+        unsafe_bit = TAG_BITS["UNSAFE"]
+        tag_tuples = {}
+        foods = []
+        for food_id, (name, category, mask, (cals, prot, carb, fat)) in enumerate(
+                zip(self.names.tolist(), self.categories.tolist(), self.tag_masks.tolist(), macros)):
+            if mask & unsafe_bit and not include_unsafe:
+                continue
+            if mask not in tag_tuples:
+                tag_tuples[mask] = mask_to_tags(mask)
+            foods.append(Food(name=name, calories=cals, proteins=prot, carbs=carb, fats=fat,
+                              category=category, tags=tag_tuples[mask], food_id=food_id))
+        return foods
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        categories, codes = np.unique(self.categories, return_inverse=True)
+        return dict(names=self.names, categories=categories, category_codes=codes.astype(np.int32),
+                    tag_masks=self.tag_masks, nutrients=self.nutrients,
+                    nutrient_names=np.array(self.nutrient_names, dtype=str))
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "FoodTable":
+        return cls(arrays['names'], arrays['categories'][arrays['category_codes']], arrays['tag_masks'],
+                   arrays['nutrients'], arrays['nutrient_names'].tolist())
+
+
+class NutrientConstraints:
+    # Limites arbitrários por nutriente compilados em matriz: os totais de todas as
+    # restrições de um menu saem de uma única operação sobre a matriz, e a penalidade
+    # é calculada de uma vez para todas, então o custo quase não cresce com o número de limites.
+
+    def __init__(self, table: FoodTable, bounds: Sequence[NutrientBound]):
+        columns = [table.nutrient_index(b.nutrient) for b in bounds]
+        self.bounds = list(bounds)
+        self.matrix = table.nutrients[:, columns].astype(np.float64)
+        self.lower = np.array([-np.inf if b.minimum is None else b.minimum for b in bounds], dtype=np.float64)
+        self.upper = np.array([np.inf if b.maximum is None else b.maximum for b in bounds], dtype=np.float64)
+        self.scale = np.array([self._scale(b) for b in bounds], dtype=np.float64)
+
+    @staticmethod
+    def _scale(bound: NutrientBound) -> float:
+        if bound.scale is not None:
+            return bound.scale
+        reference = bound.maximum if bound.maximum is not None else bound.minimum
+        return max(abs(reference or 0.0) * 0.05, 1.0)
+
+    def __len__(self) -> int:
+        return len(self.bounds)
+
+    @staticmethod
+    def _indices(food_ids: Sequence[int]) -> np.ndarray:
+        # Food.food_id = -1 (alimento criado fora da tabela) indexaria a última linha sem erro
+        ids = np.asarray(food_ids, dtype=np.int64)
+        if ids.size and ids.min() < 0:
+            raise ValueError("Alimento sem food_id (fora da FoodTable): não é possível avaliar os limites extras")
+        return ids
+
+    def rows(self, food_ids: Sequence[int]) -> np.ndarray:
+        # Submatriz (len(food_ids), n_limites), ex: alinhada às posições de um FoodIndex
+        return self.matrix[self._indices(food_ids)]
+
+    def totals(self, food_ids: Sequence[int], portions: Optional[Sequence[float]] = None) -> np.ndarray:
+        # Equivalente a contagens(n_alimentos) @ matriz, sem materializar o vetor de contagens.
+        # portions: multiplicador de cada item (None = todos 1.0)
+        rows = self.matrix[self._indices(food_ids)]
+        if portions is None:
+            return rows.sum(axis=0)
+        return np.asarray(portions, dtype=np.float64) @ rows
+
+    def penalty(self, totals: np.ndarray) -> np.ndarray:
+        # totals: (..., n_limites) -> erro quadrático normalizado (...)
+        below = np.clip(self.lower - totals, 0.0, None)
+        above = np.clip(totals - self.upper, 0.0, None)
+        return (((below + above) / self.scale) ** 2).sum(axis=-1)
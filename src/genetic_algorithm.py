@@ -1,204 +1,359 @@
-import random
-import copy
-from typing import List, Callable
+import time
+from typing import TYPE_CHECKING, List, Callable, Optional, Tuple, Union
 from .models import Food, Meal, Menu, NutritionalTargets
+from .food_index import FoodIndex
+from .food_table import FoodTable
+from .optimizer import Optimizer, StopReason
+from .portions import PortionOptimizer
+from .niching import FitnessMemo, shared_fitness
+from .initializer import FeasibleInitializer
+from .neighbors import SubstitutionIndex
+from .telemetry import NO_TIMER, NullTimer, PhaseTimer
 
-class GeneticAlgorithm:
+if TYPE_CHECKING:
+    from .telemetry import Telemetry
+
+# Modelos estruturais das refeições: (nome, requisitos de cada slot)
+MEAL_TEMPLATES = [
+    ("Café da Manhã", [
+        {"type": "cat", "val": "Frutas"},
+        {"type": "tag", "val": "DAIRY"},
+        {"type": "tag", "val": "BREAKFAST_CEREAL"}
+    ]),
+    ("Almoço", [
+        {"type": "tag", "val": "LUNCH_CARB"},
+        {"type": "cat", "val": "Leguminosas"}, # Maioria dos feijões são cozidos se não filtrados por 'cru'
+        {"type": "tag", "val": "MEAT"},
+        {"type": "cat", "val": "Verduras"}
+    ]),
+    ("Lanche", [
+        {"type": "cat", "val": "Frutas"},
+        {"type": "tag", "val": "DAIRY"}
+    ]),
+    ("Jantar", [
+        {"type": "tag", "val": "LUNCH_CARB"}, # Jantar leve
+        {"type": "tag", "val": "MEAT"},
+        {"type": "cat", "val": "Verduras"}
+    ])
+]
+
+# Tags que a mutação tenta preservar ao substituir um alimento
+PRIORITY_TAGS = ["MEAT", "LUNCH_CARB", "BREAKFAST_CEREAL", "DAIRY"]
+
+class PortionStage:
+    # Quando aplicar o ajuste contínuo de porções (GeneticAlgorithm.portion_stage)
+    ELITE = "elite"    # nos elites de cada geração (GA memético)
+    FINAL = "final"    # uma vez, nos melhores menus ao final
+
+class GeneticAlgorithm(Optimizer):
     def __init__(self, 
                  foods: List[Food], 
                  targets: NutritionalTargets,
                  population_size: int = 200, 
                  generations: int = 50,
                  mutation_rate: float = 0.1,
-                 elite_size: int = 4):
-        self.foods = foods
-        self.targets = targets
+                 elite_size: int = 4,
+                 index: Optional[FoodIndex] = None,
+                 seed: Optional[int] = None,
+                 target_fitness: Optional[float] = None,
+                 stagnation_generations: Optional[int] = None,
+                 min_diversity: Optional[float] = None,
+                 deadline_ms: Optional[float] = None,
+                 food_table: Optional[FoodTable] = None,
+                 initial_population: Optional[List[Menu]] = None,
+                 portion_stage: Optional[str] = None,
+                 portion_bounds: Tuple[float, float] = (0.5, 2.0),
+                 telemetry: Optional["Telemetry"] = None,
+                 fitness_memo_size: Optional[int] = None,
+                 niche_radius: Optional[float] = None,
+                 top_k_distance: float = 0.25,
+                 feasible_fraction: float = 0.0,
+                 allowed: Optional[int] = None,
+                 neighbor_mutation: float = 0.0,
+                 substitutions: Optional[SubstitutionIndex] = None):
+        super().__init__(foods, targets, index=index, seed=seed, target_fitness=target_fitness,
+                         deadline_ms=deadline_ms, food_table=food_table, allowed=allowed,
+                         top_k_distance=top_k_distance)
         self.population_size = population_size
         self.generations = generations
         self.mutation_rate = mutation_rate
         self.elite_size = elite_size
-        self.population: List[Menu] = []
+
+        # Critérios de parada antecipada próprios do GA (None = desativado)
+        self.stagnation_generations = stagnation_generations
+        self.min_diversity = min_diversity
+        self.generations_run = 0
+
+        # Menus usados para semear a população inicial (warm start); o restante é aleatório
+        self.initial_population = initial_population or []
+
+        # Ajuste de porções (None = porções fixas de 100 g)
+        if portion_stage not in (None, PortionStage.ELITE, PortionStage.FINAL):
+            raise ValueError(f"portion_stage inválido: {portion_stage}")
+        self.portion_stage = portion_stage
+        self.portion_optimizer = None
+        if portion_stage is not None:
+            self.portion_optimizer = PortionOptimizer(targets, *portion_bounds, constraints=self.constraints)
+
+        # Instrumentação por geração (ver telemetry.py); None = desligada, sem custo no laço
+        self.telemetry = telemetry
+
+        # Fitness memorizado por Menu.fingerprint (0 = sem memo). None = automático: só com
+        # limites extras, quando o fitness custa mais que a impressão digital; com os 4 macros
+        # em cache o recálculo é mais barato que a consulta
+        if fitness_memo_size is None:
+            fitness_memo_size = 4096 if self.constraints is not None else 0
+        self.fitness_memo = FitnessMemo(fitness_memo_size) if fitness_memo_size else None
+        # Niching: a seleção usa o fitness compartilhado entre menus a menos de
+        # niche_radius (distância de Jaccard) uns dos outros (None = fitness puro)
+        self.niche_radius = niche_radius
+        self._selection_scores: Optional[List[float]] = None
+
+        # Fração da população inicial construída já perto das metas (ver initializer.py);
+        # o restante continua aleatório, para manter a diversidade
+        if not 0.0 <= feasible_fraction <= 1.0:
+            raise ValueError(f"feasible_fraction deve estar entre 0 e 1: {feasible_fraction}")
+        self.feasible_fraction = feasible_fraction
+        self._initializer: Optional[FeasibleInitializer] = None
+
+        # Probabilidade de um 'replace' da mutação trocar o alimento por um dos vizinhos mais
+        # próximos em nutrientes (passo curto) em vez de um sorteio uniforme no grupo.
+        # O índice de substituições pode ser compartilhado (ex: st.cache_resource)
+        if not 0.0 <= neighbor_mutation <= 1.0:
+            raise ValueError(f"neighbor_mutation deve estar entre 0 e 1: {neighbor_mutation}")
+        self.neighbor_mutation = neighbor_mutation
+        self.substitutions = substitutions
+        if neighbor_mutation and substitutions is None:
+            self.substitutions = SubstitutionIndex(self.index, PRIORITY_TAGS)
 
     def initialize_population(self):
-        self.population = []
-        for _ in range(self.population_size):
+        # Sementes viram menus novos (refeições compartilhadas), com fitness a recalcular
+        self.population = [Menu(meals=list(m.meals)) for m in self.initial_population[:self.population_size]]
+        feasible = min(round(self.feasible_fraction * self.population_size),
+                       self.population_size - len(self.population))
+        if feasible > 0:
+            if self._initializer is None:
+                self._initializer = FeasibleInitializer(self.index, self.targets, MEAL_TEMPLATES,
+                                                        constraints=self.constraints, allowed=self.allowed)
+            # Faixas fora do alcance dos pools do template (ex: metas extremas ou restrições
+            # fortes): o guloso só empurraria todos esses menus para o mesmo extremo, então a
+            # população inteira fica com o sorteio aleatório
+            if self._initializer.reachable():
+                self.population += self._initializer.menus(feasible, self.rng)
+        while len(self.population) < self.population_size:
             self.population.append(self._generate_random_menu())
 
     def _generate_random_menu(self) -> Menu:
-       
-        menu = Menu(meals=[
-            self._create_template_meal("Café da Manhã", [
-                {"type": "cat", "val": "Frutas"},
-                {"type": "tag", "val": "DAIRY"},
-                {"type": "tag", "val": "BREAKFAST_CEREAL"}
-            ]),
-            self._create_template_meal("Almoço", [
-                {"type": "tag", "val": "LUNCH_CARB"},
-                {"type": "cat", "val": "Leguminosas"}, # Maioria dos feijões são cozidos se não filtrados por 'cru'
-                {"type": "tag", "val": "MEAT"},
-                {"type": "cat", "val": "Verduras"}
-            ]),
-            self._create_template_meal("Lanche", [
-                {"type": "cat", "val": "Frutas"},
-                {"type": "tag", "val": "DAIRY"}
-            ]),
-            self._create_template_meal("Jantar", [
-                {"type": "tag", "val": "LUNCH_CARB"}, # Jantar leve
-                {"type": "tag", "val": "MEAT"},
-                {"type": "cat", "val": "Verduras"}
-            ])
-        ])
-        return menu
+        return Menu(meals=[self._create_template_meal(name, reqs) for name, reqs in MEAL_TEMPLATES])
 
     def _create_template_meal(self, name: str, requirements: List[dict]) -> Meal:
-        items = []
-        for req in requirements:
-            candidates = []
-            if req["type"] == "cat":
-                candidates = [f for f in self.foods if req["val"].lower() in f.category.lower()]
-            elif req["type"] == "tag":
-                candidates = [f for f in self.foods if req["val"] in f.tags]
-            
-            if not candidates:
-                #Fallback: correspondência simples de categoria ou aleatório
-                candidates = self.foods
-            
-            items.append(random.choice(candidates))
-            
+        items = [self.rng.choice(self.index.candidates(req, self.allowed)) for req in requirements]
         return Meal(name=name, foods=items)
 
-    def calculate_fitness(self, menu: Menu) -> float:
-        # Fitness = 1 / (1 + Erro)
-        # Erro = Soma dos desvios quadrados das metas (normalizado)
-        
-        cals = menu.total_calories
-        prots = menu.total_proteins
-        carbs = menu.total_carbs
-        fats = menu.total_fats
-        
-        error = 0.0
-        # Penaliza se estiver fora do intervalo
-        # Eleva ao quadrado para penalizar outliers mais fortemente
-        
-        if cals < self.targets.min_calories:
-            error += ((self.targets.min_calories - cals) / 100) ** 2
-        elif cals > self.targets.max_calories:
-            error += ((cals - self.targets.max_calories) / 100) ** 2
-            
-        if prots < self.targets.min_proteins:
-            error += ((self.targets.min_proteins - prots) / 10) ** 2
-        elif prots > self.targets.max_proteins:
-            error += ((prots - self.targets.max_proteins) / 10) ** 2
-
-        if carbs < self.targets.min_carbs:
-            error += ((self.targets.min_carbs - carbs) / 10) ** 2
-        elif carbs > self.targets.max_carbs:
-            error += ((carbs - self.targets.max_carbs) / 10) ** 2
-            
-        if fats < self.targets.min_fats:
-            error += ((self.targets.min_fats - fats) / 10) ** 2
-        elif fats > self.targets.max_fats:
-            error += ((fats - self.targets.max_fats) / 10) ** 2
-            
-        return 1.0 / (1.0 + error)
-
     def select_parents(self) -> List[Menu]:
         tournament_size = 5
+        # Com niching o torneio compara o fitness compartilhado (elitismo continua pelo fitness puro)
+        scores = self._selection_scores if self.niche_radius is not None else \
+            [m.fitness_score for m in self.population]
+        positions = range(len(self.population))
         parents = []
         for _ in range(self.population_size - self.elite_size):
-            tournament = random.sample(self.population, tournament_size)
-            winner = max(tournament, key=lambda m: m.fitness_score)
-            parents.append(winner)
+            tournament = self.rng.sample(positions, tournament_size)
+            winner = max(tournament, key=scores.__getitem__)
+            parents.append(self.population[winner])
         return parents
 
     def crossover(self, parent1: Menu, parent2: Menu) -> Menu:
         #Crossover uniforme no nível da refeicao
+        # Refeições são imutáveis, então o filho apenas referencia as dos pais
         new_meals = []
+        from_p1 = 0
         for i in range(len(parent1.meals)):
-            if random.random() < 0.5:
+            if self.rng.random() < 0.5:
                 
-                new_meals.append(copy.deepcopy(parent1.meals[i]))
+                new_meals.append(parent1.meals[i])
+                from_p1 += 1
             else:
-                new_meals.append(copy.deepcopy(parent2.meals[i]))
-        return Menu(meals=new_meals)
+                new_meals.append(parent2.meals[i])
+        child = Menu(meals=new_meals)
+
+        # Filho idêntico a um dos pais herda o fitness já calculado
+        if from_p1 in (0, len(new_meals)):
+            parent = parent1 if from_p1 else parent2
+            child.fitness_score = parent.fitness_score
+            child.fitness_valid = parent.fitness_valid
+        return child
 
     def mutate(self, menu: Menu):
-        for meal in menu.meals:
-            if random.random() < self.mutation_rate:
+        # Refeições alteradas são substituídas por novas (copy-on-write), e o menu
+        # atualiza seus totais por delta
+        for i, meal in enumerate(menu.meals):
+            if self.rng.random() < self.mutation_rate:
               
                 # Reduzimos probabilidade de add/remove para manter a estrutura "Template" estável
-                mutation_type = random.choice(['replace', 'replace', 'replace', 'add', 'remove'])
+                mutation_type = self.rng.choice(['replace', 'replace', 'replace', 'add', 'remove'])
                 
                 if mutation_type == 'replace' and len(meal.foods) > 0:
-                    idx = random.randint(0, len(meal.foods) - 1)
+                    idx = self.rng.randint(0, len(meal.foods) - 1)
                     old_food = meal.foods[idx]
+
+                    if self.neighbor_mutation and self.rng.random() < self.neighbor_mutation:
+                        near = self.substitutions.neighbors_of(old_food, self.allowed)
+                        if near:
+                            menu.replace_meal(i, meal.replace_food(idx, self.rng.choice(near)))
+                            continue
                     
                     #Tenta encontrar um substituto com as MESMAS TAGS primeiro
-                    candidates = []
                     #Heurística: Se alimento antigo tem tags específicas, tenta manter.
-                    priority_tags = ["MEAT", "LUNCH_CARB", "BREAKFAST_CEREAL", "DAIRY"]
-                    target_tag = next((t for t in priority_tags if t in old_food.tags), None)
-                    
-                    if target_tag:
-                         candidates = [f for f in self.foods if target_tag in f.tags]
+                    target_tag = next((t for t in PRIORITY_TAGS if t in old_food.tags), None)
+                    candidates = self.index.allowed_by_tag(target_tag, self.allowed) if target_tag else ()
                     
                     if not candidates:
-                        candidates = [f for f in self.foods if f.category == old_food.category]
+                        candidates = self.index.allowed_by_category(old_food.category, self.allowed)
                         
                     if not candidates:
-                        candidates = self.foods
+                        candidates = self.index.allowed_foods(self.allowed)
                         
-                    meal.foods[idx] = random.choice(candidates)
+                    menu.replace_meal(i, meal.replace_food(idx, self.rng.choice(candidates)))
                 
                 elif mutation_type == 'add':
                     #Adiciona alimento aleatório
-                    meal.foods.append(random.choice(self.foods))
+                    menu.replace_meal(i, meal.add_food(self.rng.choice(self.index.allowed_foods(self.allowed))))
                     
                 elif mutation_type == 'remove' and len(meal.foods) > 1:
-                    idx = random.randint(0, len(meal.foods) - 1)
-                    meal.foods.pop(idx)
+                    idx = self.rng.randint(0, len(meal.foods) - 1)
+                    menu.replace_meal(i, meal.remove_food(idx))
+
+    def evaluate_population(self):
+        #Avaliacao de fitness (só para menus cujos totais mudaram; elites não são reavaliados)
+        memo = self.fitness_memo
+        for individual in self.population:
+            if individual.fitness_valid:
+                continue
+            if memo is None:
+                score = None
+            else:
+                key = individual.fingerprint
+                score = memo.get(key)
+            if score is None:
+                score = self.calculate_fitness(individual)
+                self.evaluations += 1
+                if memo is not None:
+                    memo.put(key, score)
+            individual.fitness_score = score
+            individual.fitness_valid = True
+        
+        # Ordena por fitness (decrescente)
+        self.population.sort(key=lambda x: x.fitness_score, reverse=True)
+        self._update_selection_scores()
+
+    def _update_selection_scores(self):
+        if self.niche_radius is not None:
+            self._selection_scores = shared_fitness(self.population, self.niche_radius)
+
+    def refine_portions(self, count: int):
+        # Ajusta as porções dos `count` melhores menus (população avaliada e ordenada).
+        # Um menu só é trocado pela versão ajustada se o fitness melhorar; depois reordena.
+        positions = [i for i, m in enumerate(self.population[:count]) if m.fitness_score < 1.0]
+        if not positions:
+            return
+        refined = self.portion_optimizer.optimize([self.population[i] for i in positions])
+        self.evaluations += len(refined)
+        for i, menu in zip(positions, refined):
+            menu.fitness_score = self.calculate_fitness(menu)
+            menu.fitness_valid = True
+            if menu.fitness_score > self.population[i].fitness_score:
+                self.population[i] = menu
+        self.population.sort(key=lambda x: x.fitness_score, reverse=True)
+        self._update_selection_scores()
+
+    def next_generation(self, timer: Union[PhaseTimer, NullTimer] = NO_TIMER):
+        # timer: mede seleção, crossover e mutação quando a telemetria está ligada
+        # (ver telemetry.PhaseTimer); o padrão não mede nada
+        with timer.phase("selection"):
+            #Elitismo: mantém os melhores N
+            next_population = self.population[:self.elite_size]
+
+            #Seleção
+            parents = self.select_parents()
+
+        #Loop de Generação
+        while len(next_population) < self.population_size:
+            with timer.phase("crossover"):
+                p1 = self.rng.choice(parents)
+                p2 = self.rng.choice(parents)
+                child = self.crossover(p1, p2)
+            with timer.phase("mutation"):
+                self.mutate(child)
+            next_population.append(child)
+
+        self.population = next_population
+
+    def diversity(self) -> float:
+        # Fração de genótipos distintos na população (1.0 = todos diferentes)
+        if not self.population:
+            return 0.0
+        return len({menu.fingerprint for menu in self.population}) / len(self.population)
+
+    def _stop_reason(self, best_fitness: float, stagnant: int, start: float) -> Optional[str]:
+        if self.target_fitness is not None and best_fitness >= self.target_fitness:
+            return StopReason.TARGET_FITNESS
+        if self.stagnation_generations is not None and stagnant >= self.stagnation_generations:
+            return StopReason.STAGNATION
+        if self.min_diversity is not None and self.diversity() < self.min_diversity:
+            return StopReason.DIVERSITY_COLLAPSE
+        if self._deadline_passed(start):
+            return StopReason.DEADLINE
+        return None
 
     def run(self, progress_callback: Callable = None) -> List[Menu]:
+        # Ao parar antecipadamente, devolve os melhores menus encontrados até ali;
+        # o motivo fica em self.stop_reason
+        start = time.perf_counter()
+        self.stop_reason = StopReason.COMPLETED
+        self.generations_run = 0
+        self.evaluations = 0
         self.initialize_population()
         
+        telemetry = self.telemetry
+        best_so_far = None
+        stagnant = 0
         for generation in range(self.generations):
-            #Avaliacao de fitness
-            for individual in self.population:
-                individual.fitness_score = self.calculate_fitness(individual)
-            
-            # Ordena por fitness (decrescente)
-            self.population.sort(key=lambda x: x.fitness_score, reverse=True)
+            if telemetry is None:
+                self.evaluate_population()
+                if self.portion_stage == PortionStage.ELITE:
+                    self.refine_portions(self.elite_size)
+            else:
+                record = telemetry.start(generation, self.evaluations)
+                telemetry.timed(record, "evaluate", self.evaluate_population)
+                if self.portion_stage == PortionStage.ELITE:
+                    telemetry.timed(record, "portions", self.refine_portions, self.elite_size)
+                telemetry.observe(record, self)
             
             best_fitness = self.population[0].fitness_score
             if progress_callback:
                 progress_callback(generation, best_fitness)
-            
-            #Elitismo: mantém os melhores N
-            next_population = self.population[:self.elite_size]
-            
-            #Seleção
-            parents = self.select_parents() 
-            
-            #Loop de Generação
-            while len(next_population) < self.population_size:
-                p1 = random.choice(parents)
-                p2 = random.choice(parents)
-                child = self.crossover(p1, p2)
-                self.mutate(child)
-                next_population.append(child)
-            
-            self.population = next_population
+            self.generations_run = generation + 1
 
-        # >>> Retorna os top 3 menus únicos
-        unique_menus = []
-        seen_calories = set()
-        
-        for menu in self.population:
-            cal_int = int(menu.total_calories)
-            if cal_int not in seen_calories:
-                unique_menus.append(menu)
-                seen_calories.add(cal_int)
-            if len(unique_menus) >= 3:
+            if best_so_far is None or best_fitness > best_so_far:
+                best_so_far, stagnant = best_fitness, 0
+            else:
+                stagnant += 1
+
+            reason = self._stop_reason(best_fitness, stagnant, start)
+            if reason is not None:
+                self.stop_reason = reason
+                if telemetry is not None:
+                    telemetry.finish(record)
                 break
-                
-        return unique_menus
+            
+            if telemetry is None:
+                self.next_generation()
+            else:
+                self.next_generation(PhaseTimer(record.phases))
+                telemetry.finish(record)
+
+        self.evaluate_population()
+        if self.portion_stage == PortionStage.FINAL:
+            self.refine_portions(max(self.elite_size, 10))
+        return self.top_menus()
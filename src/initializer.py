@@ -0,0 +1,115 @@
+import random
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from .models import Meal, Menu, NutritionalTargets
+from .food_index import FoodIndex
+from .food_table import NutrientConstraints
+from .portions import MACRO_SCALES
+
+# Inicialização guiada pelas metas: em vez de sortear cada slot do template de forma
+# uniforme, constrói menus já (quase) dentro das faixas de NutritionalTargets.
+#
+# Guloso aleatorizado, vetorizado sobre todos os menus a construir: os slots são
+# preenchidos em ordem e, em cada um, `sample_size` candidatos sorteados do pool do slot
+# são comparados pelo total projetado = já escolhido + candidato + média dos slots
+# restantes; vence o mais próximo do centro das faixas de macros (normalizado pelas
+# escalas do fitness) e dentro dos limites extras. Depois, `sweeps` passadas de busca
+# coordenada re-sorteiam cada slot com os demais fixos. O sorteio dos candidatos mantém
+# a diversidade entre os menus gerados.
+
+
+class FeasibleInitializer:
+    def __init__(self,
+                 index: FoodIndex,
+                 targets: NutritionalTargets,
+                 templates: Sequence[Tuple[str, List[dict]]],
+                 constraints: Optional[NutrientConstraints] = None,
+                 sample_size: int = 24,
+                 sweeps: int = 2,
+                 allowed: Optional[int] = None):
+        self.index = index
+        self.templates = templates
+        self.sample_size = sample_size
+        self.sweeps = sweeps
+
+        # Faixa alvo de cada coluna, normalizada. Macros: o centro da faixa de NutritionalTargets
+        # (o guloso mira o meio, deixando folga para o crossover/mutação). Limites extras:
+        # a própria faixa, só penalizando o que sair dela (lados abertos são infinitos)
+        center = [(targets.min_calories + targets.max_calories) / 2,
+                  (targets.min_proteins + targets.max_proteins) / 2,
+                  (targets.min_carbs + targets.max_carbs) / 2,
+                  (targets.min_fats + targets.max_fats) / 2]
+        lower, upper, scales = np.array(center), np.array(center), MACRO_SCALES
+        # Nutrientes de cada alimento do índice: (n_foods, n_colunas)
+        nutrients = index.nutrients
+        if constraints is not None and len(constraints):
+            lower = np.concatenate([lower, constraints.lower])
+            upper = np.concatenate([upper, constraints.upper])
+            scales = np.concatenate([scales, constraints.scale])
+            nutrients = np.hstack([nutrients, constraints.rows([f.food_id for f in index.foods])])
+        self.nutrients = nutrients / scales
+        self.lower = lower / scales
+        self.upper = upper / scales
+
+        # Pools por slot (posições em index.foods) e faixa/média de nutrientes de cada slot
+        self.meal_names = [name for name, _ in templates]
+        self.slot_meal: List[int] = []
+        self.pools: List[np.ndarray] = []
+        for m, (_, requirements) in enumerate(templates):
+            for req in requirements:
+                self.slot_meal.append(m)
+                self.pools.append(index.ids_of(index.candidates(req, allowed)))
+        self.slot_min = np.array([self.nutrients[p].min(axis=0) for p in self.pools])
+        self.slot_max = np.array([self.nutrients[p].max(axis=0) for p in self.pools])
+        self.slot_mean = np.array([self.nutrients[p].mean(axis=0) for p in self.pools])
+
+    def reachable(self) -> bool:
+        # As faixas são atingíveis com um alimento por slot? (teste por coluna, isoladamente)
+        return bool(np.all(self.slot_min.sum(axis=0) <= self.upper) and
+                    np.all(self.slot_max.sum(axis=0) >= self.lower))
+
+    def error(self, totals: np.ndarray) -> np.ndarray:
+        # (..., n_colunas) -> distância quadrática normalizada até as faixas alvo (...)
+        below = np.clip(self.lower - totals, 0.0, None)
+        above = np.clip(totals - self.upper, 0.0, None)
+        return ((below + above) ** 2).sum(axis=-1)
+
+    def _pick(self, rng: np.random.Generator, slot: int, base: np.ndarray) -> np.ndarray:
+        # Para cada menu, o candidato (entre sample_size sorteados) que deixa base + candidato
+        # mais perto das faixas alvo. base: (n, n_nutrientes) -> posições (n,)
+        pool = self.pools[slot]
+        candidates = pool[rng.integers(0, len(pool), size=(len(base), self.sample_size))]
+        error = self.error(base[:, None, :] + self.nutrients[candidates])
+        return candidates[np.arange(len(base)), error.argmin(axis=1)]
+
+    def genes(self, n: int, rng: np.random.Generator) -> np.ndarray:
+        # Matriz (n, n_slots) de posições em index.foods
+        n_slots = len(self.pools)
+        genes = np.empty((n, n_slots), dtype=np.int64)
+        remaining_mean = np.cumsum(self.slot_mean[::-1], axis=0)[::-1]
+        totals = np.zeros((n, self.nutrients.shape[1]))
+        for slot in range(n_slots):
+            expected_rest = remaining_mean[slot + 1] if slot + 1 < n_slots else 0.0
+            genes[:, slot] = self._pick(rng, slot, totals + expected_rest)
+            totals += self.nutrients[genes[:, slot]]
+
+        for _ in range(self.sweeps):
+            for slot in rng.permutation(n_slots):
+                totals -= self.nutrients[genes[:, slot]]
+                genes[:, slot] = self._pick(rng, slot, totals)
+                totals += self.nutrients[genes[:, slot]]
+        return genes
+
+    def menus(self, n: int, rng: random.Random) -> List[Menu]:
+        # Menus novos (fitness a calcular); a semente vem do RNG do GA, mantendo a reprodutibilidade
+        if n <= 0:
+            return []
+        genes = self.genes(n, np.random.default_rng(rng.getrandbits(64)))
+        foods = self.index.foods
+        menus = []
+        for row in genes.tolist():
+            items: List[list] = [[] for _ in self.meal_names]
+            for slot, position in enumerate(row):
+                items[self.slot_meal[slot]].append(foods[position])
+            menus.append(Menu(meals=[Meal(name, meal_foods) for name, meal_foods in zip(self.meal_names, items)]))
+        return menus
@@ -0,0 +1,164 @@
+import random
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, Callable, Optional
+from .models import Food, Menu, NutritionalTargets
+from .food_index import FoodIndex, Genome
+from .food_table import FoodTable
+from .genetic_algorithm import GeneticAlgorithm, PortionStage
+from .workers import init_worker, worker_index, worker_table
+
+
+def _evolve_island(targets: NutritionalTargets, params: dict, genomes: List[Genome],
+                   scores: List[float], rng_state, generations: int):
+    # Roda `generations` gerações de uma ilha a partir de uma população codificada.
+    # Retorna a população final (ordenada), o estado do RNG e o melhor fitness por geração.
+    index = worker_index()
+    ga = GeneticAlgorithm(list(index.foods), targets, index=index, food_table=worker_table(), **params)
+    ga.rng.setstate(rng_state)
+
+    ga.population = []
+    for genome, score in zip(genomes, scores):
+        menu = index.decode(genome)
+        if score is not None:
+            menu.fitness_score = score
+            menu.fitness_valid = True
+        ga.population.append(menu)
+
+    history = []
+    for _ in range(generations):
+        ga.evaluate_population()
+        if ga.portion_stage == PortionStage.ELITE:
+            ga.refine_portions(ga.elite_size)
+        history.append(ga.population[0].fitness_score)
+        ga.next_generation()
+    ga.evaluate_population()
+
+    genomes = [index.encode(m) for m in ga.population]
+    scores = [m.fitness_score for m in ga.population]
+    return genomes, scores, ga.rng.getstate(), history
+
+
+class IslandGeneticAlgorithm:
+    # Modelo de ilhas: N subpopulações evoluem em paralelo num pool de processos e,
+    # a cada `migration_interval` gerações, os melhores indivíduos de cada ilha migram
+    # para a próxima (topologia em anel), substituindo os piores.
+
+    def __init__(self,
+                 foods: List[Food],
+                 targets: NutritionalTargets,
+                 population_size: int = 200,
+                 generations: int = 50,
+                 mutation_rate: float = 0.1,
+                 elite_size: int = 4,
+                 index: Optional[FoodIndex] = None,
+                 seed: Optional[int] = None,
+                 n_islands: int = 4,
+                 migration_interval: int = 5,
+                 migration_size: int = 2,
+                 max_workers: Optional[int] = None,
+                 executor: Optional[Executor] = None,
+                 portion_stage: Optional[str] = None,
+                 allowed: Optional[int] = None,
+                 food_table: Optional[FoodTable] = None):
+        self.foods = foods
+        self.targets = targets
+        # population_size é por ilha
+        self.population_size = population_size
+        self.generations = generations
+        self.mutation_rate = mutation_rate
+        self.elite_size = elite_size
+        self.index = index if index is not None else FoodIndex(foods)
+        self.n_islands = n_islands
+        self.migration_interval = max(1, migration_interval)
+        self.migration_size = migration_size
+        self.max_workers = max_workers
+        # Um executor externo precisa ter sido criado com initializer=init_worker (e
+        # initargs=(alimentos, food_table) se houver limites extras). Sem ele, o pool é criado
+        # na primeira execução e reaproveitado pelas seguintes (liberado em close())
+        self.executor = executor
+        self._owns_executor = executor is None
+        # Limites extras (NutritionalTargets.bounds): vai para cada worker pelo initializer
+        self.food_table = food_table
+        self.portion_stage = portion_stage
+        # Máscara de restrições (posições do índice, iguais no índice de cada worker)
+        self.allowed = allowed
+
+        # Cada ilha recebe uma semente derivada da semente mestre
+        master = random.Random(seed)
+        self.island_seeds = [master.getrandbits(64) for _ in range(n_islands)]
+        self.population: List[Menu] = []
+
+    def _params(self) -> dict:
+        return dict(population_size=self.population_size, generations=self.generations,
+                    mutation_rate=self.mutation_rate, elite_size=self.elite_size,
+                    portion_stage=self.portion_stage, allowed=self.allowed)
+
+    def _initial_islands(self):
+        islands = []
+        for island_seed in self.island_seeds:
+            ga = GeneticAlgorithm(self.foods, self.targets, index=self.index, seed=island_seed,
+                                  food_table=self.food_table, **self._params())
+            ga.initialize_population()
+            genomes = [self.index.encode(m) for m in ga.population]
+            islands.append((genomes, [None] * len(genomes), ga.rng.getstate()))
+        return islands
+
+    def _migrate(self, islands):
+        # Anel: os melhores de i substituem os piores de i+1
+        k = min(self.migration_size, self.population_size - self.elite_size)
+        if k <= 0 or len(islands) < 2:
+            return islands
+        migrants = [(genomes[:k], scores[:k]) for genomes, scores, _ in islands]
+        migrated = []
+        for i, (genomes, scores, state) in enumerate(islands):
+            in_genomes, in_scores = migrants[i - 1]
+            migrated.append((genomes[:-k] + in_genomes, scores[:-k] + in_scores, state))
+        return migrated
+
+    def _pool(self) -> Executor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers or self.n_islands,
+                initializer=init_worker, initargs=(list(self.index.all_foods), self.food_table))
+        return self.executor
+
+    def close(self):
+        if self._owns_executor and self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def run(self, progress_callback: Callable = None) -> List[Menu]:
+        executor = self._pool()
+        islands = self._initial_islands()
+        generation = 0
+        while generation < self.generations:
+            epoch = min(self.migration_interval, self.generations - generation)
+            futures = [executor.submit(_evolve_island, self.targets, self._params(),
+                                       genomes, scores, state, epoch)
+                       for genomes, scores, state in islands]
+            results = [f.result() for f in futures]
+            islands = [(genomes, scores, state) for genomes, scores, state, _ in results]
+
+            if progress_callback:
+                for offset in range(epoch):
+                    progress_callback(generation + offset, max(r[3][offset] for r in results))
+            generation += epoch
+
+            if generation < self.generations:
+                islands = self._migrate(islands)
+
+        # Junta as ilhas e devolve os top 3 com o mesmo critério do GeneticAlgorithm
+        merged = GeneticAlgorithm(self.foods, self.targets, index=self.index, food_table=self.food_table,
+                                  **self._params())
+        for genomes, scores, _ in islands:
+            for genome, score in zip(genomes, scores):
+                menu = self.index.decode(genome)
+                if score is not None:
+                    menu.fitness_score = score
+                    menu.fitness_valid = True
+                merged.population.append(menu)
+        merged.evaluate_population()
+        if self.portion_stage == PortionStage.FINAL:
+            merged.refine_portions(max(self.elite_size, 10))
+        self.population = merged.population
+        return merged.top_menus()
@@ -0,0 +1,342 @@
+import math
+import time
+from abc import abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from .models import Food, Meal, Menu, NutritionalTargets
+from .food_index import FoodIndex
+from .food_table import NutrientConstraints
+from .genetic_algorithm import MEAL_TEMPLATES, GeneticAlgorithm
+from .vectorized_ga import VectorizedGeneticAlgorithm
+from .optimizer import Optimizer, StopReason
+from .portions import MACRO_SCALES
+
+# Busca local de trajetória única sobre a estrutura fixa dos templates: um menu é um
+# alimento por slot (12 slots nos MEAL_TEMPLATES) e um movimento troca o alimento de um
+# slot por outro do pool do slot. O erro do menu vizinho sai dos totais atuais por delta
+# (totais - alimento antigo + alimento novo), sem montar Menu nem somar o menu inteiro.
+# Só os melhores estados visitados viram objetos Menu, no final (ou a cada relatório).
+#
+#   menus = SimulatedAnnealing(foods, targets, seed=1).run()
+#   menus = TabuSearch(foods, targets, seed=1, target_fitness=0.999).run()
+#
+# Mesmo erro de Optimizer.calculate_error (macros pelas escalas 100/10/10/10, limites
+# extras pela escala de cada NutrientBound), então o fitness é comparável ao do GA.
+
+
+class SlotModel:
+    # Pools por slot e nutrientes já normalizados pelas escalas do erro: o erro de um vetor
+    # de totais é a soma dos desvios quadrados até [lower, upper] em cada coluna
+    def __init__(self,
+                 index: FoodIndex,
+                 targets: NutritionalTargets,
+                 templates: Sequence[Tuple[str, List[dict]]] = MEAL_TEMPLATES,
+                 constraints: Optional[NutrientConstraints] = None,
+                 allowed: Optional[int] = None):
+        self.index = index
+        lower = [targets.min_calories, targets.min_proteins, targets.min_carbs, targets.min_fats]
+        upper = [targets.max_calories, targets.max_proteins, targets.max_carbs, targets.max_fats]
+        lower, upper, scales = np.array(lower), np.array(upper), MACRO_SCALES
+        nutrients = index.nutrients
+        if constraints is not None and len(constraints):
+            lower = np.concatenate([lower, constraints.lower])
+            upper = np.concatenate([upper, constraints.upper])
+            scales = np.concatenate([scales, constraints.scale])
+            nutrients = np.hstack([nutrients, constraints.rows([f.food_id for f in index.foods])])
+        self.nutrients = nutrients / scales
+        self.lower = lower / scales
+        self.upper = upper / scales
+        # Cópias em listas do Python: para um movimento isolado são mais rápidas que o NumPy
+        self.rows: List[Tuple[float, ...]] = [tuple(r) for r in self.nutrients.tolist()]
+        self.bounds = list(zip(self.lower.tolist(), self.upper.tolist()))
+
+        self.meal_names = [name for name, _ in templates]
+        self.slot_meal: List[int] = []
+        self.pools: List[np.ndarray] = []
+        for m, (_, requirements) in enumerate(templates):
+            for req in requirements:
+                self.slot_meal.append(m)
+                self.pools.append(index.ids_of(index.candidates(req, allowed)))
+        self.pool_lists = [pool.tolist() for pool in self.pools]
+        # Pools empilhados (preenchidos à direita) para sortear candidatos de todos os slots de uma vez
+        self.pool_sizes = np.array([len(pool) for pool in self.pools])
+        self.pool_matrix = np.zeros((len(self.pools), self.pool_sizes.max()), dtype=np.int64)
+        for slot, pool in enumerate(self.pools):
+            self.pool_matrix[slot, :len(pool)] = pool
+
+    @property
+    def n_slots(self) -> int:
+        return len(self.pools)
+
+    def error(self, totals: Sequence[float]) -> float:
+        error = 0.0
+        for total, (low, high) in zip(totals, self.bounds):
+            if total < low:
+                error += (low - total) ** 2
+            elif total > high:
+                error += (total - high) ** 2
+        return error
+
+    def errors(self, totals: np.ndarray) -> np.ndarray:
+        # (..., n_colunas) -> erro (...)
+        below = np.clip(self.lower - totals, 0.0, None)
+        above = np.clip(totals - self.upper, 0.0, None)
+        return ((below + above) ** 2).sum(axis=-1)
+
+    def totals(self, genes: Sequence[int]) -> List[float]:
+        return self.nutrients[list(genes)].sum(axis=0).tolist()
+
+    def menu(self, genes: Sequence[int]) -> Menu:
+        foods = self.index.foods
+        items: List[List[Food]] = [[] for _ in self.meal_names]
+        for slot, position in enumerate(genes):
+            items[self.slot_meal[slot]].append(foods[position])
+        return Menu(meals=[Meal(name, meal_foods) for name, meal_foods in zip(self.meal_names, items)])
+
+
+class LocalSearch(Optimizer):
+    # Base de SimulatedAnnealing e TabuSearch: modelo de slots, arquivo dos melhores estados
+    # distintos visitados (de onde saem os top-k), reinícios e critérios de parada
+    def __init__(self,
+                 foods: List[Food],
+                 targets: NutritionalTargets,
+                 iterations: int = 10_000,
+                 restarts: int = 1,
+                 archive_size: int = 64,
+                 report_every: int = 1000,
+                 **kwargs):
+        super().__init__(foods, targets, **kwargs)
+        if iterations <= 0 or restarts <= 0:
+            raise ValueError("iterations e restarts devem ser positivos")
+        self.iterations = iterations
+        self.restarts = restarts
+        self.archive_size = archive_size
+        self.report_every = report_every
+        self.model = SlotModel(self.index, targets, constraints=self.constraints, allowed=self.allowed)
+        # Erro máximo que satisfaz target_fitness (fitness = 1 / (1 + erro))
+        self.target_error = -1.0 if not self.target_fitness else 1.0 / self.target_fitness - 1.0
+        self.best_error = math.inf
+        self._archive: Dict[Tuple[int, ...], float] = {}
+        self._archive_worst = math.inf
+        self._progress: Optional[Callable] = None
+        self._start = 0.0
+        self._steps = 0
+
+    def _remember(self, genes: Sequence[int], error: float):
+        # Guarda o estado se couber entre os archive_size melhores (genótipos distintos)
+        if error >= self._archive_worst:
+            return
+        key = tuple(genes)
+        if key in self._archive:
+            return
+        self._archive[key] = error
+        if len(self._archive) > self.archive_size:
+            worst = max(self._archive, key=self._archive.__getitem__)
+            del self._archive[worst]
+            self._archive_worst = max(self._archive.values())
+
+    def _collect(self):
+        # Arquivo -> população de Menu avaliada e ordenada (fitness exato de calculate_fitness)
+        menus = []
+        for genes in sorted(self._archive, key=self._archive.__getitem__):
+            menu = self.model.menu(genes)
+            menu.fitness_score = self.calculate_fitness(menu)
+            menu.fitness_valid = True
+            menus.append(menu)
+        menus.sort(key=lambda m: m.fitness_score, reverse=True)
+        self.population = menus
+
+    def _step(self, improved: bool) -> Optional[str]:
+        # Chamado a cada iteração: relatório periódico e critérios de parada
+        self._steps += 1
+        if improved and self.best_error <= self.target_error:
+            return StopReason.TARGET_FITNESS
+        if self._steps % 256 == 0 and self._deadline_passed(self._start):
+            return StopReason.DEADLINE
+        if self._progress is not None and self._steps % self.report_every == 0:
+            self._collect()
+            self._progress(self._steps // self.report_every - 1, 1.0 / (1.0 + self.best_error))
+        return None
+
+    def _random_genes(self, rng: np.random.Generator) -> List[int]:
+        picks = (rng.random(self.model.n_slots) * self.model.pool_sizes).astype(np.int64)
+        return self.model.pool_matrix[np.arange(self.model.n_slots), picks].tolist()
+
+    @abstractmethod
+    def _search(self, rng: np.random.Generator) -> Optional[str]:
+        # Uma trajetória a partir de um menu aleatório; devolve o motivo de parada, se houver
+        ...
+
+    def run(self, progress_callback: Callable = None) -> List[Menu]:
+        self._start = time.perf_counter()
+        self.stop_reason = StopReason.COMPLETED
+        self.evaluations = 0
+        self.best_error = math.inf
+        self._archive, self._archive_worst = {}, math.inf
+        self._progress = progress_callback
+        self._steps = 0
+        # Sorteios em lote derivados do RNG do otimizador (reprodutível pela seed)
+        rng = np.random.default_rng(self.rng.getrandbits(64))
+        for _ in range(self.restarts):
+            reason = self._search(rng)
+            if reason is not None:
+                self.stop_reason = reason
+                break
+        self._collect()
+        return self.top_menus()
+
+
+class SimulatedAnnealing(LocalSearch):
+    # A cada iteração sorteia um slot e um alimento do pool; aceita se o erro não piora,
+    # ou com probabilidade exp(-delta / T). A temperatura cai geometricamente de
+    # initial_temperature a initial_temperature * final_ratio ao longo de `iterations`.
+    # initial_temperature=None calibra pela mediana das pioras de movimentos aleatórios
+    # (metade delas aceita no início).
+
+    def __init__(self, *args,
+                 initial_temperature: Optional[float] = None,
+                 final_ratio: float = 1e-4,
+                 **kwargs):
+        kwargs.setdefault("iterations", 20_000)
+        kwargs.setdefault("restarts", 3)
+        super().__init__(*args, **kwargs)
+        if not 0.0 < final_ratio < 1.0:
+            raise ValueError(f"final_ratio deve estar entre 0 e 1: {final_ratio}")
+        self.initial_temperature = initial_temperature
+        self.final_ratio = final_ratio
+
+    def _calibrate(self, rng: np.random.Generator, samples: int = 200) -> float:
+        model = self.model
+        genes = self._random_genes(rng)
+        totals = np.array(model.totals(genes))
+        slots = rng.integers(0, model.n_slots, size=samples)
+        picks = model.pool_matrix[slots, (rng.random(samples) * model.pool_sizes[slots]).astype(np.int64)]
+        moved = totals + model.nutrients[picks] - model.nutrients[np.array(genes)[slots]]
+        delta = model.errors(moved) - model.error(totals)
+        worse = delta[delta > 0]
+        return float(np.median(worse) / math.log(2)) if worse.size else 1.0
+
+    def _search(self, rng: np.random.Generator) -> Optional[str]:
+        model = self.model
+        rows, pools, error_of = model.rows, model.pool_lists, model.error
+        temperature = self.initial_temperature or self._calibrate(rng)
+        cooling = self.final_ratio ** (1.0 / self.iterations)
+
+        genes = self._random_genes(rng)
+        totals = model.totals(genes)
+        error = error_of(totals)
+        if error < self.best_error:
+            self.best_error = error
+        self._remember(genes, error)
+
+        # Sorteios da trajetória inteira de uma vez
+        slots = rng.integers(0, model.n_slots, size=self.iterations).tolist()
+        picks = rng.random(self.iterations).tolist()
+        accepts = rng.random(self.iterations).tolist()
+        for it in range(self.iterations):
+            slot = slots[it]
+            pool = pools[slot]
+            new = pool[int(picks[it] * len(pool))]
+            old = genes[slot]
+            temperature *= cooling
+            improved = False
+            if new != old:
+                moved = [t - a + b for t, a, b in zip(totals, rows[old], rows[new])]
+                candidate = error_of(moved)
+                self.evaluations += 1
+                delta = candidate - error
+                if delta <= 0.0 or accepts[it] < math.exp(-delta / temperature):
+                    genes[slot] = new
+                    totals, error = moved, candidate
+                    self._remember(genes, error)
+                    if error < self.best_error:
+                        self.best_error, improved = error, True
+            if it % 1024 == 1023:
+                # Recalcula os totais do zero: o acúmulo de deltas não deriva
+                totals = model.totals(genes)
+                error = error_of(totals)
+            reason = self._step(improved)
+            if reason is not None:
+                return reason
+        return None
+
+
+class TabuSearch(LocalSearch):
+    # A cada iteração avalia, em lote, `sample_size` trocas sorteadas em cada slot e aplica a
+    # melhor não proibida, mesmo que piore. O alimento que sai de um slot fica proibido de
+    # voltar a ele por `tenure` iterações, salvo se a troca bater o melhor erro já visto
+    # (aspiração). Após `stagnation` iterações sem melhorar, `perturbation` slots são
+    # re-sorteados (diversificação).
+
+    def __init__(self, *args,
+                 sample_size: int = 32,
+                 tenure: int = 8,
+                 stagnation: int = 50,
+                 perturbation: int = 4,
+                 **kwargs):
+        kwargs.setdefault("iterations", 5000)
+        kwargs.setdefault("report_every", 50)
+        super().__init__(*args, **kwargs)
+        self.sample_size = sample_size
+        self.tenure = tenure
+        self.stagnation = stagnation
+        self.perturbation = perturbation
+
+    def _search(self, rng: np.random.Generator) -> Optional[str]:
+        model = self.model
+        n_slots, nutrients = model.n_slots, model.nutrients
+        slot_rows = np.arange(n_slots)[:, None]
+        sizes = model.pool_sizes[:, None]
+        tabu_until = np.zeros((n_slots, len(self.index.foods)), dtype=np.int64)
+
+        genes = np.array(self._random_genes(rng))
+        totals = nutrients[genes].sum(axis=0)
+        error = float(model.errors(totals))
+        if error < self.best_error:
+            self.best_error = error
+        self._remember(genes.tolist(), error)
+        stagnant = 0
+
+        for it in range(1, self.iterations + 1):
+            # Vizinhança amostrada: (n_slots, sample_size) candidatos e seus erros por delta
+            candidates = model.pool_matrix[slot_rows, (rng.random((n_slots, self.sample_size)) * sizes).astype(np.int64)]
+            moved = totals + nutrients[candidates] - nutrients[genes][:, None, :]
+            errors = model.errors(moved)
+            self.evaluations += errors.size
+            errors[candidates == genes[:, None]] = np.inf
+            admissible = (tabu_until[slot_rows, candidates] < it) | (errors < self.best_error)
+            errors[~admissible] = np.inf
+            best = int(errors.argmin())
+            improved = False
+            if errors.flat[best] < np.inf:
+                slot, column = divmod(best, self.sample_size)
+                tabu_until[slot, genes[slot]] = it + self.tenure
+                genes[slot] = candidates[slot, column]
+                totals = moved[slot, column]
+                error = float(errors.flat[best])
+                self._remember(genes.tolist(), error)
+                if error < self.best_error:
+                    self.best_error, improved = error, True
+
+            stagnant = 0 if improved else stagnant + 1
+            if stagnant >= self.stagnation:
+                slots = rng.choice(n_slots, size=min(self.perturbation, n_slots), replace=False)
+                picks = (rng.random(len(slots)) * model.pool_sizes[slots]).astype(np.int64)
+                genes[slots] = model.pool_matrix[slots, picks]
+                totals = nutrients[genes].sum(axis=0)
+                error = float(model.errors(totals))
+                stagnant = 0
+
+            reason = self._step(improved)
+            if reason is not None:
+                return reason
+        return None
+
+
+# Motores disponíveis pelo nome (CLI do lote, benchmark)
+OPTIMIZERS: Dict[str, type] = {
+    "ga": GeneticAlgorithm,
+    "annealing": SimulatedAnnealing,
+    "tabu": TabuSearch,
+    "vectorized": VectorizedGeneticAlgorithm,
+}
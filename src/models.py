@@ -1,7 +1,20 @@
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 
-@dataclass
+# Food e Meal são imutáveis: menus filhos compartilham as refeições dos pais
+# sem cópia, e só as refeições alteradas pela mutação geram objetos novos.
+
+# Vetor de nutrientes: (calorias, proteínas, carboidratos, gorduras)
+Nutrients = Tuple[float, float, float, float]
+ZERO_NUTRIENTS: Nutrients = (0.0, 0.0, 0.0, 0.0)
+
+def _add(a: Nutrients, b: Nutrients) -> Nutrients:
+    return (a[0] + b[0], a[1] + b[1], a[2] + b[2], a[3] + b[3])
+
+def _sub(a: Nutrients, b: Nutrients) -> Nutrients:
+    return (a[0] - b[0], a[1] - b[1], a[2] - b[2], a[3] - b[3])
+
+@dataclass(frozen=True, slots=True)
 class Food:
     name: str
     calories: float
@@ -9,31 +22,130 @@ class Food:
     carbs: float
     fats: float
     category: str = "Geral"
-    tags: List[str] = field(default_factory=list)
+    tags: Tuple[str, ...] = ()
+    # Linha correspondente na FoodTable (-1 = alimento avulso, sem tabela)
+    food_id: int = -1
+
+    def __post_init__(self):
+        if not isinstance(self.tags, tuple):
+            object.__setattr__(self, 'tags', tuple(self.tags))
     
+    @property
+    def nutrients(self) -> Nutrients:
+        return (self.calories, self.proteins, self.carbs, self.fats)
+
+    @property
+    def key(self):
+        # Identidade estável do alimento: a linha da FoodTable, ou o nome se avulso
+        return self.food_id if self.food_id >= 0 else self.name
+
+    @property
+    def bit(self) -> int:
+        # Bit do alimento nos bitsets de Menu (alimentos avulsos usam o hash do nome;
+        # colisões só aproximam a distância de Jaccard)
+        return 1 << (self.food_id if self.food_id >= 0 else hash(self.name) & 0xFFFF)
+
     def __repr__(self):
         return f"{self.name} ({self.category} - {self.calories} kcal)"
 
-@dataclass
+def _scaled(a: Nutrients, k: float) -> Nutrients:
+    return (a[0] * k, a[1] * k, a[2] * k, a[3] * k)
+
+@dataclass(frozen=True, slots=True)
 class Meal:
     name: str
-    foods: List[Food] = field(default_factory=list)
+    foods: Tuple[Food, ...] = ()
+    # Multiplicador da porção de cada alimento (1.0 = 100 g da TACO). Vazio = todos 1.0
+    portions: Tuple[float, ...] = ()
+    # Totais em cache, calculados uma vez e atualizados por delta nas operações abaixo
+    totals: Nutrients = field(default=None, repr=False, compare=False)
+    # Impressão digital canônica e bitset dos alimentos (calculados na primeira consulta)
+    _fingerprint: tuple = field(default=None, init=False, repr=False, compare=False)
+    _bitset: int = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if not isinstance(self.foods, tuple):
+            object.__setattr__(self, 'foods', tuple(self.foods))
+        if not isinstance(self.portions, tuple):
+            object.__setattr__(self, 'portions', tuple(self.portions))
+        if self.totals is None:
+            totals = ZERO_NUTRIENTS
+            for i, f in enumerate(self.foods):
+                totals = _add(totals, _scaled(f.nutrients, self.portion(i)))
+            object.__setattr__(self, 'totals', totals)
+
+    def portion(self, idx: int) -> float:
+        return self.portions[idx] if self.portions else 1.0
+
+    def grams(self, idx: int) -> float:
+        return 100.0 * self.portion(idx)
+
+    # Copy-on-write: cada operação devolve uma nova refeição, a original continua compartilhada.
+    # Alimentos novos entram com a porção padrão (1.0).
+    def replace_food(self, idx: int, food: Food) -> "Meal":
+        totals = _add(_sub(self.totals, _scaled(self.foods[idx].nutrients, self.portion(idx))), food.nutrients)
+        portions = self.portions[:idx] + (1.0,) + self.portions[idx + 1:] if self.portions else ()
+        return Meal(self.name, self.foods[:idx] + (food,) + self.foods[idx + 1:], portions, totals=totals)
+
+    def add_food(self, food: Food) -> "Meal":
+        portions = self.portions + (1.0,) if self.portions else ()
+        return Meal(self.name, self.foods + (food,), portions, totals=_add(self.totals, food.nutrients))
+
+    def remove_food(self, idx: int) -> "Meal":
+        totals = _sub(self.totals, _scaled(self.foods[idx].nutrients, self.portion(idx)))
+        portions = self.portions[:idx] + self.portions[idx + 1:] if self.portions else ()
+        return Meal(self.name, self.foods[:idx] + self.foods[idx + 1:], portions, totals=totals)
+
+    def with_portions(self, portions: Sequence[float]) -> "Meal":
+        return Meal(self.name, self.foods, tuple(portions))
+
+    @property
+    def fingerprint(self) -> tuple:
+        # (nome, itens ordenados): independe da ordem dos alimentos na refeição.
+        # Com porções ajustadas cada item é (alimento, porção), senão só o alimento.
+        if self._fingerprint is None:
+            keys = [f.key for f in self.foods]
+            items = list(zip(keys, self.portions)) if self.portions else keys
+            try:
+                items.sort()
+            except TypeError:  # food_ids e nomes misturados (alimentos avulsos)
+                items.sort(key=repr)
+            object.__setattr__(self, '_fingerprint', (self.name, tuple(items)))
+        return self._fingerprint
+
+    @property
+    def bitset(self) -> int:
+        if self._bitset is None:
+            bits = 0
+            for f in self.foods:
+                bits |= f.bit
+            object.__setattr__(self, '_bitset', bits)
+        return self._bitset
 
     @property
     def total_calories(self) -> float:
-        return sum(f.calories for f in self.foods)
+        return self.totals[0]
 
     @property
     def total_proteins(self) -> float:
-        return sum(f.proteins for f in self.foods)
+        return self.totals[1]
 
     @property
     def total_carbs(self) -> float:
-        return sum(f.carbs for f in self.foods)
+        return self.totals[2]
 
     @property
     def total_fats(self) -> float:
-        return sum(f.fats for f in self.foods)
+        return self.totals[3]
+
+@dataclass
+class NutrientBound:
+    # Limite sobre qualquer coluna da FoodTable (ex: sódio máximo, fibra mínima).
+    # `scale` normaliza o desvio como os /100 e /10 dos macros; se omitido usa 5% do limite.
+    nutrient: str
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    scale: Optional[float] = None
 
 @dataclass
 class NutritionalTargets:
@@ -45,25 +157,74 @@ class NutritionalTargets:
     max_carbs: float
     min_fats: float
     max_fats: float
+    bounds: List[NutrientBound] = field(default_factory=list)
 
 @dataclass
 class Menu:
     meals: List[Meal] = field(default_factory=list)
     fitness_score: float = 0.0
     targets: Optional[NutritionalTargets] = None
+    # False enquanto os totais mudaram desde a última avaliação de fitness
+    fitness_valid: bool = field(default=False, repr=False, compare=False)
+    totals: Nutrients = field(default=ZERO_NUTRIENTS, init=False, repr=False, compare=False)
+    _fingerprint: tuple = field(default=None, init=False, repr=False, compare=False)
+    _bitset: int = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        totals = ZERO_NUTRIENTS
+        for m in self.meals:
+            totals = _add(totals, m.totals)
+        self.totals = totals
+
+    @property
+    def fingerprint(self) -> tuple:
+        # Chave canônica e hashable do genótipo: menus com os mesmos alimentos (e porções)
+        # em cada refeição têm a mesma impressão, qualquer que seja a ordem dos itens
+        if self._fingerprint is None:
+            self._fingerprint = tuple(m.fingerprint for m in self.meals)
+        return self._fingerprint
+
+    @property
+    def bitset(self) -> int:
+        # Conjunto dos alimentos do menu (todas as refeições) como inteiro, 1 bit por food_id.
+        # Cada refeição guarda o seu, então menus que compartilham refeições reaproveitam
+        if self._bitset is None:
+            bits = 0
+            for m in self.meals:
+                bits |= m.bitset
+            self._bitset = bits
+        return self._bitset
+
+    def distance(self, other: "Menu") -> float:
+        # Distância de Jaccard entre os conjuntos de alimentos (0 = mesmos alimentos, 1 = nenhum em comum)
+        union = (self.bitset | other.bitset).bit_count()
+        return 1.0 - (self.bitset & other.bitset).bit_count() / union if union else 0.0
+
+    def replace_meal(self, idx: int, meal: Meal):
+        # Troca uma refeição atualizando os totais por delta. Invalida o fitness sempre que
+        # os alimentos ou porções mudam: o erro também depende de outros nutrientes (limites
+        # extras) e dos próprios alimentos (variedade), não só dos 4 macros
+        old = self.meals[idx]
+        self.meals[idx] = meal
+        self._fingerprint = self._bitset = None
+        if meal.totals != old.totals:
+            self.totals = _add(_sub(self.totals, old.totals), meal.totals)
+        if meal is not old and (meal.portions != old.portions or len(meal.foods) != len(old.foods)
+                                or any(a is not b for a, b in zip(meal.foods, old.foods))):
+            self.fitness_valid = False
 
     @property
     def total_calories(self) -> float:
-        return sum(m.total_calories for m in self.meals)
+        return self.totals[0]
 
     @property
     def total_proteins(self) -> float:
-        return sum(m.total_proteins for m in self.meals)
+        return self.totals[1]
     
     @property
     def total_carbs(self) -> float:
-        return sum(m.total_carbs for m in self.meals)
+        return self.totals[2]
 
     @property
     def total_fats(self) -> float:
-        return sum(m.total_fats for m in self.meals)
+        return self.totals[3]
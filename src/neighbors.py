@@ -0,0 +1,87 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from .models import Food
+from .food_index import FoodIndex
+from .portions import MACRO_SCALES
+
+# Substituições próximas no espaço de nutrientes: para cada alimento, os k mais parecidos
+# (distância euclidiana dos macros normalizados pelas escalas do fitness) dentro do mesmo
+# grupo de substituição da mutação (primeira tag prioritária, senão a categoria).
+# Os vizinhos são pré-calculados de uma vez, em lote, ao construir o índice; consultar
+# é só ler uma tupla. Usado pela mutação de passo curto do GA e pelo "trocar este item"
+# da interface.
+
+
+def replacement_group(food: Food, priority_tags: Sequence[str]) -> Tuple[str, str]:
+    tag = next((t for t in priority_tags if t in food.tags), None)
+    return ("tag", tag) if tag is not None else ("category", food.category)
+
+
+class SubstitutionIndex:
+    def __init__(self, index: FoodIndex, priority_tags: Sequence[str] = (), k: int = 8,
+                 block_size: int = 1024):
+        self.index = index
+        self.priority_tags = tuple(priority_tags)
+        self.k = k
+        foods = index.foods
+        vectors = index.nutrients / MACRO_SCALES
+
+        # Grupo -> alimentos que o usam; o conjunto de substitutos é o mesmo pool da mutação
+        # (todos com a tag, inclusive os que têm outra tag prioritária antes dela)
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        for position, food in enumerate(foods):
+            groups.setdefault(replacement_group(food, self.priority_tags), []).append(position)
+
+        # neighbors[p]: posições dos k vizinhos de p, do mais próximo ao mais distante (-1 = vazio)
+        self.neighbors = np.full((len(foods), k), -1, dtype=np.int64)
+        for (kind, key), members in groups.items():
+            pool = np.array(index.ids_of(index.by_tag(key) if kind == "tag" else index.by_category(key)))
+            members = np.array(members)
+            kk = min(k, len(pool) - 1)
+            if kk <= 0:
+                continue
+            points = vectors[pool]
+            squared = (points ** 2).sum(axis=1)
+            # Em blocos de linhas: a matriz de distâncias nunca passa de block_size x pool.
+            # |a - b|² = |a|² + |b|² - 2ab, com o produto de matrizes fazendo o trabalho pesado
+            for start in range(0, len(members), block_size):
+                rows = members[start:start + block_size]
+                block = vectors[rows]
+                distance = (block ** 2).sum(axis=1)[:, None] + squared[None, :] - 2.0 * block @ points.T
+                distance[rows[:, None] == pool[None, :]] = np.inf
+                nearest = np.argpartition(distance, kk - 1, axis=1)[:, :kk]
+                order = np.take_along_axis(distance, nearest, axis=1).argsort(axis=1, kind="stable")
+                self.neighbors[rows, :kk] = pool[np.take_along_axis(nearest, order, axis=1)]
+
+        self._foods: List[Tuple[Food, ...]] = [tuple(foods[q] for q in row if q >= 0)
+                                               for row in self.neighbors.tolist()]
+
+    def neighbors_of(self, food: Food, allowed: Optional[int] = None) -> Tuple[Food, ...]:
+        # Vizinhos pré-calculados (até k), opcionalmente filtrados por uma máscara de
+        # FoodIndex.allowed_mask; () para alimentos fora do índice
+        position = self.index.position.get(id(food))
+        if position is None:
+            return ()
+        near = self._foods[position]
+        if allowed is None:
+            return near
+        return tuple(f for f, q in zip(near, self.neighbors[position].tolist()) if allowed >> q & 1)
+
+    def similar_foods(self, food: Food, k: int = 5, allowed: Optional[int] = None) -> List[Food]:
+        # Os k substitutos mais parecidos com `food` (mesmo grupo, do mais ao menos parecido)
+        if k <= self.k:
+            near = self.neighbors_of(food, allowed)
+            if allowed is None or len(near) >= k:
+                return list(near[:k])
+        # Mais que os pré-calculados (ou a máscara removeu parte deles): distância ao grupo
+        # inteiro, na hora
+        group = replacement_group(food, self.priority_tags)
+        pool = self.index.allowed_by_tag(group[1], allowed) if group[0] == "tag" else \
+            self.index.allowed_by_category(group[1], allowed)
+        candidates = [f for f in pool if f is not food]
+        if not candidates:
+            return []
+        target = np.array(food.nutrients) / MACRO_SCALES
+        points = self.index.nutrients[self.index.ids_of(candidates)] / MACRO_SCALES
+        order = ((points - target) ** 2).sum(axis=1).argsort(kind="stable")[:k]
+        return [candidates[i] for i in order]
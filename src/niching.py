@@ -0,0 +1,80 @@
+from collections import OrderedDict
+from typing import Hashable, Iterable, List, Optional, Sequence
+import numpy as np
+from .models import Menu
+
+# Ferramentas sobre Menu.fingerprint / Menu.bitset usadas pelo GA:
+# memo de fitness por genótipo, compartilhamento de fitness (niching) e top-k diverso.
+
+
+class FitnessMemo:
+    # Cache LRU limitado: impressão digital do menu -> fitness. Genótipos idênticos
+    # recriados pelo crossover/mutação não são avaliados de novo.
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._scores: "OrderedDict[Hashable, float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def get(self, key: Hashable) -> Optional[float]:
+        score = self._scores.get(key)
+        if score is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._scores.move_to_end(key)
+        return score
+
+    def put(self, key: Hashable, score: float):
+        self._scores[key] = score
+        if len(self._scores) > self.maxsize:
+            self._scores.popitem(last=False)
+
+
+def shared_fitness(menus: Sequence[Menu], radius: float, alpha: float = 1.0) -> List[float]:
+    # Fitness sharing: divide o fitness de cada menu pelo tamanho do seu nicho,
+    # m_i = sum_j sh(d_ij), sh(d) = 1 - (d / radius)^alpha para d < radius (d = Jaccard).
+    # Menus em regiões lotadas perdem pressão de seleção e nichos distintos sobrevivem.
+    # As interseções de todos os pares saem de um único produto da matriz de incidência
+    # (menus x alimentos presentes na população), montada a partir dos Menu.bitset.
+    bitsets = [m.bitset for m in menus]
+    nbytes = max((b.bit_length() + 7) // 8 for b in bitsets) or 1
+    packed = np.frombuffer(b"".join(b.to_bytes(nbytes, 'little') for b in bitsets),
+                           dtype=np.uint8).reshape(len(bitsets), nbytes)
+    # Só os bytes ocupados por algum menu (catálogos grandes têm quase todos zerados)
+    packed = packed[:, packed.any(axis=0)]
+    incidence = np.unpackbits(packed, axis=1).astype(np.float32)
+
+    common = incidence @ incidence.T
+    sizes = np.diag(common)
+    union = sizes[:, None] + sizes[None, :] - common
+    distance = 1.0 - np.divide(common, union, out=np.ones_like(common), where=union > 0)
+    share = np.clip(1.0 - (distance / radius) ** alpha, 0.0, None)
+    niche = share.sum(axis=1)
+    return (np.array([m.fitness_score for m in menus]) / niche).tolist()
+
+
+def diverse_top(menus: Iterable[Menu], k: int, min_distance: float = 0.0) -> List[Menu]:
+    # Os k melhores menus (já ordenados) com genótipos distintos e, sempre que possível,
+    # a pelo menos `min_distance` (Jaccard) de todos os já escolhidos. Se não houver
+    # menus suficientemente diferentes, completa com os melhores genótipos distintos.
+    chosen: List[Menu] = []
+    seen = set()
+    fallback: List[Menu] = []
+    for menu in menus:
+        key = menu.fingerprint
+        if key in seen:
+            continue
+        seen.add(key)
+        if all(menu.distance(other) >= min_distance for other in chosen):
+            chosen.append(menu)
+            if len(chosen) >= k:
+                return chosen
+        elif len(fallback) < k:
+            fallback.append(menu)
+    result = chosen + fallback[:k - len(chosen)]
+    result.sort(key=lambda m: m.fitness_score, reverse=True)
+    return result
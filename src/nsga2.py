@@ -0,0 +1,206 @@
+import time
+from typing import Callable, Iterable, List, Optional, Sequence
+import numpy as np
+from .models import Menu
+from .genetic_algorithm import GeneticAlgorithm, StopReason
+
+# Modo multiobjetivo (NSGA-II): em vez de somar tudo num único 1/(1+erro), cada menu tem
+# um vetor de objetivos (todos a minimizar) e a população evolui em direção à fronteira
+# de Pareto. run() devolve a fronteira inteira para a interface escolher o compromisso.
+#
+#   ga = NSGA2GeneticAlgorithm(foods, targets, history=nomes_da_semana_passada)
+#   front = ga.run()            # menus não dominados, do menor erro de macros ao maior
+#   ga.front_objectives         # matriz (len(front), n_objetivos), mesma ordem
+#
+# Ordenação não dominada e crowding distance são operações em lote do NumPy (O(n²) em
+# memória de bool), viáveis para populações de alguns milhares.
+
+# Objetivos disponíveis (todos a minimizar)
+OBJECTIVES = {
+    # Erro nutricional de GeneticAlgorithm.calculate_error (macros + limites extras)
+    "macros": lambda ga, menu: ga.calculate_error(menu),
+    # Fração dos itens do menu que o usuário já comeu recentemente (`history`)
+    "history": lambda ga, menu: ga.history_overlap(menu),
+    # Quantidade de itens no dia (menos pratos = preparo mais simples)
+    "dishes": lambda ga, menu: float(sum(len(meal.foods) for meal in menu.meals)),
+}
+
+
+def dominance_matrix(objectives: np.ndarray) -> np.ndarray:
+    # D[i, j] = True se i domina j: não é pior em nenhum objetivo e é melhor em algum
+    n = len(objectives)
+    no_worse = np.ones((n, n), dtype=bool)
+    better = np.zeros((n, n), dtype=bool)
+    for column in objectives.T:
+        no_worse &= column[:, None] <= column[None, :]
+        better |= column[:, None] < column[None, :]
+    return no_worse & better
+
+
+def non_dominated_sort(objectives: np.ndarray, limit: Optional[int] = None) -> np.ndarray:
+    # Rank de Pareto de cada linha (0 = fronteira). Cada fronteira é retirada de uma vez,
+    # descontando suas dominâncias de todos os demais. Com `limit`, para assim que as
+    # fronteiras já classificadas somam `limit` indivíduos (o resto recebe o próximo rank).
+    dominates = dominance_matrix(objectives)
+    dominated_by = dominates.sum(axis=0, dtype=np.int64)
+    ranks = np.full(len(objectives), -1, dtype=np.int64)
+    front = np.flatnonzero(dominated_by == 0)
+    rank = ranked = 0
+    while front.size:
+        ranks[front] = rank
+        ranked += front.size
+        rank += 1
+        if limit is not None and ranked >= limit:
+            break
+        dominated_by -= dominates[front].sum(axis=0, dtype=np.int64)
+        dominated_by[front] = -1
+        front = np.flatnonzero(dominated_by == 0)
+    ranks[ranks < 0] = rank
+    return ranks
+
+
+def crowding_distance(objectives: np.ndarray, ranks: np.ndarray) -> np.ndarray:
+    # Crowding distance dentro de cada fronteira, todas de uma vez: por objetivo, ordena
+    # por (rank, valor); extremos de cada fronteira recebem infinito e os demais a distância
+    # entre os vizinhos, normalizada pela amplitude da fronteira naquele objetivo
+    distance = np.zeros(len(objectives))
+    if len(objectives) == 0:
+        return distance
+    for column in objectives.T:
+        order = np.lexsort((column, ranks))
+        values = column[order]
+        fronts = ranks[order]
+        first = np.r_[True, fronts[1:] != fronts[:-1]]
+        last = np.r_[fronts[1:] != fronts[:-1], True]
+        # Amplitude da fronteira de cada posição
+        sizes = np.diff(np.r_[np.flatnonzero(first), len(values)])
+        span = np.repeat(values[last] - values[first], sizes)
+        gap = np.zeros(len(values))
+        gap[1:-1] = values[2:] - values[:-2]
+        gap = np.divide(gap, span, out=np.zeros_like(gap), where=span > 0)
+        gap[first | last] = np.inf
+        distance[order] += gap
+    return distance
+
+
+class NSGA2GeneticAlgorithm(GeneticAlgorithm):
+    # Mesmos operadores (inicialização, crossover, mutação) e critérios de parada do GA;
+    # muda a avaliação, a seleção (torneio binário por rank e crowding) e a sobrevivência
+    # (pais + filhos, truncados por fronteira). fitness_score continua sendo 1/(1+erro de
+    # macros), usado pelos critérios de parada e pelo progress_callback.
+
+    def __init__(self, *args,
+                 objectives: Sequence[str] = ("macros", "history", "dishes"),
+                 history: Optional[Iterable[str]] = None,
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        unknown = [name for name in objectives if name not in OBJECTIVES]
+        if unknown:
+            raise ValueError(f"Objetivos desconhecidos: {unknown} (disponíveis: {list(OBJECTIVES)})")
+        if not objectives:
+            raise ValueError("NSGA-II precisa de pelo menos um objetivo")
+        if self.niche_radius is not None or self.portion_stage is not None or self.telemetry is not None:
+            raise ValueError("niche_radius, portion_stage e telemetry não são suportados no modo NSGA-II")
+        self.objective_names = tuple(objectives)
+        self._objectives = [OBJECTIVES[name] for name in objectives]
+        # Nomes dos alimentos consumidos recentemente (ex: dias anteriores da semana)
+        self.history = frozenset(history or ())
+        self.objectives = np.empty((0, len(self.objective_names)))
+        self.ranks = np.empty(0, dtype=np.int64)
+        self.crowding = np.empty(0)
+        self.front_objectives = np.empty((0, len(self.objective_names)))
+
+    def history_overlap(self, menu: Menu) -> float:
+        items = [food.name for meal in menu.meals for food in meal.foods]
+        if not items or not self.history:
+            return 0.0
+        return sum(name in self.history for name in items) / len(items)
+
+    def evaluate_objectives(self, menus: List[Menu]) -> np.ndarray:
+        # Matriz (len(menus), n_objetivos); também atualiza fitness_score (erro de macros)
+        values = np.empty((len(menus), len(self._objectives)))
+        for i, menu in enumerate(menus):
+            values[i] = [objective(self, menu) for objective in self._objectives]
+            menu.fitness_score = self.calculate_fitness(menu)
+            menu.fitness_valid = True
+        self.evaluations += len(menus)
+        return values
+
+    def _survive(self, menus: List[Menu], objectives: np.ndarray):
+        # Pais + filhos sem genótipos repetidos; ficam as melhores fronteiras e, na última
+        # que couber parcialmente, os menus de maior crowding distance
+        keep, seen = [], set()
+        for i, menu in enumerate(menus):
+            key = menu.fingerprint
+            if key not in seen:
+                seen.add(key)
+                keep.append(i)
+        objectives = objectives[keep]
+        ranks = non_dominated_sort(objectives, limit=self.population_size)
+        crowding = crowding_distance(objectives, ranks)
+        chosen = np.lexsort((-crowding, ranks))[:self.population_size]
+        self.population = [menus[keep[i]] for i in chosen]
+        self.objectives = objectives[chosen]
+        self.ranks = ranks[chosen]
+        self.crowding = crowding[chosen]
+
+    def _offspring(self, rng: np.random.Generator) -> List[Menu]:
+        # Torneio binário pela comparação de crowding: menor rank vence; empate, maior distância
+        n = len(self.population)
+        a = rng.integers(0, n, size=self.population_size)
+        b = rng.integers(0, n, size=self.population_size)
+        a_wins = (self.ranks[a] < self.ranks[b]) | \
+                 ((self.ranks[a] == self.ranks[b]) & (self.crowding[a] > self.crowding[b]))
+        parents = [self.population[i] for i in np.where(a_wins, a, b)]
+        children = []
+        for i in range(self.population_size):
+            child = self.crossover(parents[i], parents[(i + 1) % len(parents)])
+            self.mutate(child)
+            children.append(child)
+        return children
+
+    def pareto_front(self) -> List[Menu]:
+        # Fronteira atual (rank 0), um menu por vetor de objetivos distinto (menus diferentes
+        # com os mesmos valores não são opções diferentes para o usuário), do menor ao maior
+        # valor do primeiro objetivo; os objetivos correspondentes ficam em self.front_objectives
+        positions = np.flatnonzero(self.ranks == 0)
+        _, first = np.unique(self.objectives[positions], axis=0, return_index=True)
+        positions = positions[np.sort(first)]
+        positions = positions[np.argsort(self.objectives[positions, 0], kind="stable")]
+        self.front_objectives = self.objectives[positions]
+        return [self.population[i] for i in positions]
+
+    def run(self, progress_callback: Callable = None) -> List[Menu]:
+        start = time.perf_counter()
+        self.stop_reason = StopReason.COMPLETED
+        self.generations_run = 0
+        self.evaluations = 0
+        # Sorteios em lote do torneio, derivados do RNG do GA (reprodutível pela seed)
+        rng = np.random.default_rng(self.rng.getrandbits(64))
+        self.initialize_population()
+        self._survive(self.population, self.evaluate_objectives(self.population))
+
+        best_so_far = None
+        stagnant = 0
+        for generation in range(self.generations):
+            if generation > 0:
+                children = self._offspring(rng)
+                self._survive(self.population + children,
+                              np.vstack([self.objectives, self.evaluate_objectives(children)]))
+
+            best_fitness = max(m.fitness_score for m in self.population)
+            if progress_callback:
+                progress_callback(generation, best_fitness)
+            self.generations_run = generation + 1
+
+            if best_so_far is None or best_fitness > best_so_far:
+                best_so_far, stagnant = best_fitness, 0
+            else:
+                stagnant += 1
+
+            reason = self._stop_reason(best_fitness, stagnant, start)
+            if reason is not None:
+                self.stop_reason = reason
+                break
+
+        return self.pareto_front()
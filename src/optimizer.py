@@ -0,0 +1,127 @@
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional
+from .models import Food, Menu, NutritionalTargets
+from .food_index import FoodIndex
+from .food_table import FoodTable, NutrientConstraints
+from .niching import diverse_top
+
+# Interface comum dos motores de busca (GeneticAlgorithm, SimulatedAnnealing, TabuSearch):
+# todos recebem os alimentos e as NutritionalTargets (mais índice, semente, FoodTable,
+# máscara de restrições e critérios de parada), avaliam menus com o mesmo erro e
+# devolvem os k melhores menus distintos em run(). Quem consome (app, lote, cache de
+# planos, PlanJob) só depende desta interface.
+
+
+def build_constraints(targets: NutritionalTargets, food_table: Optional[FoodTable]) -> Optional[NutrientConstraints]:
+    if not targets.bounds:
+        return None
+    if food_table is None:
+        raise ValueError("NutritionalTargets.bounds exige uma FoodTable (food_table=...)")
+    return NutrientConstraints(food_table, targets.bounds)
+
+
+class StopReason:
+    # Motivo pelo qual run() terminou (disponível em Optimizer.stop_reason)
+    COMPLETED = "completed"
+    TARGET_FITNESS = "target_fitness"
+    STAGNATION = "stagnation"
+    DIVERSITY_COLLAPSE = "diversity_collapse"
+    DEADLINE = "deadline"
+
+
+class Optimizer(ABC):
+    def __init__(self,
+                 foods: List[Food],
+                 targets: NutritionalTargets,
+                 index: Optional[FoodIndex] = None,
+                 seed: Optional[int] = None,
+                 target_fitness: Optional[float] = None,
+                 deadline_ms: Optional[float] = None,
+                 food_table: Optional[FoodTable] = None,
+                 allowed: Optional[int] = None,
+                 top_k_distance: float = 0.25):
+        self.foods = foods
+        # O índice pode ser compartilhado entre execuções (ex: st.cache_resource)
+        self.index = index if index is not None else FoodIndex(foods)
+        # Restrições do usuário: máscara de FoodIndex.allowed_mask (None = todos os alimentos).
+        # Filtra os candidatos de cada slot sem copiar o catálogo
+        self.allowed = allowed
+        if allowed is not None and not self.index.allowed_foods(allowed):
+            raise ValueError("A máscara de restrições não permite nenhum alimento")
+        self.targets = targets
+        # RNG próprio: execuções reprodutíveis e independentes (ex: ilhas em paralelo)
+        self.rng = random.Random(seed)
+        # Menus avaliados e ordenados por fitness (população do GA, arquivo da busca local)
+        self.population: List[Menu] = []
+
+        # Critérios de parada antecipada comuns (None = desativado)
+        self.target_fitness = target_fitness
+        self.deadline_ms = deadline_ms
+        self.stop_reason = StopReason.COMPLETED
+        self.evaluations = 0
+
+        # Limites extras (sódio, fibra, ...) avaliados em lote sobre a FoodTable
+        self.food_table = food_table
+        self.constraints = build_constraints(targets, food_table)
+
+        # Distância mínima de Jaccard entre os menus devolvidos por top_menus
+        self.top_k_distance = top_k_distance
+
+    def calculate_fitness(self, menu: Menu) -> float:
+        # Fitness = 1 / (1 + Erro)
+        return 1.0 / (1.0 + self.calculate_error(menu))
+
+    def calculate_error(self, menu: Menu) -> float:
+        # Erro = Soma dos desvios quadrados das metas (normalizado)
+
+        cals, prots, carbs, fats = menu.totals
+
+        error = 0.0
+        # Penaliza se estiver fora do intervalo
+        # Eleva ao quadrado para penalizar outliers mais fortemente
+
+        if cals < self.targets.min_calories:
+            error += ((self.targets.min_calories - cals) / 100) ** 2
+        elif cals > self.targets.max_calories:
+            error += ((cals - self.targets.max_calories) / 100) ** 2
+
+        if prots < self.targets.min_proteins:
+            error += ((self.targets.min_proteins - prots) / 10) ** 2
+        elif prots > self.targets.max_proteins:
+            error += ((prots - self.targets.max_proteins) / 10) ** 2
+
+        if carbs < self.targets.min_carbs:
+            error += ((self.targets.min_carbs - carbs) / 10) ** 2
+        elif carbs > self.targets.max_carbs:
+            error += ((carbs - self.targets.max_carbs) / 10) ** 2
+
+        if fats < self.targets.min_fats:
+            error += ((self.targets.min_fats - fats) / 10) ** 2
+        elif fats > self.targets.max_fats:
+            error += ((fats - self.targets.max_fats) / 10) ** 2
+
+        # Demais nutrientes: todos os limites de uma vez, custo independente de quantos são
+        if self.constraints is not None:
+            food_ids = [f.food_id for meal in menu.meals for f in meal.foods]
+            portions = None
+            if any(meal.portions for meal in menu.meals):
+                portions = [meal.portion(i) for meal in menu.meals for i in range(len(meal.foods))]
+            error += float(self.constraints.penalty(self.constraints.totals(food_ids, portions)))
+
+        return error
+
+    def top_menus(self, k: int = 3) -> List[Menu]:
+        # >>> Retorna os top k menus distintos (população já avaliada e ordenada): genótipos
+        # diferentes e, quando possível, a pelo menos top_k_distance (Jaccard) entre si
+        return diverse_top(self.population, k, self.top_k_distance)
+
+    def _deadline_passed(self, start: float) -> bool:
+        return self.deadline_ms is not None and (time.perf_counter() - start) * 1000 >= self.deadline_ms
+
+    @abstractmethod
+    def run(self, progress_callback: Callable = None) -> List[Menu]:
+        # Executa a busca e devolve top_menus(). progress_callback(passo, melhor fitness) é
+        # chamado periodicamente com self.population já ordenada (ver background.PlanJob)
+        ...
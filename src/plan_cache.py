@@ -0,0 +1,260 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import astuple, dataclass
+from typing import Callable, List, Optional, Tuple
+from .models import Menu, NutritionalTargets
+from .food_index import FoodIndex, Genome
+from .genetic_algorithm import GeneticAlgorithm
+
+# Cache de planos por metas quantizadas: perfis com biometria quase igual caem no mesmo
+# balde e reaproveitam o resultado do GA. Camada em memória (LRU) + SQLite local (com
+# limite de tamanho). Num quase-acerto (balde vizinho) os menus guardados semeiam a
+# população inicial em vez de devolvidos diretamente.
+
+TARGET_FIELDS = ("min_calories", "max_calories", "min_proteins", "max_proteins",
+                 "min_carbs", "max_carbs", "min_fats", "max_fats")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    near_hits: int = 0
+    misses: int = 0
+    lookup_seconds: float = 0.0
+    hit_seconds: float = 0.0
+    near_hit_seconds: float = 0.0
+    miss_seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.near_hits + self.misses
+
+        def mean_ms(total: float, count: int) -> float:
+            return 1000 * total / count if count else 0.0
+
+        return {
+            "lookups": lookups,
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "near_hit_rate": self.near_hits / lookups if lookups else 0.0,
+            "miss_rate": self.misses / lookups if lookups else 0.0,
+            "mean_lookup_ms": mean_ms(self.lookup_seconds, lookups),
+            "mean_hit_ms": mean_ms(self.hit_seconds, self.hits),
+            "mean_near_hit_ms": mean_ms(self.near_hit_seconds, self.near_hits),
+            "mean_miss_ms": mean_ms(self.miss_seconds, self.misses),
+        }
+
+
+class PlanCache:
+    def __init__(self,
+                 path: Optional[str] = None,
+                 table_hash: str = "",
+                 calorie_bucket: float = 50.0,
+                 gram_bucket: float = 5.0,
+                 neighbor_radius: int = 1,
+                 max_memory_entries: int = 1024,
+                 max_disk_bytes: int = 64 * 1024 * 1024):
+        # path=None mantém só a camada em memória
+        self.table_hash = table_hash
+        self.calorie_bucket = calorie_bucket
+        self.gram_bucket = gram_bucket
+        self.neighbor_radius = neighbor_radius
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.stats = CacheStats()
+
+        self._memory: "OrderedDict[str, Tuple[Tuple[int, ...], List[Genome]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS plans (
+                    key TEXT PRIMARY KEY,
+                    scope TEXT NOT NULL,
+                    q0 INTEGER, q1 INTEGER, q2 INTEGER, q3 INTEGER,
+                    q4 INTEGER, q5 INTEGER, q6 INTEGER, q7 INTEGER,
+                    payload TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS plans_scope_q0 ON plans (scope, q0);
+                CREATE INDEX IF NOT EXISTS plans_last_access ON plans (last_access);
+            """)
+            # Total de bytes em disco, somado uma vez aqui e mantido por put/_evict_disk
+            self._disk_bytes = self._stored_bytes()
+
+    # --- Chaves -------------------------------------------------------------------
+
+    def quantize(self, targets: NutritionalTargets) -> Tuple[int, ...]:
+        buckets = [self.calorie_bucket] * 2 + [self.gram_bucket] * 6
+        return tuple(int(math.floor(getattr(targets, f) / b + 0.5)) for f, b in zip(TARGET_FIELDS, buckets))
+
+    def scope(self, targets: NutritionalTargets, allowed: Optional[int] = None) -> str:
+        # Metas com limites extras diferentes (ou outra tabela) nunca se misturam; nem
+        # usuários com restrições diferentes (máscara de FoodIndex.allowed_mask)
+        bounds = ";".join(repr(astuple(b)) for b in targets.bounds)
+        if allowed is None:
+            return f"{self.table_hash}|{bounds}"
+        digest = hashlib.sha1(allowed.to_bytes((allowed.bit_length() + 7) // 8, 'little')).hexdigest()[:16]
+        return f"{self.table_hash}|{bounds}|{digest}"
+
+    def _key(self, scope: str, quantized: Tuple[int, ...]) -> str:
+        return scope + "|" + ",".join(map(str, quantized))
+
+    # --- Acesso -------------------------------------------------------------------
+
+    def get(self, targets: NutritionalTargets, allowed: Optional[int] = None) -> Optional[List[Genome]]:
+        scope, quantized = self.scope(targets, allowed), self.quantize(targets)
+        key = self._key(scope, quantized)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry[1]
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT payload FROM plans WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE plans SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            genomes = self._load(row[0])
+            self._remember(key, quantized, genomes)
+            return genomes
+
+    def nearest(self, targets: NutritionalTargets, allowed: Optional[int] = None) -> Optional[List[Genome]]:
+        # Entrada mais próxima (distância L1 em baldes) dentro de neighbor_radius em cada meta
+        scope, quantized = self.scope(targets, allowed), self.quantize(targets)
+        r = self.neighbor_radius
+        best, best_distance = None, None
+        with self._lock:
+            for key, (q, genomes) in self._memory.items():
+                if key.startswith(scope + "|") and all(abs(a - b) <= r for a, b in zip(q, quantized)):
+                    distance = sum(abs(a - b) for a, b in zip(q, quantized))
+                    if best_distance is None or distance < best_distance:
+                        best, best_distance = genomes, distance
+            if self._db is not None:
+                where = " AND ".join(f"q{i} BETWEEN ? AND ?" for i in range(len(quantized)))
+                params = [scope] + [v for q in quantized for v in (q - r, q + r)]
+                rows = self._db.execute(
+                    f"SELECT q0, q1, q2, q3, q4, q5, q6, q7, payload FROM plans WHERE scope = ? AND {where}",
+                    params).fetchall()
+                for row in rows:
+                    distance = sum(abs(a - b) for a, b in zip(row[:8], quantized))
+                    if best_distance is None or distance < best_distance:
+                        best, best_distance = self._load(row[8]), distance
+        return best
+
+    def put(self, targets: NutritionalTargets, genomes: List[Genome], allowed: Optional[int] = None):
+        scope, quantized = self.scope(targets, allowed), self.quantize(targets)
+        key = self._key(scope, quantized)
+        with self._lock:
+            self._remember(key, quantized, genomes)
+            if self._db is None:
+                return
+            payload = json.dumps(genomes, separators=(",", ":"), ensure_ascii=False)
+            replaced = self._db.execute("SELECT size FROM plans WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, scope, *quantized, payload, len(payload), time.time()))
+            self._disk_bytes += len(payload) - (replaced[0] if replaced else 0)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+            self._db.commit()
+
+    def _remember(self, key: str, quantized: Tuple[int, ...], genomes: List[Genome]):
+        self._memory[key] = (quantized, genomes)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _stored_bytes(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM plans").fetchone()[0]
+
+    def _evict_disk(self):
+        # Remove as entradas menos usadas até caber em max_disk_bytes. Só roda quando o total
+        # mantido em memória estoura o limite; então ele é conferido no banco (outra instância
+        # pode ter gravado ou removido entradas no mesmo arquivo)
+        self._disk_bytes = self._stored_bytes()
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        excess = self._disk_bytes - self.max_disk_bytes
+        victims, freed = [], 0
+        for key, size in self._db.execute("SELECT key, size FROM plans ORDER BY last_access"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany("DELETE FROM plans WHERE key = ?", victims)
+        self._disk_bytes -= freed
+
+    @staticmethod
+    def _load(payload: str) -> List[Genome]:
+        # JSON devolve listas; volta às tuplas do Genome (com ou sem porções)
+        return [tuple(tuple(tuple(v) if isinstance(v, list) else v for v in entry) for entry in genome)
+                for genome in json.loads(payload)]
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # --- Integração com o GA ------------------------------------------------------
+
+    def run(self, targets: NutritionalTargets, index: FoodIndex,
+            make_ga: Callable[..., GeneticAlgorithm],
+            progress_callback: Callable = None,
+            allowed: Optional[int] = None) -> List[Menu]:
+        # Consulta o cache antes de GeneticAlgorithm.run.
+        # make_ga(initial_population=...) deve criar o GA para estas metas com o mesmo índice
+        # (e a mesma máscara de restrições `allowed`).
+        start = time.perf_counter()
+        genomes = self.get(targets, allowed)
+        seeds = None if genomes is not None else self.nearest(targets, allowed)
+        self.stats.lookup_seconds += time.perf_counter() - start
+
+        if genomes is not None:
+            menus = self._decode(genomes, index)
+            if menus:
+                # Refaz só o fitness, para as metas exatas deste pedido
+                ga = make_ga(initial_population=None)
+                for menu in menus:
+                    menu.fitness_score = ga.calculate_fitness(menu)
+                    menu.fitness_valid = True
+                menus.sort(key=lambda m: m.fitness_score, reverse=True)
+                self.stats.hits += 1
+                self.stats.hit_seconds += time.perf_counter() - start
+                return menus
+
+        initial = self._decode(seeds, index) if seeds else None
+        ga = make_ga(initial_population=initial)
+        menus = ga.run(progress_callback)
+        self.put(targets, [index.encode_ids(m) for m in menus], allowed)
+
+        elapsed = time.perf_counter() - start
+        if initial:
+            self.stats.near_hits += 1
+            self.stats.near_hit_seconds += elapsed
+        else:
+            self.stats.misses += 1
+            self.stats.miss_seconds += elapsed
+        return menus
+
+    @staticmethod
+    def _decode(genomes: List[Genome], index: FoodIndex) -> List[Menu]:
+        menus = []
+        for genome in genomes:
+            try:
+                menus.append(index.decode_ids(genome))
+            except KeyError:
+                continue
+        return menus
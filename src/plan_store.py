@@ -0,0 +1,297 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import date
+from functools import cached_property
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from .models import Menu, Nutrients, NutrientBound, NutritionalTargets
+from .food_index import FoodIndex, Genome
+
+# Histórico persistente de planos gerados (SQLite local), para consultas por usuário e
+# análises entre usuários. Cada plano é gravado de forma compacta: os alimentos como um
+# array int32 de Food.food_id, a estrutura das refeições como um array uint16
+# (nome da refeição, quantidade de itens, tem porções) e as porções como float64 quando
+# houver (sem perda: o genoma relido é idêntico ao gravado). Nomes de usuário, nomes de
+# refeição e metas ficam em tabelas próprias, gravados uma única vez. Os totais ficam em
+# colunas, para consultas analíticas direto em SQL.
+#
+#   store = PlanStore("data/.cache/history.sqlite")
+#   store.add("ana", menu, targets)
+#   store.foods_served("ana", days=14)      # Counter food_id -> vezes servido
+#   store.plans("ana")[0].menu(index)       # Menu reconstruído só quando pedido
+#
+# Índice (user_id, day): as consultas de um usuário leem apenas as linhas dele, em
+# milissegundos mesmo com milhões de planos gravados.
+
+
+@dataclass
+class NewPlan:
+    # Plano a gravar (ver PlanStore.add_many); genome no formato de FoodIndex.encode_ids
+    user: str
+    genome: Genome
+    targets: Union[NutritionalTargets, dict]
+    totals: Nutrients
+    fitness: float = 0.0
+    day: Optional[date] = None
+
+    @classmethod
+    def from_menu(cls, user: str, menu: Menu, targets: NutritionalTargets,
+                  day: Optional[date] = None) -> "NewPlan":
+        genome = tuple(FoodIndex._gene(meal, tuple(f.food_id for f in meal.foods)) for meal in menu.meals)
+        return cls(user, genome, targets, menu.totals, menu.fitness_score, day)
+
+
+@dataclass
+class StoredPlan:
+    # Plano lido do banco. Genoma, metas e Menu só são decodificados quando acessados
+    id: int
+    user: str
+    day: date
+    fitness: float
+    totals: Nutrients
+    _layout: bytes = field(repr=False)
+    _foods: bytes = field(repr=False)
+    _portions: Optional[bytes] = field(repr=False)
+    _meal_names: Sequence[str] = field(repr=False)
+    _targets: str = field(repr=False)
+
+    @cached_property
+    def food_ids(self) -> np.ndarray:
+        return np.frombuffer(self._foods, dtype='<i4')
+
+    @cached_property
+    def genome(self) -> Genome:
+        layout = np.frombuffer(self._layout, dtype='<u2').reshape(-1, 3).tolist()
+        ids = self.food_ids.tolist()
+        portions = np.frombuffer(self._portions, dtype='<f8').tolist() if self._portions else None
+        genome, start = [], 0
+        for name_id, count, has_portions in layout:
+            end = start + count
+            entry = (self._meal_names[name_id], tuple(ids[start:end]))
+            if has_portions:
+                entry += (tuple(portions[start:end]),)
+            genome.append(entry)
+            start = end
+        return tuple(genome)
+
+    @cached_property
+    def targets(self) -> NutritionalTargets:
+        data = json.loads(self._targets)
+        data["bounds"] = [NutrientBound(**b) for b in data.get("bounds", ())]
+        return NutritionalTargets(**data)
+
+    def menu(self, index: FoodIndex) -> Menu:
+        # KeyError se algum food_id não pertence ao catálogo do índice
+        menu = index.decode_ids(self.genome)
+        menu.fitness_score = self.fitness
+        menu.targets = self.targets
+        return menu
+
+
+def _targets_json(targets: Union[NutritionalTargets, dict]) -> str:
+    data = asdict(targets) if isinstance(targets, NutritionalTargets) else dict(targets)
+    data.setdefault("bounds", [])
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+class PlanStore:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS meal_names (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS targets (
+                id INTEGER PRIMARY KEY,
+                data TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS plans (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                day INTEGER NOT NULL,
+                created REAL NOT NULL,
+                targets_id INTEGER NOT NULL,
+                fitness REAL NOT NULL,
+                calories REAL NOT NULL,
+                proteins REAL NOT NULL,
+                carbs REAL NOT NULL,
+                fats REAL NOT NULL,
+                layout BLOB NOT NULL,
+                foods BLOB NOT NULL,
+                portions BLOB
+            );
+            CREATE INDEX IF NOT EXISTS plans_user_day ON plans (user_id, day);
+            CREATE INDEX IF NOT EXISTS plans_day ON plans (day);
+        """)
+        self._load_dictionaries()
+
+    # --- Dicionários --------------------------------------------------------------
+
+    def _load_dictionaries(self):
+        # Tabelas pequenas, mantidas em memória nos dois sentidos. São só um cache: outra
+        # instância (ex: app e `batch --store` no mesmo arquivo) pode gravar entradas novas,
+        # então uma ausência é sempre conferida no banco (ver _intern, _user_id e _sync)
+        self._users: Dict[str, int] = dict(self._db.execute("SELECT name, id FROM users"))
+        self._meal_ids: Dict[str, int] = dict(self._db.execute("SELECT name, id FROM meal_names"))
+        self._meal_names: List[str] = [""] * (max(self._meal_ids.values(), default=0) + 1)
+        for name, meal_id in self._meal_ids.items():
+            self._meal_names[meal_id] = name
+        self._targets: Dict[str, int] = dict(self._db.execute("SELECT data, id FROM targets"))
+        self._targets_by_id: Dict[int, str] = {v: k for k, v in self._targets.items()}
+
+    def _intern(self, table: str, column: str, cache: Dict[str, int], value: str) -> int:
+        key = cache.get(value)
+        if key is None:
+            # OR IGNORE + SELECT: o valor pode já ter sido gravado por outra instância
+            self._db.execute(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,))
+            key = self._db.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()[0]
+            cache[value] = key
+        return key
+
+    def _user_id(self, user: str) -> Optional[int]:
+        user_id = self._users.get(user)
+        if user_id is None:
+            row = self._db.execute("SELECT id FROM users WHERE name = ?", (user,)).fetchone()
+            if row is not None:
+                user_id = self._users[user] = row[0]
+        return user_id
+
+    def _sync(self, targets_ids: Iterable[int]):
+        # Planos gravados por outra instância podem usar refeições ou metas ainda não vistas
+        meals = self._db.execute("SELECT COUNT(*) FROM meal_names").fetchone()[0]
+        if meals != len(self._meal_ids) or any(t not in self._targets_by_id for t in targets_ids):
+            self._load_dictionaries()
+
+    def _meal_id(self, name: str) -> int:
+        meal_id = self._intern("meal_names", "name", self._meal_ids, name)
+        if meal_id >= len(self._meal_names):
+            self._meal_names.extend([""] * (meal_id + 1 - len(self._meal_names)))
+        self._meal_names[meal_id] = name
+        return meal_id
+
+    def _targets_id(self, targets) -> int:
+        data = _targets_json(targets)
+        targets_id = self._intern("targets", "data", self._targets, data)
+        self._targets_by_id[targets_id] = data
+        return targets_id
+
+    # --- Escrita ------------------------------------------------------------------
+
+    def _row(self, plan: NewPlan, created: float, targets_ids: Dict[int, tuple]) -> tuple:
+        layout, ids, portions = [], [], []
+        for entry in plan.genome:
+            layout += (self._meal_id(entry[0]), len(entry[1]), len(entry) > 2)
+            ids.extend(entry[1])
+            portions.extend(entry[2] if len(entry) > 2 else (1.0,) * len(entry[1]))
+        has_portions = any(len(entry) > 2 for entry in plan.genome)
+        day = plan.day or date.today()
+        # Um lote costuma repetir o mesmo objeto de metas: serializa cada um uma vez
+        cached = targets_ids.get(id(plan.targets))
+        if cached is None or cached[0] is not plan.targets:
+            cached = targets_ids[id(plan.targets)] = (plan.targets, self._targets_id(plan.targets))
+        return (self._intern("users", "name", self._users, plan.user), day.toordinal(), created,
+                cached[1], float(plan.fitness), *map(float, plan.totals),
+                np.array(layout, dtype='<u2').tobytes(), np.array(ids, dtype='<i4').tobytes(),
+                np.array(portions, dtype='<f8').tobytes() if has_portions else None)
+
+    def _insert(self, plans: Iterable[NewPlan]) -> sqlite3.Cursor:
+        created = time.time()
+        try:
+            with self._db:
+                targets_ids: Dict[int, tuple] = {}
+                rows = [self._row(plan, created, targets_ids) for plan in plans]
+                return self._db.executemany(
+                    "INSERT INTO plans (user_id, day, created, targets_id, fitness, calories, proteins,"
+                    " carbs, fats, layout, foods, portions) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows)
+        except BaseException:
+            # A transação desfez também usuários/refeições/metas novos: relê os dicionários
+            self._load_dictionaries()
+            raise
+
+    def add_many(self, plans: Iterable[NewPlan]) -> int:
+        # Inserção em lote numa única transação (ex: resultados do src.batch); devolve quantos
+        with self._lock:
+            return self._insert(plans).rowcount
+
+    def add(self, user: str, menu: Menu, targets: NutritionalTargets, day: Optional[date] = None) -> int:
+        # Grava um menu; devolve o id do plano
+        with self._lock:
+            self._insert([NewPlan.from_menu(user, menu, targets, day)])
+            return self._db.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+    # --- Consultas ----------------------------------------------------------------
+
+    @staticmethod
+    def _range(days: Optional[int], today: Optional[date]) -> Tuple[int, int]:
+        # Intervalo de dias (ordinais, inclusive): os `days` dias até `today`, ou tudo
+        end = (today or date.today()).toordinal()
+        return (end - days + 1 if days is not None else 0), end
+
+    def plans(self, user: str, days: Optional[int] = None, today: Optional[date] = None,
+              limit: Optional[int] = None) -> List[StoredPlan]:
+        # Planos do usuário, do mais recente ao mais antigo
+        start, end = self._range(days, today)
+        with self._lock:
+            user_id = self._user_id(user)
+            if user_id is None:
+                return []
+            rows = self._db.execute(
+                "SELECT id, day, fitness, calories, proteins, carbs, fats, layout, foods, portions,"
+                " targets_id FROM plans WHERE user_id = ? AND day BETWEEN ? AND ?"
+                " ORDER BY day DESC, id DESC LIMIT ?",
+                (user_id, start, end, -1 if limit is None else limit)).fetchall()
+            self._sync(row[10] for row in rows)
+        return [StoredPlan(row[0], user, date.fromordinal(row[1]), row[2], tuple(row[3:7]),
+                           row[7], row[8], row[9], self._meal_names, self._targets_by_id[row[10]])
+                for row in rows]
+
+    def latest(self, user: str) -> Optional[StoredPlan]:
+        plans = self.plans(user, limit=1)
+        return plans[0] if plans else None
+
+    def foods_served(self, user: str, days: int = 14, today: Optional[date] = None) -> Counter:
+        # food_id -> quantas vezes apareceu nos planos do usuário nos últimos `days` dias
+        start, end = self._range(days, today)
+        with self._lock:
+            user_id = self._user_id(user)
+            if user_id is None:
+                return Counter()
+            blobs = self._db.execute("SELECT foods FROM plans WHERE user_id = ? AND day BETWEEN ? AND ?",
+                                     (user_id, start, end)).fetchall()
+        if not blobs:
+            return Counter()
+        ids, counts = np.unique(np.frombuffer(b"".join(b for (b,) in blobs), dtype='<i4'), return_counts=True)
+        return Counter(dict(zip(ids.tolist(), counts.tolist())))
+
+    def served_names(self, user: str, index: FoodIndex, days: int = 14,
+                     today: Optional[date] = None) -> List[str]:
+        # Nomes dos alimentos servidos recentemente (ex: history= do NSGA2GeneticAlgorithm)
+        return [index.food_by_id[i].name for i in self.foods_served(user, days, today) if i in index.food_by_id]
+
+    def users(self) -> List[str]:
+        with self._lock:
+            return [name for (name,) in self._db.execute("SELECT name FROM users ORDER BY name")]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,108 @@
+from typing import List, Optional
+import numpy as np
+from .models import Menu, NutritionalTargets
+from .food_table import NutrientConstraints
+
+# Etapa memética do GA: o GA escolhe QUAIS alimentos entram no menu e esta etapa
+# ajusta QUANTO de cada um (multiplicador da porção de 100 g da TACO), resolvendo
+# um problema contínuo de mínimos quadrados com limites contra as faixas das metas.
+#
+# Para cada menu e, com A_e (itens x nutrientes) já normalizado pelas mesmas escalas
+# do fitness (/100 kcal, /10 g, scale dos limites extras):
+#     min_x  sum(max(L - A_e^T x, 0)^2 + max(A_e^T x - U, 0)^2) + reg * |x - 1|^2
+#     sujeito a  min_portion <= x <= max_portion
+# A parte sem regularização é exatamente o erro de GeneticAlgorithm.calculate_error.
+# Todos os menus são resolvidos juntos (matriz preenchida com zeros nos itens ausentes)
+# por gradiente projetado acelerado (FISTA), com passo 1/Lipschitz de cada menu.
+
+MACRO_SCALES = np.array([100.0, 10.0, 10.0, 10.0])
+
+
+class PortionOptimizer:
+    def __init__(self,
+                 targets: NutritionalTargets,
+                 min_portion: float = 0.5,
+                 max_portion: float = 2.0,
+                 iterations: int = 80,
+                 regularization: float = 0.01,
+                 step: Optional[float] = 0.05,
+                 constraints: Optional[NutrientConstraints] = None):
+        if not 0 < min_portion <= 1.0 <= max_portion:
+            raise ValueError("As porções devem satisfazer 0 < min_portion <= 1 <= max_portion")
+        self.min_portion = min_portion
+        self.max_portion = max_portion
+        self.iterations = iterations
+        # Puxa cada porção para 1.0: entre soluções equivalentes, prefere a menos alterada
+        self.regularization = regularization
+        # Arredondamento final das porções (0.05 = 5 g); None mantém o valor contínuo
+        self.step = step
+        self.constraints = constraints
+
+        lower = [targets.min_calories, targets.min_proteins, targets.min_carbs, targets.min_fats]
+        upper = [targets.max_calories, targets.max_proteins, targets.max_carbs, targets.max_fats]
+        scales = MACRO_SCALES
+        if constraints is not None and len(constraints):
+            lower = np.concatenate([lower, constraints.lower])
+            upper = np.concatenate([upper, constraints.upper])
+            scales = np.concatenate([scales, constraints.scale])
+        self.scales = np.asarray(scales, dtype=np.float64)
+        self.lower = np.asarray(lower, dtype=np.float64) / self.scales
+        self.upper = np.asarray(upper, dtype=np.float64) / self.scales
+
+    def _system(self, menus: List[Menu]):
+        # A: (menus, itens, nutrientes) normalizado; x0: porções atuais; mask: itens existentes
+        items = [[(f, meal.portion(i)) for meal in menu.meals for i, f in enumerate(meal.foods)] for menu in menus]
+        width = max((len(row) for row in items), default=0)
+        macros = np.zeros((len(menus), width, 4))
+        x0 = np.ones((len(menus), width))
+        mask = np.zeros((len(menus), width), dtype=bool)
+        ids = np.zeros((len(menus), width), dtype=np.int64)
+        for e, row in enumerate(items):
+            if row:
+                macros[e, :len(row)] = [f.nutrients for f, _ in row]
+                x0[e, :len(row)] = [p for _, p in row]
+                ids[e, :len(row)] = [f.food_id for f, _ in row]
+                mask[e, :len(row)] = True
+
+        A = macros
+        if self.constraints is not None and len(self.constraints):
+            A = np.concatenate([A, self.constraints.matrix[ids] * mask[..., None]], axis=2)
+        return A / self.scales, x0, mask
+
+    def solve(self, A: np.ndarray, x0: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        # Constante de Lipschitz do gradiente de cada menu: 2 * (sigma_max(A_e)^2 + reg)
+        sigma = np.linalg.svd(A, compute_uv=False)[:, 0] if A.size else np.zeros(len(A))
+        step = 1.0 / (2.0 * (sigma ** 2 + self.regularization))[:, None]
+
+        x = np.clip(x0, self.min_portion, self.max_portion)
+        y, momentum = x, 1.0
+        for _ in range(self.iterations):
+            totals = np.einsum('esr,es->er', A, y)
+            residual = np.maximum(totals - self.upper, 0.0) - np.maximum(self.lower - totals, 0.0)
+            grad = 2.0 * np.einsum('esr,er->es', A, residual) + 2.0 * self.regularization * (y - 1.0)
+            x_next = np.where(mask, np.clip(y - step * grad, self.min_portion, self.max_portion), 1.0)
+            momentum_next = (1.0 + np.sqrt(1.0 + 4.0 * momentum ** 2)) / 2.0
+            y = x_next + ((momentum - 1.0) / momentum_next) * (x_next - x)
+            x, momentum = x_next, momentum_next
+
+        if self.step:
+            x = np.round(np.clip(np.round(x / self.step) * self.step, self.min_portion, self.max_portion), 6)
+        return x
+
+    def optimize(self, menus: List[Menu]) -> List[Menu]:
+        # Devolve novos menus (mesmos alimentos, porções ajustadas); os originais não mudam.
+        # O fitness dos novos menus fica a recalcular.
+        if not menus:
+            return []
+        A, x0, mask = self._system(menus)
+        portions = self.solve(A, x0, mask)
+
+        optimized = []
+        for menu, row in zip(menus, portions.tolist()):
+            meals, offset = [], 0
+            for meal in menu.meals:
+                n = len(meal.foods)
+                meals.append(meal.with_portions(row[offset:offset + n]))
+                offset += n
+            optimized.append(Menu(meals=meals, targets=menu.targets))
+        return optimized
@@ -0,0 +1,356 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .models import Food
+from .batch import DEFAULT_CSV, plan_profile, normalize_profile
+from .workers import init_worker
+
+# Serviço HTTP/JSON (só biblioteca padrão) para gerar cardápios fora do Streamlit.
+# O laço asyncio só faz I/O; o GA roda num pool de processos, cada worker com a TACO
+# carregada e indexada uma única vez (init_worker). Pedidos idênticos simultâneos são
+# coalescidos numa única execução, e acima de `max_queue` execuções aguardando worker
+# o serviço responde 503 (Retry-After) em vez de acumular fila.
+#
+#   python -m src.service serve --port 8000 --workers 4
+#   curl -d '{"weight": 70, "height": 170, "age": 30, "gender": "M"}' localhost:8000/plan
+#   python -m src.service loadtest --port 8000 --requests 500 --concurrency 32
+
+MAX_BODY_BYTES = 64 * 1024
+READ_TIMEOUT = 30.0
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class Overloaded(Exception):
+    pass
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# --- HTTP/1.1 mínimo (servidor e cliente de carga) ---------------------------------
+
+async def read_message(reader: asyncio.StreamReader) -> Optional[Tuple[str, Dict[str, str], bytes]]:
+    # (linha inicial, cabeçalhos em minúsculas, corpo); None se a conexão fechou
+    start_line = await reader.readline()
+    if not start_line:
+        return None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode('latin1').partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HttpError(400, "Content-Length inválido")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "Corpo da requisição muito grande")
+    body = await reader.readexactly(length) if length else b""
+    return start_line.decode('latin1').strip(), headers, body
+
+
+def encode_response(status: int, payload: dict, keep_alive: bool = True, extra_headers: Sequence[str] = ()) -> bytes:
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+             "Content-Type: application/json; charset=utf-8",
+             f"Content-Length: {len(body)}",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}",
+             *extra_headers]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin1') + body
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    # Percentil por posição mais próxima (q em 0..100)
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+# --- Serviço --------------------------------------------------------------------------
+
+class PlanningService:
+    def __init__(self,
+                 foods: List[Food],
+                 population_size: int = 150,
+                 generations: int = 40,
+                 max_workers: Optional[int] = None,
+                 max_queue: int = 64,
+                 portion_stage: Optional[str] = None,
+                 executor: Optional[Executor] = None):
+        self.params = dict(population_size=population_size, generations=generations, portion_stage=portion_stage)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # Execuções distintas aguardando um worker livre além das que já estão rodando
+        self.max_queue = max_queue
+        # Um executor externo precisa ter sido criado com initializer=init_worker
+        self.executor = executor or ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=init_worker, initargs=(foods,))
+        self._owns_executor = executor is None
+
+        # Execuções em andamento por chave do pedido (coalescência)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.computed = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=2048)
+
+    @staticmethod
+    def request_key(profile: dict, seed: Optional[int]) -> str:
+        fields = {k: v for k, v in profile.items() if k != "id"}
+        return json.dumps([fields, seed], sort_keys=True)
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, len(self._inflight) - self.max_workers)
+
+    async def plan(self, raw: dict) -> dict:
+        # Normaliza o perfil, junta-se a uma execução idêntica em andamento ou agenda uma nova
+        try:
+            profile = normalize_profile(raw, 0)
+            seed = None if raw.get("seed") is None else int(raw["seed"])
+        except (KeyError, TypeError, ValueError, ArithmeticError) as exc:
+            raise HttpError(400, f"Perfil inválido: {exc}")
+
+        self.requests += 1
+        key = self.request_key(profile, seed)
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            if len(self._inflight) >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise Overloaded()
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, plan_profile, profile, self.params, seed)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _, key=key: self._done(key))
+
+        # shield: um cliente que desconecta não cancela a execução compartilhada
+        try:
+            result = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            raise
+        except ValueError as exc:
+            # Perfil que só o índice valida (ex: alimento excluído que não existe no catálogo)
+            raise HttpError(400, f"Perfil inválido: {exc}")
+        except Exception as exc:
+            # Falha no worker (plan_profile ou o motor): vira 500 em vez de derrubar a conexão
+            self.failed += 1
+            raise HttpError(500, f"Falha ao gerar o cardápio: {type(exc).__name__}: {exc}")
+        return {**result, "id": raw.get("id") or result["id"]}
+
+    def _done(self, key: str):
+        self._inflight.pop(key, None)
+        self.computed += 1
+
+    def metrics(self) -> dict:
+        latencies = list(self.latencies)
+        return {
+            "requests": self.requests,
+            "computed": self.computed,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "inflight": len(self._inflight),
+            "queue_depth": self.queue_depth,
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "latency_p50_ms": percentile(latencies, 50) * 1000,
+            "latency_p99_ms": percentile(latencies, 99) * 1000,
+        }
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, dict, Sequence[str]]:
+        if path == "/health":
+            return 200, {"status": "ok"}, ()
+        if path == "/metrics":
+            return 200, self.metrics(), ()
+        if path != "/plan":
+            raise HttpError(404, f"Rota desconhecida: {path}")
+        if method != "POST":
+            raise HttpError(405, "Use POST /plan")
+        try:
+            raw = json.loads(body or b"{}")
+        except ValueError:
+            raise HttpError(400, "JSON inválido")
+        if not isinstance(raw, dict):
+            raise HttpError(400, "O corpo deve ser um objeto JSON")
+
+        start = time.perf_counter()
+        try:
+            result = await self.plan(raw)
+        except Overloaded:
+            return 503, {"error": "Serviço sobrecarregado", "queue_depth": self.queue_depth}, ("Retry-After: 1",)
+        self.latencies.append(time.perf_counter() - start)
+        return 200, result, ()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Uma conexão pode levar vários pedidos (keep-alive)
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(read_message(reader), READ_TIMEOUT)
+                except HttpError as exc:
+                    writer.write(encode_response(exc.status, {"error": str(exc)}, keep_alive=False))
+                    break
+                if message is None:
+                    break
+                start_line, headers, body = message
+                parts = start_line.split()
+                if len(parts) != 3:
+                    writer.write(encode_response(400, {"error": "Requisição malformada"}, keep_alive=False))
+                    break
+                method, path, version = parts
+                keep_alive = headers.get("connection", "").lower() != "close" and version != "HTTP/1.0"
+                try:
+                    status, payload, extra = await self._route(method, path.split("?")[0], body)
+                except HttpError as exc:
+                    status, payload, extra = exc.status, {"error": str(exc)}, ()
+                except Exception as exc:
+                    # Última barreira: o cliente sempre recebe uma resposta JSON
+                    status, payload, extra = 500, {"error": f"{type(exc).__name__}: {exc}"}, ()
+                writer.write(encode_response(status, payload, keep_alive, extra))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000, ready: Optional[asyncio.Event] = None):
+        server = await asyncio.start_server(self.handle, host, port)
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        if self._owns_executor:
+            self.executor.shutdown()
+
+
+# --- Teste de carga ---------------------------------------------------------------------
+
+def sample_profiles(distinct: int, seed: int = 0) -> List[dict]:
+    rng = random.Random(seed)
+    return [{"weight": rng.randint(45, 110), "height": rng.randint(150, 195), "age": rng.randint(18, 70),
+             "gender": rng.choice("MF"), "activity_level": rng.choice([1.2, 1.375, 1.55, 1.725]), "seed": i}
+            for i in range(distinct)]
+
+
+async def load_test(host: str, port: int, requests: int = 200, concurrency: int = 16,
+                    distinct: int = 20, seed: int = 0, backoff: float = 0.05) -> dict:
+    # `concurrency` clientes com conexões keep-alive disparam `requests` pedidos no total,
+    # sorteados entre `distinct` perfis (repetições exercitam a coalescência). Um 503 é
+    # reenviado após `backoff` segundos; a latência conta desde a primeira tentativa.
+    profiles = sample_profiles(distinct, seed)
+    rng = random.Random(seed)
+    bodies = deque(json.dumps(rng.choice(profiles)).encode('utf-8') for _ in range(requests))
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while bodies:
+                body = bodies.popleft()
+                request = (f"POST /plan HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                           f"Content-Length: {len(body)}\r\n\r\n").encode('latin1') + body
+                start = time.perf_counter()
+                while True:
+                    writer.write(request)
+                    await writer.drain()
+                    start_line, _, _ = await read_message(reader)
+                    status = int(start_line.split()[1])
+                    statuses[status] = statuses.get(status, 0) + 1
+                    if status != 503:
+                        break
+                    await asyncio.sleep(backoff)
+                latencies.append(time.perf_counter() - start)
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "distinct_profiles": distinct,
+        "seconds": elapsed,
+        "throughput_rps": requests / elapsed if elapsed > 0 else 0.0,
+        "responses": statuses,
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p90_ms": percentile(latencies, 90) * 1000,
+        "latency_p99_ms": percentile(latencies, 99) * 1000,
+        "latency_max_ms": max(latencies, default=0.0) * 1000,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP/JSON de planejamento de cardápios.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Inicia o serviço")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--taco", default=DEFAULT_CSV)
+    serve.add_argument("--workers", type=int, default=None)
+    serve.add_argument("--max-queue", type=int, default=64,
+                       help="Execuções aguardando worker antes de responder 503")
+    serve.add_argument("--population", type=int, default=150)
+    serve.add_argument("--generations", type=int, default=40)
+    serve.add_argument("--portions", choices=["elite", "final"], default=None)
+
+    test = commands.add_parser("loadtest", help="Dispara pedidos concorrentes e mede a latência")
+    test.add_argument("--host", default="127.0.0.1")
+    test.add_argument("--port", type=int, default=8000)
+    test.add_argument("--requests", type=int, default=200)
+    test.add_argument("--concurrency", type=int, default=16)
+    test.add_argument("--distinct", type=int, default=20, help="Perfis distintos entre os pedidos")
+    test.add_argument("--seed", type=int, default=0)
+    test.add_argument("--backoff", type=float, default=0.05, help="Espera (s) antes de reenviar após um 503")
+    args = parser.parse_args(argv)
+
+    if args.command == "loadtest":
+        report = asyncio.run(load_test(args.host, args.port, args.requests, args.concurrency,
+                                       args.distinct, args.seed, args.backoff))
+        print(json.dumps(report, indent=2))
+        return
+
+    from .food_cache import load_foods
+    service = PlanningService(load_foods(args.taco), population_size=args.population,
+                              generations=args.generations, max_workers=args.workers,
+                              max_queue=args.max_queue, portion_stage=args.portions)
+    print(f"Servindo em http://{args.host}:{args.port} ({service.max_workers} workers)", file=sys.stderr)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
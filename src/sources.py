@@ -0,0 +1,351 @@
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import sys
+import time
+import tracemalloc
+import unicodedata
+from bisect import bisect_right
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from .data_loader import TACO_NUTRIENT_COLUMNS, iter_taco_rows
+from .food_table import FoodTable
+from .tagging import tag_masks
+
+# Carga de várias tabelas de composição (TACO + exportações CSV de outras bases, ex: USDA)
+# numa única FoodTable, em streaming: as linhas são lidas uma a uma, convertidas em blocos
+# de `chunk_size` (conversão numérica e etiquetagem vetorizadas por bloco) e
+# deduplicadas entre as fontes pelo nome normalizado. A memória do parsing fica limitada
+# ao bloco; só a tabela final cresce com o catálogo.
+#
+#   python -m src.sources data/taco.csv usda_sr:ABBREV.csv --output catalogo.npz
+#
+# Uma fonte é qualquer objeto com `name`, `nutrients` (colunas que fornece) e `rows()`,
+# gerador de (nome, categoria, valores na ordem de `nutrients`); valores podem ser texto
+# ("12,5", "Tr", "" = ausente) e são convertidos em lote por bloco.
+
+# Colunas da FoodTable combinada (as mesmas da TACO)
+NUTRIENTS: Tuple[str, ...] = tuple(TACO_NUTRIENT_COLUMNS)
+
+MISSING = {"", "na", "n/a", "*", "-", "--"}
+TRACE = {"tr", "traço", "traços"}
+
+
+def parse_number(value: str) -> float:
+    # Como data_loader.clean_number, mas ausente vira NaN (para a deduplicação completar
+    # com outras fontes) e aceita vírgula ou ponto decimal
+    try:
+        return float(value)
+    except ValueError:
+        text = value.strip().lower()
+        if text in MISSING:
+            return math.nan
+        if text in TRACE:
+            return 0.0
+        try:
+            return float(text.replace(',', '.'))
+        except ValueError:
+            return math.nan
+
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize_name(name: str) -> str:
+    # Chave de deduplicação: sem acentos, minúsculas, pontuação e espaços colapsados
+    if not name.isascii():
+        name = "".join(c for c in unicodedata.normalize("NFKD", name) if not unicodedata.combining(c))
+    return _SEPARATORS.sub(" ", name.casefold()).strip()
+
+
+@dataclass(frozen=True)
+class CsvSchema:
+    # Mapeamento de um CSV com cabeçalho para as colunas da FoodTable.
+    # columns: nutriente -> nome da coluna no CSV; scale: fator por nutriente (ex: por porção -> 100 g)
+    # category_of: (valor da category_column, nome) -> categoria no padrão da TACO, para que as
+    # regras de tagging (carnes, leite, cru, ...) valham também para a fonte (ex: CodeCategories)
+    name_column: str
+    columns: Dict[str, str]
+    category_column: Optional[str] = None
+    default_category: str = "Geral"
+    delimiter: str = ","
+    encoding: str = "utf-8"
+    scale: Dict[str, float] = field(default_factory=dict)
+    category_of: Optional[Callable[[str, str], str]] = None
+
+
+@dataclass(frozen=True)
+class CodeCategories:
+    # Categoria a partir de um código (ex: NDB_No da USDA, cujos 2 primeiros dígitos são o
+    # grupo de alimentos): o código é completado com zeros à esquerda até `width` (exportações
+    # via planilha perdem o zero: "1001" = "01001") e os `prefix` primeiros caracteres são
+    # buscados em `groups`. `by_name`: (início do nome, categoria) avaliados antes, para
+    # grupos mistos. Grupo desconhecido vira `default` e fica só com as regras por nome.
+    # Dataclass (e não função) para ter repr estável na chave do cache (food_cache)
+    groups: Dict[str, str]
+    width: int = 0
+    prefix: int = 0
+    by_name: Tuple[Tuple[str, str], ...] = ()
+    default: str = "Geral"
+
+    def __call__(self, code: str, name: str) -> str:
+        upper = name.upper()
+        for start, category in self.by_name:
+            if upper.startswith(start):
+                return category
+        code = code.strip().zfill(self.width)
+        return self.groups.get(code[:self.prefix] if self.prefix else code, self.default)
+
+
+# Grupos de alimentos da USDA SR -> categorias da TACO
+USDA_FOOD_GROUPS: Dict[str, str] = {
+    "01": "Leite e derivados",                      # Dairy and Egg Products (ovos: by_name)
+    "02": "Miscelâneas",                            # Spices and Herbs
+    "03": "Outros alimentos industrializados",      # Baby Foods
+    "04": "Gorduras e óleos",                       # Fats and Oils
+    "05": "Carnes e derivados",                     # Poultry Products
+    "06": "Alimentos preparados",                   # Soups, Sauces, and Gravies
+    "07": "Carnes e derivados",                     # Sausages and Luncheon Meats
+    "08": "Cereais e derivados",                    # Breakfast Cereals
+    "09": "Frutas e derivados",                     # Fruits and Fruit Juices
+    "10": "Carnes e derivados",                     # Pork Products
+    "11": "Verduras, hortaliças e derivados",       # Vegetables and Vegetable Products
+    "12": "Nozes e sementes",                       # Nut and Seed Products
+    "13": "Carnes e derivados",                     # Beef Products
+    "14": "Bebidas (alcoólicas e não alcoólicas)",  # Beverages
+    "15": "Pescados e frutos do mar",               # Finfish and Shellfish Products
+    "16": "Leguminosas e derivados",                # Legumes and Legume Products
+    "17": "Carnes e derivados",                     # Lamb, Veal, and Game Products
+    "18": "Cereais e derivados",                    # Baked Products
+    "19": "Produtos açucarados",                    # Sweets
+    "20": "Cereais e derivados",                    # Cereal Grains and Pasta
+    "21": "Alimentos preparados",                   # Fast Foods
+    "22": "Alimentos preparados",                   # Meals, Entrees, and Side Dishes
+    "25": "Outros alimentos industrializados",      # Snacks
+    "35": "Alimentos preparados",                   # American Indian/Alaska Native Foods
+    "36": "Alimentos preparados",                   # Restaurant Foods
+}
+
+
+# Exportação "abreviada" da USDA SR (ABBREV), valores por 100 g
+USDA_SR_SCHEMA = CsvSchema(
+    name_column="Shrt_Desc",
+    category_column="NDB_No",
+    category_of=CodeCategories(USDA_FOOD_GROUPS, width=5, prefix=2, by_name=(("EGG,", "Ovos e derivados"),)),
+    columns={
+        'moisture': "Water_(g)", 'calories': "Energ_Kcal", 'proteins': "Protein_(g)",
+        'fats': "Lipid_Tot_(g)", 'cholesterol': "Cholestrl_(mg)", 'carbs': "Carbohydrt_(g)",
+        'fiber': "Fiber_TD_(g)", 'ash': "Ash_(g)", 'calcium': "Calcium_(mg)",
+        'magnesium': "Magnesium_(mg)", 'manganese': "Manganese_(mg)", 'phosphorus': "Phosphorus_(mg)",
+        'iron': "Iron_(mg)", 'sodium': "Sodium_(mg)", 'potassium': "Potassium_(mg)",
+        'copper': "Copper_mg)", 'zinc': "Zinc_(mg)", 'retinol': "Retinol_(µg)", 'rae': "Vit_A_RAE",
+        'thiamine': "Thiamin_(mg)", 'riboflavin': "Riboflavin_(mg)", 'pyridoxine': "Vit_B6_(mg)",
+        'niacin': "Niacin_(mg)", 'vitamin_c': "Vit_C_(mg)",
+    })
+
+# Esquemas aceitos pela CLI ("esquema:caminho")
+SCHEMAS: Dict[str, CsvSchema] = {
+    "usda_sr": USDA_SR_SCHEMA,
+}
+
+
+class TacoSource:
+    # A TACO original (layout próprio: sem cabeçalho, categorias em linhas separadoras)
+    def __init__(self, path: str):
+        self.path = path
+        self.name = path
+        self.nutrients = NUTRIENTS
+
+    def rows(self) -> Iterator[tuple]:
+        for food in iter_taco_rows(self.path):
+            yield food['name'], food['category'], [food[n] for n in NUTRIENTS]
+
+
+class CsvSource:
+    def __init__(self, path: str, schema: CsvSchema):
+        self.path = path
+        self.schema = schema
+        self.name = path
+        # Preenchido ao ler o cabeçalho: nutrientes mapeados presentes neste arquivo
+        self.nutrients: Tuple[str, ...] = ()
+
+    def rows(self) -> Iterator[tuple]:
+        # Os valores saem como texto; a conversão é feita em lote, por bloco (ver convert_block)
+        schema = self.schema
+        with open(self.path, 'r', encoding=schema.encoding, newline='') as f:
+            reader = csv.reader(f, delimiter=schema.delimiter)
+            header = [h.strip() for h in next(reader, [])]
+            position = {h: i for i, h in enumerate(header)}
+            if schema.name_column not in position:
+                raise ValueError(f"{self.path}: coluna de nome '{schema.name_column}' não encontrada")
+            name_at = position[schema.name_column]
+            category_at = position.get(schema.category_column) if schema.category_column else None
+            mapped = [(n, position[c]) for n, c in schema.columns.items() if c in position]
+            self.nutrients = tuple(n for n, _ in mapped)
+            columns = [at for _, at in mapped]
+            width = len(header)
+            default_category = schema.default_category
+            category_of = schema.category_of
+            for row in reader:
+                name = row[name_at].strip() if len(row) >= width else ""
+                if not name:
+                    continue
+                category = row[category_at].strip() if category_at is not None else default_category
+                if category_of is not None:
+                    category = category_of(category, name)
+                yield name, category, [row[at] for at in columns]
+
+    def scale(self) -> np.ndarray:
+        return np.array([self.schema.scale.get(n, 1.0) for n in self.nutrients], dtype=np.float32)
+
+
+def open_source(spec: str):
+    # "caminho" = TACO; "esquema:caminho" = CSV com um dos SCHEMAS
+    schema, sep, path = spec.partition(":")
+    if sep and schema in SCHEMAS:
+        return CsvSource(path, SCHEMAS[schema])
+    return TacoSource(spec)
+
+
+def convert_block(raw: List[list]) -> np.ndarray:
+    # Valores de um bloco (texto ou número) -> matriz float32. Caminho rápido com float()
+    # direto; se alguma célula não for um número simples ("12,5", "Tr"), o bloco inteiro
+    # passa por parse_number
+    try:
+        flat = [float(v) if v != '' else math.nan for row in raw for v in row]
+    except ValueError:
+        flat = [parse_number(v) if isinstance(v, str) else float(v) for row in raw for v in row]
+    return np.array(flat, dtype=np.float32).reshape(len(raw), -1)
+
+
+@dataclass
+class LoadReport:
+    sources: Dict[str, int] = field(default_factory=dict)   # linhas lidas por fonte
+    rows_read: int = 0
+    rows_kept: int = 0
+    duplicates: int = 0
+    seconds: float = 0.0
+    rows_per_second: float = 0.0
+    peak_bytes: Optional[int] = None                          # só com measure_memory=True
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def stream_table(sources: Sequence, chunk_size: int = 4096,
+                 nutrient_names: Sequence[str] = NUTRIENTS,
+                 measure_memory: bool = False) -> Tuple[FoodTable, LoadReport]:
+    # Combina as fontes (na ordem de prioridade) numa FoodTable. Um alimento repetido
+    # (mesmo nome normalizado) mantém a primeira ocorrência; nutrientes que ela não tinha
+    # são completados pelas seguintes. O que continuar ausente vira 0, como na TACO.
+    # measure_memory: pico de memória alocada pelo Python (tracemalloc; deixa a carga mais lenta)
+    if chunk_size <= 0:
+        raise ValueError("chunk_size deve ser positivo")
+    tracing = measure_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    start = time.perf_counter()
+    report = LoadReport()
+
+    columns = {n: i for i, n in enumerate(nutrient_names)}
+    width = len(nutrient_names)
+    names: List[str] = []
+    categories: List[str] = []
+    blocks: List[np.ndarray] = []     # (linhas novas do bloco, width) float32
+    masks: List[np.ndarray] = []
+    seen: Dict[str, int] = {}         # nome normalizado -> linha global
+
+    def row_of(row: int) -> np.ndarray:
+        # Linha global -> vista na matriz do seu bloco (blocos de tamanhos variados)
+        block = bisect_right(offsets, row) - 1
+        return blocks[block][row - offsets[block]]
+
+    offsets: List[int] = []
+
+    def flush(source, raw: List[list], targets: List[int]):
+        # Converte o bloco; linhas novas viram um bloco da tabela, duplicadas completam
+        # os NaN da linha original (que pode estar neste mesmo bloco)
+        values = convert_block(raw)
+        if isinstance(source, CsvSource):
+            values *= source.scale()
+        mapped = [columns[n] for n in source.nutrients if n in columns]
+        keep = [i for i, n in enumerate(source.nutrients) if n in columns]
+        fresh = [i for i, target in enumerate(targets) if target < 0]
+        if fresh:
+            block = np.full((len(fresh), width), np.nan, dtype=np.float32)
+            block[:, mapped] = values[np.ix_(fresh, keep)]
+            offsets.append(len(names) - len(fresh))
+            blocks.append(block)
+            masks.append(tag_masks(names[-len(fresh):], categories[-len(fresh):]))
+        for i, target in enumerate(targets):
+            if target >= 0:
+                original = row_of(target)
+                update = values[i, keep]
+                current = original[mapped]
+                original[mapped] = np.where(np.isnan(current), update, current)
+
+    try:
+        for source in sources:
+            count = 0
+            raw: List[list] = []
+            targets: List[int] = []
+            for name, category, values in source.rows():
+                count += 1
+                key = normalize_name(name)
+                row = seen.get(key)
+                if row is None:
+                    seen[key] = len(names)
+                    names.append(name)
+                    categories.append(category)
+                    row = -1
+                else:
+                    report.duplicates += 1
+                raw.append(values)
+                targets.append(row)
+                if len(raw) == chunk_size:
+                    flush(source, raw, targets)
+                    raw, targets = [], []
+            if raw:
+                flush(source, raw, targets)
+            report.sources[source.name] = count
+            report.rows_read += count
+
+        nutrients = np.concatenate(blocks) if blocks else np.zeros((0, width), dtype=np.float32)
+        np.nan_to_num(nutrients, copy=False, nan=0.0)
+        table = FoodTable(names, categories, np.concatenate(masks) if masks else np.zeros(0, dtype=np.uint16),
+                          nutrients, nutrient_names)
+    finally:
+        if tracing:
+            report.peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    report.rows_kept = len(names)
+    report.seconds = time.perf_counter() - start
+    report.rows_per_second = report.rows_read / report.seconds if report.seconds else 0.0
+    return table, report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Combina tabelas de composição numa FoodTable.")
+    parser.add_argument("sources", nargs="+",
+                        help=f"caminho da TACO ou esquema:caminho (esquemas: {', '.join(SCHEMAS)})")
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--output", "-o", help="grava a tabela combinada (.npz, mesmo formato do cache)")
+    parser.add_argument("--no-memory", action="store_true", help="não mede o pico de memória (mais rápido)")
+    args = parser.parse_args(argv)
+
+    table, report = stream_table([open_source(spec) for spec in args.sources], args.chunk_size,
+                                 measure_memory=not args.no_memory)
+    if args.output:
+        from .food_cache import save_table
+        save_table(table, os.path.abspath(args.output), key="sources:" + ";".join(args.sources))
+    json.dump(report.as_dict(), sys.stdout, indent=2, ensure_ascii=False)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
-from .models import NutritionalTargets
+from dataclasses import replace
+from .models import NutrientBound, NutritionalTargets
 
 class NutritionalStrategy:
     @staticmethod
@@ -79,3 +80,15 @@ class NutritionalStrategy:
             min_fats=fats_g * (1 - margin),
             max_fats=fats_g * (1 + margin)
         )
+
+    @staticmethod
+    def with_micronutrient_limits(targets: NutritionalTargets,
+                                  max_sodium_mg: float = 2000.0,
+                                  min_fiber_g: float = 25.0,
+                                  min_calcium_mg: float = 1000.0) -> NutritionalTargets:
+        # Limites recomendados pelas nutricionistas (colunas da FoodTable)
+        return replace(targets, bounds=list(targets.bounds) + [
+            NutrientBound('sodium', maximum=max_sodium_mg),
+            NutrientBound('fiber', minimum=min_fiber_g),
+            NutrientBound('calcium', minimum=min_calcium_mg),
+        ])
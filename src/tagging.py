@@ -0,0 +1,222 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+
+# Regras de etiquetagem declarativas. Cada tag tem uma lista ordenada de ramos
+# (equivalente a if/elif): o primeiro ramo cujo `match` casa decide, e a tag só é
+# aplicada se o `exclude` desse ramo não casar (um `name_none` no `match`, ao
+# contrário, apenas faz o ramo não casar e passa ao próximo). As mesmas regras são avaliadas linha
+# a linha (get_tags) ou de forma vetorizada sobre colunas inteiras (tag_masks).
+
+
+@dataclass(frozen=True)
+class Match:
+    # Conjunção das condições informadas (substrings, nomes/categorias já em minúsculas)
+    name_any: Tuple[str, ...] = ()
+    name_all: Tuple[str, ...] = ()
+    name_none: Tuple[str, ...] = ()
+    category_any: Tuple[str, ...] = ()
+
+    def __bool__(self):
+        return bool(self.name_any or self.name_all or self.name_none or self.category_any)
+
+
+@dataclass(frozen=True)
+class Branch:
+    match: Match
+    exclude: Match = Match()
+
+
+@dataclass(frozen=True)
+class TagRule:
+    tag: str
+    branches: Tuple[Branch, ...]
+    # Não aplica a tag se alguma destas (avaliadas antes) já tiver sido aplicada
+    unless_tags: Tuple[str, ...] = ()
+
+
+# Nomes em inglês (USDA e outras bases importadas por src.sources, ver SCHEMAS): carnes,
+# aves e pescados, para as regras que a TACO resolve pela categoria. Substrings escolhidas
+# para não casar com nomes da TACO (ex: 'ham,' e não 'ham', que casaria com 'inhame')
+_ANIMAL_EN = ('beef', 'pork', 'veal', 'lamb,', 'mutton', 'venison', 'bison', 'chicken', 'turkey',
+              'duck', 'goose', 'ham,', 'bacon', 'sausage', 'salami', 'pepperoni', 'bologna',
+              'frankfurter', 'meat', 'steak', 'fish', 'salmon', 'tuna', 'cod,', 'shrimp', 'crab',
+              'lobster', 'oyster', 'clam', 'mussel', 'scallop', 'squid', 'octopus', 'anchovy', 'sardine')
+_NOT_ANIMAL_EN = Match(name_any=('chickpea', 'coconut meat', 'nut meat', 'meatless', 'imitation',
+                                 'vegetarian', 'veggie'))
+_EGG_EN = ('egg,', 'eggs')
+
+TAG_RULES: Tuple[TagRule, ...] = (
+    # 1. Filtragem para alimentos "desagradáveis" para dieta no dia a dia (Carnes/Leguminosas cruas).
+    #    Mandioca crua é tóxica.
+    TagRule("UNSAFE", (
+        Branch(Match(name_any=('cru', 'raw'),
+                     category_any=('carnes', 'pescados', 'leguminosas', 'ovos', 'miúdos', 'vísceras'))),
+        Branch(Match(name_all=('cru', 'mandioca'))),
+        Branch(Match(name_any=_ANIMAL_EN + _EGG_EN, name_all=('raw',)), exclude=_NOT_ANIMAL_EN),
+    )),
+    # Carbo Café da Manhã: Pães, Bolos, Biscoitos, Cereais
+    TagRule("BREAKFAST_CEREAL", (
+        Branch(Match(name_any=('pão', 'bolo', 'biscoito', 'torrada'))),
+        Branch(Match(name_all=('cereal', 'matinal'))),
+        Branch(Match(name_any=('mingau',))),
+    )),
+    # Carbo Almoço: Arroz, Macarrão, Polenta, Batata, Mandioca, Farinhas e pratos principais
+    TagRule("LUNCH_CARB", (
+        Branch(Match(name_any=('arroz', 'macarrão', 'polenta', 'milho')), exclude=Match(name_any=('curau', 'mingau'))),
+        Branch(Match(name_any=('farinha',), name_none=('láctea',))),
+        Branch(Match(name_any=('batata', 'mandioca', 'inhame', 'cará'))),
+        Branch(Match(name_any=('lasanha', 'pizza', 'pastel'))),
+    )),
+    TagRule("MEAT", (
+        Branch(Match(category_any=('carnes', 'pescados', 'ovos', 'vísceras'))),
+        Branch(Match(name_any=_ANIMAL_EN + _EGG_EN), exclude=_NOT_ANIMAL_EN),
+    ), unless_tags=("UNSAFE",)),
+    TagRule("DAIRY", (
+        Branch(Match(category_any=('leite',))),
+        Branch(Match(name_any=('queijo', 'iogurte', 'cheese', 'yogurt'))),
+    )),
+    # Restrições alimentares (ver food_index.RESTRICTIONS); não entram nos templates
+    TagRule("LACTOSE", (
+        Branch(Match(category_any=('leite',))),
+        Branch(Match(name_any=('leite', 'queijo', 'iogurte', 'manteiga', 'chantilly', 'capuccino',
+                               'láctea', 'estrogonofe')),
+               exclude=Match(name_any=('de coco', 'couve', 'tofu'))),
+        Branch(Match(name_any=('milk', 'cheese', 'yogurt', 'butter', 'cream', 'whey', 'lactose')),
+               exclude=Match(name_any=('coconut', 'soy', 'almond', 'rice milk', 'oat milk', 'nut butter',
+                                       'peanut butter', 'cocoa butter', 'apple butter', 'butternut',
+                                       'cream cracker', 'cream of tartar', 'nondairy', 'non-dairy',
+                                       'lactose free', 'lactose-free'))),
+    )),
+    TagRule("GLUTEN", (
+        Branch(Match(name_any=('trigo', 'pão', 'macarrão', 'biscoito', 'bolo', 'lasanha', 'pastel',
+                               'aveia', 'centeio', 'cevada', 'quibe', 'empada', 'coxinha', 'rosca',
+                               'yakisoba', 'tabule', 'nhoque', 'shoyu', 'farinha, láctea', 'cerveja')),
+               exclude=Match(name_any=('pão, de queijo', 'fruta-pão', 'polvilho', 'quibebe'))),
+        Branch(Match(name_any=('wheat', 'bread', 'pasta,', 'spaghetti', 'macaroni', 'noodle', 'barley',
+                               'rye flour', ',rye', ' rye', 'bagel', 'croissant', 'muffin', 'pretzel',
+                               'cracker', 'cookie', 'cake', 'pizza', 'beer', 'malt', 'couscous', 'bulgur',
+                               'semolina', 'seitan')),
+               exclude=Match(name_any=('buckwheat', 'breadfruit', 'gluten-free', 'gluten free', 'root beer',
+                                       'rice cake', 'rice noodle', 'cake,rice'))),
+    )),
+    # Carnes, pescados e preparações com eles (excluídos para vegetarianos; ovos e leite não)
+    TagRule("ANIMAL", (
+        Branch(Match(category_any=('carnes', 'pescados'))),
+        Branch(Match(name_any=('carne', 'frango', 'camarão', 'bife', 'carreteiro', 'barreado',
+                               'dobradinha', 'sarapatel', 'bolognesa', 'vatapá', 'acarajé', 'tacacá',
+                               'tropeiro', 'virado', 'vaca atolada', 'maniçoba', 'mocotó', 'gelatina',
+                               'empada', 'coxinha', 'quibe', 'charuto', 'yakisoba')),
+               exclude=Match(name_any=('quibebe',))),
+        Branch(Match(name_any=_ANIMAL_EN + ('gelatin',)), exclude=_NOT_ANIMAL_EN),
+    )),
+)
+
+# Ordem dos bits = ordem das regras (e das tags devolvidas por get_tags)
+TAG_NAMES: Tuple[str, ...] = tuple(rule.tag for rule in TAG_RULES)
+TAG_BITS: Dict[str, int] = {name: 1 << bit for bit, name in enumerate(TAG_NAMES)}
+
+
+def tags_to_mask(tags) -> int:
+    return sum(TAG_BITS[name] for name in TAG_NAMES if name in tags)
+
+
+def mask_to_tags(mask: int) -> Tuple[str, ...]:
+    return tuple(name for name in TAG_NAMES if mask & TAG_BITS[name])
+
+
+def rules_fingerprint() -> str:
+    # Representação estável das regras, usada na chave do cache compilado
+    return repr(TAG_RULES)
+
+
+# --- Avaliação linha a linha -------------------------------------------------
+
+def _matches(match: Match, name: str, category: str) -> bool:
+    if match.name_any and not any(s in name for s in match.name_any):
+        return False
+    if match.name_all and not all(s in name for s in match.name_all):
+        return False
+    if match.name_none and any(s in name for s in match.name_none):
+        return False
+    if match.category_any and not any(s in category for s in match.category_any):
+        return False
+    return bool(match)
+
+
+def get_tags(name: str, category: str) -> List[str]:
+    name_lower = name.lower()
+    cat_lower = category.lower()
+    tags = []
+    for rule in TAG_RULES:
+        if any(t in tags for t in rule.unless_tags):
+            continue
+        for branch in rule.branches:
+            if _matches(branch.match, name_lower, cat_lower):
+                if not _matches(branch.exclude, name_lower, cat_lower):
+                    tags.append(rule.tag)
+                break
+    return tags
+
+
+# --- Avaliação vetorizada -----------------------------------------------------
+
+def tag_masks(names: Sequence[str], categories: Sequence[str]) -> np.ndarray:
+    # Bitmask de tags (uint16) para colunas inteiras de nomes e categorias.
+    # Nomes: cada substring distinta é buscada uma única vez numa string com a coluna
+    # inteira (busca em C), e as ocorrências são mapeadas de volta para as linhas.
+    # Categorias: poucas distintas, então cada uma é avaliada uma vez e propagada.
+    lowered = [name.lower() for name in names]
+    n = len(lowered)
+    column = "\n".join(lowered)
+    row_starts = np.cumsum([0] + [len(name) + 1 for name in lowered[:-1]]) if n else np.zeros(0, dtype=np.int64)
+
+    category_codes: Dict[str, int] = {}
+    codes = np.fromiter((category_codes.setdefault(c.lower(), len(category_codes)) for c in categories),
+                        dtype=np.int64, count=n)
+    unique_categories = list(category_codes)
+
+    found: Dict[Tuple[str, str], np.ndarray] = {}
+
+    def contains(field: str, needle: str) -> np.ndarray:
+        key = (field, needle)
+        if key not in found:
+            if field == 'name':
+                hit = np.zeros(n, dtype=bool)
+                positions = [m.start() for m in re.finditer(re.escape(needle), column)]
+                if positions:
+                    hit[np.searchsorted(row_starts, positions, side='right') - 1] = True
+            else:
+                hit = np.array([needle in c for c in unique_categories], dtype=bool)[codes]
+            found[key] = hit
+        return found[key]
+
+    def evaluate(match: Match) -> np.ndarray:
+        if not match:
+            return np.zeros(n, dtype=bool)
+        result = np.ones(n, dtype=bool)
+        if match.name_any:
+            result &= np.logical_or.reduce([contains('name', s) for s in match.name_any])
+        if match.name_all:
+            result &= np.logical_and.reduce([contains('name', s) for s in match.name_all])
+        if match.name_none:
+            result &= ~np.logical_or.reduce([contains('name', s) for s in match.name_none])
+        if match.category_any:
+            result &= np.logical_or.reduce([contains('category', s) for s in match.category_any])
+        return result
+
+    masks = np.zeros(n, dtype=np.uint16)
+    applied: Dict[str, np.ndarray] = {}
+    for rule in TAG_RULES:
+        undecided = np.ones(n, dtype=bool)
+        for tag in rule.unless_tags:
+            undecided &= ~applied[tag]
+        hit = np.zeros(n, dtype=bool)
+        for branch in rule.branches:
+            matched = undecided & evaluate(branch.match)
+            hit |= matched & ~evaluate(branch.exclude)
+            undecided &= ~matched
+        applied[rule.tag] = hit
+        masks[hit] |= TAG_BITS[rule.tag]
+    return masks
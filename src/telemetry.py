@@ -0,0 +1,226 @@
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, TextIO, Tuple, Union
+
+# Instrumentação do GeneticAlgorithm.run: um GenerationRecord por geração com o tempo de
+# cada fase, a distribuição de fitness, a diversidade de genótipos e o número de avaliações.
+# Desligada por padrão (telemetry=None): o laço do GA não coleta nada (as fases de
+# next_generation usam NO_TIMER, um contexto vazio sem estado).
+#
+#   telemetry = Telemetry([JsonLinesExporter("ga.jsonl"), prometheus := PrometheusExporter()])
+#   GeneticAlgorithm(foods, targets, telemetry=telemetry).run()
+#   prometheus.write("ga.prom")
+
+# Fases medidas (na ordem em que ocorrem numa geração)
+PHASES = ("evaluate", "portions", "selection", "crossover", "mutation")
+
+
+class PhaseTimer:
+    # Soma em `phases` o tempo de cada bloco `with timer.phase("nome"):`. Guarda a fase
+    # corrente, então cada execução cria o seu (ver GeneticAlgorithm.run)
+    def __init__(self, phases: Dict[str, float]):
+        self.phases = phases
+        self._name = ""
+        self._start = 0.0
+
+    def phase(self, name: str) -> "PhaseTimer":
+        self._name = name
+        return self
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.phases[self._name] = self.phases.get(self._name, 0.0) + time.perf_counter() - self._start
+        return False
+
+
+class NullTimer:
+    # Telemetria desligada: os blocos não medem nada. Sem estado (nullcontext é reentrante),
+    # então uma única instância serve a todos os GAs e threads
+    _context = contextlib.nullcontext()
+
+    def phase(self, name: str) -> contextlib.nullcontext:
+        return self._context
+
+
+# Padrão de GeneticAlgorithm.next_generation
+NO_TIMER = NullTimer()
+
+
+@dataclass
+class GenerationRecord:
+    generation: int
+    phases: Dict[str, float] = field(default_factory=dict)
+    seconds: float = 0.0
+    evaluations: int = 0
+    population_size: int = 0
+    fitness_min: float = 0.0
+    fitness_median: float = 0.0
+    fitness_max: float = 0.0
+    diversity: float = 0.0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class Telemetry:
+    def __init__(self, exporters: Sequence = (), keep_records: bool = True):
+        self.exporters = list(exporters)
+        # keep_records=False só repassa aos exporters (execuções longas em produção)
+        self.keep_records = keep_records
+        self.records: List[GenerationRecord] = []
+        self._started: Dict[int, Tuple[float, int]] = {}
+
+    def start(self, generation: int, evaluations: int) -> GenerationRecord:
+        # evaluations: contador acumulado do GA no início da geração
+        record = GenerationRecord(generation=generation)
+        self._started[id(record)] = (time.perf_counter(), evaluations)
+        return record
+
+    @staticmethod
+    def timed(record: GenerationRecord, phase: str, fn: Callable, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        record.phases[phase] = record.phases.get(phase, 0.0) + time.perf_counter() - start
+        return result
+
+    def observe(self, record: GenerationRecord, ga) -> None:
+        # Chamado com a população já avaliada e ordenada
+        scores = [m.fitness_score for m in ga.population]
+        started, evaluations = self._started[id(record)]
+        record.evaluations = ga.evaluations - evaluations
+        record.population_size = len(scores)
+        if scores:
+            record.fitness_min, record.fitness_max = min(scores), max(scores)
+            record.fitness_median = statistics.median(scores)
+        record.diversity = ga.diversity()
+
+    def finish(self, record: GenerationRecord) -> None:
+        started, _ = self._started.pop(id(record))
+        record.seconds = time.perf_counter() - started
+        if self.keep_records:
+            self.records.append(record)
+        for exporter in self.exporters:
+            exporter.export(record)
+
+    def phase_totals(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for record in self.records:
+            for phase, seconds in record.phases.items():
+                totals[phase] = totals.get(phase, 0.0) + seconds
+        return totals
+
+    def close(self) -> None:
+        for exporter in self.exporters:
+            close = getattr(exporter, "close", None)
+            if close is not None:
+                close()
+
+
+# --- Exporters ----------------------------------------------------------------
+
+class JsonLinesExporter:
+    # Um objeto JSON por geração; `labels` são repetidos em cada linha (ex: id do perfil)
+    def __init__(self, target: Union[str, TextIO], labels: Optional[Dict[str, str]] = None):
+        self._owned = isinstance(target, str)
+        self.stream = open(target, 'a', encoding='utf-8') if self._owned else target
+        self.labels = labels or {}
+
+    def export(self, record: GenerationRecord) -> None:
+        self.stream.write(json.dumps({**self.labels, **record.as_dict()}, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+    def close(self) -> None:
+        if self._owned:
+            self.stream.close()
+
+
+class PrometheusExporter:
+    # Acumula contadores (gerações, avaliações, segundos por fase) e guarda como gauges
+    # o estado da última geração. render() devolve o formato texto de exposição do
+    # Prometheus; write() grava atomicamente (ex: para o textfile collector do node_exporter).
+    def __init__(self, prefix: str = "meal_planner_ga", labels: Optional[Dict[str, str]] = None):
+        self.prefix = prefix
+        self.labels = labels or {}
+        self.generations = 0
+        self.evaluations = 0
+        self.phase_seconds: Dict[str, float] = {}
+        self.last: Optional[GenerationRecord] = None
+
+    def export(self, record: GenerationRecord) -> None:
+        self.generations += 1
+        self.evaluations += record.evaluations
+        for phase, seconds in record.phases.items():
+            self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + seconds
+        self.last = record
+
+    def _labels(self, **extra) -> str:
+        labels = {**self.labels, **extra}
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+    def render(self) -> str:
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_generations_total Gerações executadas.",
+            f"# TYPE {p}_generations_total counter",
+            f"{p}_generations_total{self._labels()} {self.generations}",
+            f"# HELP {p}_evaluations_total Avaliações de fitness.",
+            f"# TYPE {p}_evaluations_total counter",
+            f"{p}_evaluations_total{self._labels()} {self.evaluations}",
+            f"# HELP {p}_phase_seconds_total Tempo acumulado por fase da geração.",
+            f"# TYPE {p}_phase_seconds_total counter",
+        ]
+        lines += [f"{p}_phase_seconds_total{self._labels(phase=phase)} {seconds:.9f}"
+                  for phase, seconds in self.phase_seconds.items()]
+        if self.last is not None:
+            lines += [
+                f"# HELP {p}_fitness Distribuição do fitness na última geração.",
+                f"# TYPE {p}_fitness gauge",
+            ]
+            lines += [f"{p}_fitness{self._labels(stat=stat)} {getattr(self.last, 'fitness_' + stat)}"
+                      for stat in ("min", "median", "max")]
+            lines += [
+                f"# HELP {p}_diversity Fração de genótipos distintos na última geração.",
+                f"# TYPE {p}_diversity gauge",
+                f"{p}_diversity{self._labels()} {self.last.diversity}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+
+# --- Profiling ----------------------------------------------------------------
+
+def profile_run(ga, progress_callback: Callable = None,
+                output: Optional[str] = None,
+                sort: str = "cumulative",
+                limit: int = 25,
+                stream: Optional[TextIO] = None):
+    # Roda ga.run() sob cProfile. Imprime as `limit` funções mais caras em `stream`
+    # (padrão: stderr) e, se `output` for informado, grava o perfil (.prof, para snakeviz etc).
+    # Devolve (menus, pstats.Stats).
+    profiler = cProfile.Profile()
+    menus = profiler.runcall(ga.run, progress_callback)
+    if output:
+        profiler.dump_stats(output)
+    buffer = io.StringIO()
+    stats = pstats.Stats(profiler, stream=buffer).sort_stats(sort)
+    stats.print_stats(limit)
+    (stream or sys.stderr).write(buffer.getvalue())
+    return menus, stats
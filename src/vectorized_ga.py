@@ -0,0 +1,243 @@
+import time
+from typing import List, Callable, Optional
+import numpy as np
+from .models import Food, Meal, Menu, NutritionalTargets
+from .food_index import FoodIndex
+from .food_table import FoodTable
+from .genetic_algorithm import MEAL_TEMPLATES, PRIORITY_TAGS
+from .optimizer import Optimizer, StopReason
+from .niching import diverse_top
+
+# Escalas de normalização do erro (mesmas de GeneticAlgorithm.calculate_fitness)
+ERROR_SCALES = np.array([100.0, 10.0, 10.0, 10.0])
+
+
+class VectorizedGeneticAlgorithm(Optimizer):
+    # Motor alternativo: a população é uma matriz de índices de alimentos (uma coluna por slot)
+    # mais uma máscara de preenchimento. Fitness, seleção, crossover e mutação de uma geração
+    # inteira rodam como operações em lote do NumPy. Objetos Menu só são montados no final
+    # (ou em top_menus, para resultados parciais). As restrições do usuário (`allowed`)
+    # filtram os pools dos slots, os grupos de substituição e os alimentos de 'add'.
+
+    def __init__(self,
+                 foods: List[Food],
+                 targets: NutritionalTargets,
+                 population_size: int = 200,
+                 generations: int = 50,
+                 mutation_rate: float = 0.1,
+                 elite_size: int = 4,
+                 index: Optional[FoodIndex] = None,
+                 extra_slots: int = 2,
+                 seed: Optional[int] = None,
+                 food_table: Optional[FoodTable] = None,
+                 top_k_distance: float = 0.25,
+                 target_fitness: Optional[float] = None,
+                 deadline_ms: Optional[float] = None,
+                 allowed: Optional[int] = None):
+        super().__init__(foods, targets, index=index, seed=seed, target_fitness=target_fitness,
+                         deadline_ms=deadline_ms, food_table=food_table, allowed=allowed,
+                         top_k_distance=top_k_distance)
+        self.population_size = population_size
+        self.generations = generations
+        self.mutation_rate = mutation_rate
+        self.elite_size = elite_size
+        # Gerador NumPy derivado do RNG do Optimizer a cada run() (como na busca local)
+        self._rng: Optional[np.random.Generator] = None
+
+        # Posições permitidas em index.foods (todas sem restrições)
+        self.permitted = np.zeros(len(self.index.foods), dtype=bool)
+        self.permitted[self.index.ids_of(self.index.allowed_foods(allowed))] = True
+        self.permitted_ids = np.flatnonzero(self.permitted)
+
+        self.nutrients = self.index.nutrients
+        self.lower = np.array([targets.min_calories, targets.min_proteins, targets.min_carbs, targets.min_fats])
+        self.upper = np.array([targets.max_calories, targets.max_proteins, targets.max_carbs, targets.max_fats])
+
+        # Limites extras: submatriz (n_foods, n_limites) alinhada às posições do índice
+        if self.constraints is not None:
+            self.extra_nutrients = self.constraints.rows([f.food_id for f in self.index.foods])
+
+        self._build_layout(extra_slots)
+        self._build_replacement_groups()
+
+        self.genes: np.ndarray = np.empty((0, self.n_slots), dtype=np.int64)
+        self.mask: np.ndarray = np.empty((0, self.n_slots), dtype=bool)
+        self.fitness: np.ndarray = np.empty(0)
+
+    def _build_layout(self, extra_slots: int):
+        # Cada refeição ocupa seus slots do template + `extra_slots` colunas livres para 'add'
+        self.meal_names = [name for name, _ in MEAL_TEMPLATES]
+        meal_of_slot, template_slot, pools = [], [], []
+        for m, (_, requirements) in enumerate(MEAL_TEMPLATES):
+            for req in requirements:
+                meal_of_slot.append(m)
+                template_slot.append(True)
+                pools.append(self.index.ids_of(self.index.candidates(req, self.allowed)))
+            for _ in range(extra_slots):
+                meal_of_slot.append(m)
+                template_slot.append(False)
+                pools.append(self.permitted_ids)
+
+        self.n_meals = len(MEAL_TEMPLATES)
+        self.n_slots = len(meal_of_slot)
+        self.meal_of_slot = np.array(meal_of_slot)
+        self.template_slot = np.array(template_slot)
+        self.meal_slots = [np.flatnonzero(self.meal_of_slot == m) for m in range(self.n_meals)]
+        self.slot_pools = pools
+
+    def _build_replacement_groups(self):
+        # Grupo de substituição de cada alimento, igual à heurística de GeneticAlgorithm.mutate:
+        # primeira tag prioritária, senão mesma categoria, senão qualquer alimento (sempre
+        # só entre os permitidos)
+        keys, members = {}, []
+        group_of = np.empty(len(self.index.foods), dtype=np.int64)
+        allowed = self.allowed
+        for i, food in enumerate(self.index.foods):
+            target_tag = next((t for t in PRIORITY_TAGS if t in food.tags), None)
+            key = ("tag", target_tag)
+            pool = self.index.restrict(key, self.index.by_tag(target_tag), allowed) if target_tag else ()
+            if not pool:
+                key = ("category", food.category)
+                pool = self.index.restrict(key, self.index.by_category(food.category), allowed)
+            if not pool:
+                key = ("all", None)
+                pool = self.index.allowed_foods(allowed)
+            if key not in keys:
+                keys[key] = len(members)
+                members.append(self.index.ids_of(pool))
+            group_of[i] = keys[key]
+
+        sizes = np.array([len(m) for m in members], dtype=np.int64)
+        self.group_of = group_of
+        self.group_sizes = sizes
+        self.group_offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        self.group_members = np.concatenate(members)
+
+    def _sample_pool(self, pool: np.ndarray, n: int) -> np.ndarray:
+        return pool[self._rng.integers(0, len(pool), size=n)]
+
+    def initialize_population(self):
+        n = self.population_size
+        self.genes = np.empty((n, self.n_slots), dtype=np.int64)
+        for s, pool in enumerate(self.slot_pools):
+            self.genes[:, s] = self._sample_pool(pool, n)
+        self.mask = np.tile(self.template_slot, (n, 1))
+
+    def totals(self, genes: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        # (P, 4): soma dos nutrientes dos slots ativos
+        return np.einsum('psk,ps->pk', self.nutrients[genes], mask.astype(np.float64))
+
+    def batch_fitness(self, genes: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        # Fitness da população inteira; Optimizer.calculate_fitness(menu) continua valendo por menu
+        # Fitness = 1 / (1 + Erro), penalizando quadraticamente o que sair do intervalo
+        totals = self.totals(genes, mask)
+        below = np.clip(self.lower - totals, 0.0, None)
+        above = np.clip(totals - self.upper, 0.0, None)
+        error = (((below + above) / ERROR_SCALES) ** 2).sum(axis=1)
+        if self.constraints is not None:
+            extra = np.einsum('psk,ps->pk', self.extra_nutrients[genes], mask.astype(np.float64))
+            error += self.constraints.penalty(extra)
+        return 1.0 / (1.0 + error)
+
+    def select_parents(self, n_parents: int) -> np.ndarray:
+        tournament_size = 5
+        contenders = self._rng.integers(0, len(self.fitness), size=(n_parents, tournament_size))
+        winners = np.argmax(self.fitness[contenders], axis=1)
+        return contenders[np.arange(n_parents), winners]
+
+    def crossover(self, parents1: np.ndarray, parents2: np.ndarray):
+        #Crossover uniforme no nível da refeicao
+        from_first = self._rng.random((len(parents1), self.n_meals)) < 0.5
+        take = from_first[:, self.meal_of_slot]
+        genes = np.where(take, self.genes[parents1], self.genes[parents2])
+        mask = np.where(take, self.mask[parents1], self.mask[parents2])
+        return genes, mask
+
+    def _random_slot(self, mask: np.ndarray, rows: np.ndarray, slots: np.ndarray, active: bool) -> np.ndarray:
+        # Escolhe, para cada linha, um slot aleatório da refeição com o estado pedido (-1 se nenhum)
+        keys = self._rng.random((len(rows), len(slots)))
+        eligible = mask[rows[:, None], slots] == active
+        keys[~eligible] = -1.0
+        picked = np.argmax(keys, axis=1)
+        return np.where(eligible.any(axis=1), slots[picked], -1)
+
+    def mutate(self, genes: np.ndarray, mask: np.ndarray):
+        # Mesmas proporções de GeneticAlgorithm.mutate: 3x replace, 1x add, 1x remove
+        n = len(genes)
+        mutated = self._rng.random((n, self.n_meals)) < self.mutation_rate
+        kind = self._rng.integers(0, 5, size=(n, self.n_meals))
+
+        for m, slots in enumerate(self.meal_slots):
+            rows = np.flatnonzero(mutated[:, m] & (kind[:, m] < 3))
+            if len(rows):
+                cols = self._random_slot(mask, rows, slots, True)
+                rows, cols = rows[cols >= 0], cols[cols >= 0]
+                group = self.group_of[genes[rows, cols]]
+                offset = (self._rng.random(len(rows)) * self.group_sizes[group]).astype(np.int64)
+                genes[rows, cols] = self.group_members[self.group_offsets[group] + offset]
+
+            rows = np.flatnonzero(mutated[:, m] & (kind[:, m] == 3))
+            if len(rows):
+                cols = self._random_slot(mask, rows, slots, False)
+                rows, cols = rows[cols >= 0], cols[cols >= 0]
+                genes[rows, cols] = self._sample_pool(self.permitted_ids, len(rows))
+                mask[rows, cols] = True
+
+            rows = np.flatnonzero(mutated[:, m] & (kind[:, m] == 4))
+            if len(rows):
+                # Só remove se a refeição ficar com pelo menos um alimento
+                rows = rows[mask[rows[:, None], slots].sum(axis=1) > 1]
+                cols = self._random_slot(mask, rows, slots, True)
+                mask[rows[cols >= 0], cols[cols >= 0]] = False
+
+    def to_menu(self, row: int) -> Menu:
+        meals = []
+        for m, slots in enumerate(self.meal_slots):
+            active = slots[self.mask[row, slots]]
+            meals.append(Meal(name=self.meal_names[m], foods=[self.index.foods[g] for g in self.genes[row, active]]))
+        return Menu(meals=meals, fitness_score=float(self.fitness[row]), targets=self.targets, fitness_valid=True)
+
+    def _evaluate(self):
+        #Avaliacao de fitness e ordenação (decrescente)
+        self.fitness = self.batch_fitness(self.genes, self.mask)
+        self.evaluations += len(self.genes)
+        order = np.argsort(-self.fitness, kind='stable')
+        self.genes, self.mask, self.fitness = self.genes[order], self.mask[order], self.fitness[order]
+
+    def top_menus(self, k: int = 3) -> List[Menu]:
+        # Mesmo critério do Optimizer, montando os Menus da população ordenada sob demanda
+        return diverse_top((self.to_menu(row) for row in range(len(self.genes))), k, self.top_k_distance)
+
+    def run(self, progress_callback: Callable = None) -> List[Menu]:
+        start = time.perf_counter()
+        self.stop_reason = StopReason.COMPLETED
+        self.evaluations = 0
+        self._rng = np.random.default_rng(self.rng.getrandbits(64))
+        self.initialize_population()
+        n_children = self.population_size - self.elite_size
+
+        for generation in range(self.generations):
+            self._evaluate()
+
+            if progress_callback:
+                progress_callback(generation, float(self.fitness[0]))
+
+            if self.target_fitness is not None and self.fitness[0] >= self.target_fitness:
+                self.stop_reason = StopReason.TARGET_FITNESS
+                return self.top_menus()
+            if self._deadline_passed(start):
+                self.stop_reason = StopReason.DEADLINE
+                return self.top_menus()
+
+            parents = self.select_parents(n_children)
+            p1 = parents[self._rng.integers(0, n_children, size=n_children)]
+            p2 = parents[self._rng.integers(0, n_children, size=n_children)]
+            child_genes, child_mask = self.crossover(p1, p2)
+            self.mutate(child_genes, child_mask)
+
+            #Elitismo: mantém os melhores N
+            self.genes = np.concatenate([self.genes[:self.elite_size], child_genes])
+            self.mask = np.concatenate([self.mask[:self.elite_size], child_mask])
+
+        self._evaluate()
+        return self.top_menus()
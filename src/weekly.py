@@ -0,0 +1,169 @@
+import argparse
+import os
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+from .models import Food, Menu, NutritionalTargets
+from .food_index import FoodIndex
+from .food_table import FoodTable
+from .genetic_algorithm import GeneticAlgorithm
+
+# Planejamento semanal: um GA por dia, com penalidade de variedade em relação aos dias
+# já planejados e warm start a partir da população final do dia anterior.
+
+DAY_NAMES = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
+
+# Quantas vezes o MESMO alimento de cada grupo pode aparecer na semana
+DEFAULT_MAX_REPEATS = {"MEAT": 2, "LUNCH_CARB": 3}
+
+
+class VarietyGeneticAlgorithm(GeneticAlgorithm):
+    # GA que soma ao erro nutricional uma penalidade por repetições acima do limite,
+    # contando o que já foi servido nos dias anteriores (`usage`, por nome do alimento)
+
+    def __init__(self, *args,
+                 usage: Optional[Counter] = None,
+                 max_repeats: Optional[Dict[str, int]] = None,
+                 variety_weight: float = 1.0,
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        self.usage = usage if usage is not None else Counter()
+        self.max_repeats = DEFAULT_MAX_REPEATS if max_repeats is None else max_repeats
+        self.variety_weight = variety_weight
+        self._limits: Dict[tuple, Optional[int]] = {}
+
+    def repeat_limit(self, food: Food) -> Optional[int]:
+        # Memorizado por conjunto de tags: poucos conjuntos distintos no catálogo
+        if food.tags not in self._limits:
+            limits = [self.max_repeats[t] for t in food.tags if t in self.max_repeats]
+            self._limits[food.tags] = min(limits) if limits else None
+        return self._limits[food.tags]
+
+    def variety_excess(self, menu: Menu) -> int:
+        # Cada ocorrência de um alimento de grupo limitado além do limite semanal conta 1
+        in_menu: Dict[str, int] = {}
+        excess = 0
+        for meal in menu.meals:
+            for food in meal.foods:
+                limit = self.repeat_limit(food)
+                if limit is not None:
+                    count = in_menu.get(food.name, 0) + 1
+                    in_menu[food.name] = count
+                    if self.usage[food.name] + count > limit:
+                        excess += 1
+        return excess
+
+    def calculate_error(self, menu: Menu) -> float:
+        # A penalidade depende dos alimentos, não só dos totais: uma troca que mantém os
+        # macros (ex: carne por carne equivalente) também precisa reavaliar o menu. Menu.replace_meal
+        # invalida o fitness a cada troca de alimento/porção e o FitnessMemo é indexado pelo
+        # genótipo, então nenhum score antigo é reaproveitado
+        return super().calculate_error(menu) + self.variety_weight * self.variety_excess(menu)
+
+
+class WeeklyPlanner:
+    def __init__(self,
+                 foods: List[Food],
+                 targets: NutritionalTargets,
+                 days: int = 7,
+                 population_size: int = 150,
+                 generations: int = 40,
+                 warm_generations: Optional[int] = 15,
+                 max_repeats: Optional[Dict[str, int]] = None,
+                 variety_weight: float = 1.0,
+                 index: Optional[FoodIndex] = None,
+                 food_table: Optional[FoodTable] = None,
+                 seed: Optional[int] = None):
+        self.foods = foods
+        self.targets = targets
+        self.days = days
+        self.population_size = population_size
+        self.generations = generations
+        # Gerações dos dias com warm start (None = sem warm start, todo dia do zero)
+        self.warm_generations = warm_generations
+        self.max_repeats = max_repeats
+        self.variety_weight = variety_weight
+        self.index = index if index is not None else FoodIndex(foods)
+        self.food_table = food_table
+        self.seed = seed
+        self.usage: Counter = Counter()
+
+    def _day_seed(self, day: int) -> Optional[int]:
+        return None if self.seed is None else self.seed * 1000 + day
+
+    def run(self, progress_callback: Callable = None) -> List[Menu]:
+        # Devolve um menu por dia; progress_callback(dia, geração, melhor_fitness)
+        self.usage = Counter()
+        week: List[Menu] = []
+        previous: List[Menu] = []
+
+        for day in range(self.days):
+            warm = bool(previous) and self.warm_generations is not None
+            ga = VarietyGeneticAlgorithm(
+                self.foods, self.targets,
+                population_size=self.population_size,
+                generations=self.warm_generations if warm else self.generations,
+                index=self.index, food_table=self.food_table, seed=self._day_seed(day),
+                initial_population=previous if warm else None,
+                usage=self.usage, max_repeats=self.max_repeats, variety_weight=self.variety_weight)
+
+            callback = None
+            if progress_callback:
+                callback = lambda generation, best, day=day: progress_callback(day, generation, best)
+            best = ga.run(callback)[0]
+
+            week.append(best)
+            self.usage.update(f.name for meal in best.meals for f in meal.foods)
+            previous = ga.population
+
+        return week
+
+    def repeat_violations(self, week: List[Menu]) -> int:
+        checker = VarietyGeneticAlgorithm(self.foods, self.targets, index=self.index,
+                                          max_repeats=self.max_repeats)
+        return checker.variety_excess(Menu(meals=[meal for menu in week for meal in menu.meals]))
+
+
+def benchmark_week(foods: List[Food], targets: NutritionalTargets, seed: int = 0,
+                   index: Optional[FoodIndex] = None, **kwargs) -> Dict[str, dict]:
+    # Compara a semana com warm start contra 7 execuções completas do zero:
+    # tempo total, fitness médio (metas nutricionais) e repetições acima do limite
+    index = index if index is not None else FoodIndex(foods)
+    judge = GeneticAlgorithm(foods, targets, index=index)
+    results = {}
+    for mode, warm_generations in (("cold", None), ("warm", kwargs.pop("warm_generations", 15))):
+        planner = WeeklyPlanner(foods, targets, index=index, seed=seed, warm_generations=warm_generations, **kwargs)
+        start = time.perf_counter()
+        week = planner.run()
+        elapsed = time.perf_counter() - start
+        results[mode] = {
+            "seconds": elapsed,
+            "mean_fitness": sum(judge.calculate_fitness(m) for m in week) / len(week),
+            "repeat_violations": planner.repeat_violations(week),
+        }
+    results["speedup"] = {"cold_over_warm": results["cold"]["seconds"] / results["warm"]["seconds"]}
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    from .food_cache import load_foods
+    from .strategies import NutritionalStrategy
+
+    parser = argparse.ArgumentParser(description="Benchmark do planejamento semanal (warm start vs do zero).")
+    parser.add_argument("--taco", default=os.path.join("data", "taco.csv"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warm-generations", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    foods = load_foods(args.taco)
+    targets = NutritionalStrategy.from_bmi(70, 170, 30, 'M')
+    results = benchmark_week(foods, targets, seed=args.seed, warm_generations=args.warm_generations)
+    for mode in ("cold", "warm"):
+        r = results[mode]
+        print(f"{mode:>5}: {r['seconds']:.2f}s | fitness médio {r['mean_fitness']:.4f} | "
+              f"repetições acima do limite {r['repeat_violations']}")
+    print(f"speedup: {results['speedup']['cold_over_warm']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+from typing import Optional, Sequence
+from .models import Food
+from .food_index import FoodIndex
+from .food_table import FoodTable
+
+# Estado global de cada processo de um pool: alimentos e índice chegam uma única vez
+# pelo initializer (herdados no fork, ou serializados uma vez por worker no spawn)
+# em vez de serem enviados a cada tarefa.
+_worker_index: Optional[FoodIndex] = None
+_worker_table: Optional[FoodTable] = None
+
+
+def init_worker(foods: Sequence[Food], food_table: Optional[FoodTable] = None):
+    # food_table: só para limites extras (NutritionalTargets.bounds), ex: ilhas do GA
+    global _worker_index, _worker_table
+    _worker_index = FoodIndex(foods)
+    _worker_table = food_table
+
+
+def worker_index() -> FoodIndex:
+    if _worker_index is None:
+        raise RuntimeError("Pool de processos sem init_worker como initializer")
+    return _worker_index
+
+
+def worker_table() -> Optional[FoodTable]:
+    return _worker_table